@@ -1,52 +1,262 @@
 import sys
 import os
+import json
+import csv
+from nvmexplorer_src.results_store import *
 
 
-def combine_csv(cell_type, mlc, bg=0):
+class RunManifest:
+  def __init__(self,
+                manifest_path="output/results/default-manifest.json" #json file listing the per-run results files a study produced
+                ):
+    self.manifest_path = manifest_path
+    self.runs = []
+    if os.path.exists(self.manifest_path):
+      with open(self.manifest_path) as f:
+        self.runs = json.load(f)["runs"]
+
+  def add(self, results_csv, cell_type, bits_per_cell):
+    """ Records a per-run results file, replacing any earlier entry for the same path
+    """
+    self.runs = [run for run in self.runs if run["path"] != results_csv]
+    self.runs.append({"path": results_csv, "cell_type": cell_type, "bits_per_cell": bits_per_cell})
+
+  def paths(self):
+    return [run["path"] for run in self.runs]
+
+  def save(self):
+    tmp_path = self.manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+      json.dump({"runs": self.runs}, f, indent=1)
+    os.replace(tmp_path, self.manifest_path)
+
+
+def selects_run(filename, cell_type, mlc, bg=0):
+    """ Returns whether a per-run results file belongs in the combined output for cell_type and mlc
+    """
+    if (bg == 0):
+        return filename.endswith(".csv") and cell_type in filename and "MB" in filename and (mlc == 1 or "2BPC" in filename)
+    return filename.endswith(".csv") and "BG" in filename
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def stream_rows(big_fp, source_paths, header_written):
+    """ Appends every line of source_paths to big_fp, keeping only the first header.
+    Returns whether a header has been written.
+    """
+    for source_path in source_paths:
+        with open(source_path, 'r') as little_fp:
+            for line in little_fp:
+                if not header_written:
+                    big_fp.write(line)
+                    header_written = True
+                elif 'MemCellType' not in line:
+                    big_fp.write(line)
+    return header_written
+
+
+def combined_file_name(cell_type, mlc, bg=0, output_path="output", extension=".csv"):
+    """ Returns the path of the combined results for a cell type and mlc configuration
+    """
+    if (bg == 0):
+      return "{}/results/{}_{}BPC-combined{}".format(output_path, cell_type, mlc, extension)
+    return "{}/results/FeFET_BG_study{}".format(output_path, extension)
+
+
+def combine_sources(cell_type, mlc, bg=0, manifest=None, output_path="output"):
+    """ Returns the per-run results csvs that make up the combined results for a cell type and mlc
+    configuration: the runs of earlier studies the combined csv was built from that are still on
+    disk, followed by this study's runs from the manifest
+
+    :param manifest: per-run files produced by the study; if None, [output_path]/results/ is scanned instead
+    :type manifest: :class:`RunManifest`
+    :return: (source paths, sources the existing combined csv was built from)
+    :rtype: tuple of lists
+    """
+    output_file_name = combined_file_name(cell_type, mlc, bg, output_path)
+    state_file_name = output_file_name + ".sources.json"
+
+    previous_sources = []
+    if os.path.exists(output_file_name) and os.path.exists(state_file_name):
+      with open(state_file_name) as f:
+        previous_sources = json.load(f)["sources"]
+
+    if manifest is None:
+      results_dir = "{}/results/".format(output_path)
+      source_paths = [os.path.normpath(results_dir + filename) for filename in sorted(os.listdir(results_dir))
+                      if selects_run(filename, cell_type, mlc, bg)]
+    else:
+      # keep runs from earlier studies that are still on disk, followed by this study's runs
+      manifest_paths = [os.path.normpath(path) for path in manifest.paths() if selects_run(os.path.basename(path), cell_type, mlc, bg)]
+      source_paths = [source["path"] for source in previous_sources
+                      if source["path"] not in manifest_paths and os.path.exists(source["path"])]
+      source_paths.extend(manifest_paths)
+    source_paths = [path for path in source_paths
+                    if os.path.exists(path) and os.path.abspath(path) != os.path.abspath(output_file_name)]
+    return source_paths, previous_sources
+
+
+def combine_csv(cell_type, mlc, bg=0, manifest=None, output_path="output"):
     """ Writes to a file in csv format the combined results from a set of experiments for a certain
-    cell type and mlc configuration
+    cell type and mlc configuration. Rows are streamed from each per-run file with repeated headers
+    dropped on the fly. If the combined file already exists and none of the runs it was built from
+    have changed, only new runs are appended to it.
 
     :param cell_type: String indicating the NVM technology (e.g., PCM or STT)
     :type cell_type: String
     :param mlc: int indicating the number of bits per cell
     :type mlc: int
+    :param manifest: per-run files produced by the study; if None, [output_path]/results/ is scanned instead
+    :type manifest: :class:`RunManifest`
+    :param output_path: the study's output directory
+    :type output_path: String
     """
-    if (bg == 0):
-      output_file_name = "output/results/{}_{}BPC-combined.csv".format(cell_type, mlc)
+    output_file_name = combined_file_name(cell_type, mlc, bg, output_path)
+    state_file_name = output_file_name + ".sources.json"
+    source_paths, previous_sources = combine_sources(cell_type, mlc, bg, manifest, output_path)
+    signatures = [file_signature(path) for path in source_paths]
+
+    # Reuse the existing combined file if it was built from an unchanged prefix of the current runs
+    num_previous = len(previous_sources)
+    unchanged = num_previous > 0 and num_previous <= len(source_paths) and all(
+      previous_sources[i]["path"] == source_paths[i] and previous_sources[i]["signature"] == signatures[i]
+      for i in range(num_previous))
+
+    if unchanged:
+      with open(output_file_name, 'a') as big_fp:
+        stream_rows(big_fp, source_paths[num_previous:], header_written=os.path.getsize(output_file_name) > 0)
     else:
-      output_file_name = "output/results/FeFET_BG_study.csv"
-    
-    if os.path.exists(output_file_name):
-        os.remove(output_file_name)
-    
-    # Combine all the CSVs into one big CSV (one big CSV per technology class)
-    with open(output_file_name, 'a') as big_fp:
-      for filename in os.listdir("output/results/"):
-          if (bg == 0):
-              if filename.endswith(".csv") and cell_type in filename and "MB" in filename:
-                  if (mlc == 1): 
-                      with open("output/results/" + filename, 'r') as little_fp:
-                          big_fp.write(little_fp.read())
-                  elif ("2BPC" in filename):
-                      with open("output/results/" + filename, 'r') as little_fp:
-                          big_fp.write(little_fp.read())
-          else:
-              if filename.endswith(".csv") and "BG" in filename:
-                  with open("output/results/" + filename, 'r') as little_fp:
-                      big_fp.write(little_fp.read())
-
-    
-    # Now remove all headers except for the first one 
-    with open(output_file_name, 'r') as big_fp:
-      lines = big_fp.readlines() 
-    
-    first = 0
-    with open(output_file_name, 'w') as big_fp:
-      for line in lines:
-          if first == 0:
-              big_fp.write(line)
-              first = 1
-          elif first == 1:
-              if 'MemCellType' not in line:
-                  big_fp.write(line)
-    
+      # Combine all the CSVs into one big CSV (one big CSV per technology class)
+      tmp_file_name = output_file_name + ".tmp"
+      with open(tmp_file_name, 'w') as big_fp:
+        stream_rows(big_fp, source_paths, header_written=False)
+      os.replace(tmp_file_name, output_file_name)
+
+    with open(state_file_name, 'w') as f:
+      json.dump({"sources": [{"path": path, "signature": signature} for (path, signature) in zip(source_paths, signatures)]}, f, indent=1)
+
+
+def combine_columnar(cell_type, mlc, results_format="parquet", columns=None, bg=0, manifest=None, output_path="output"):
+    """ Combines the columnar (Parquet or Feather) copies of a set of experiment results for a certain
+    cell type and mlc configuration, from the same per-run files as :func:`combine_csv`
+
+    :param cell_type: String indicating the NVM technology (e.g., PCM or STT)
+    :type cell_type: String
+    :param mlc: int indicating the number of bits per cell
+    :type mlc: int
+    :param results_format: "parquet" or "feather"
+    :type results_format: String
+    :param columns: only read and keep these columns, or None for all of them
+    :type columns: list of Strings
+    :param manifest: per-run files produced by the study; if None, [output_path]/results/ is scanned instead
+    :type manifest: :class:`RunManifest`
+    :param output_path: the study's output directory
+    :type output_path: String
+    :return: path to the combined file
+    :rtype: String
+    """
+    pa = import_pyarrow()
+    output_file_name = combined_file_name(cell_type, mlc, bg, output_path, COLUMNAR_FORMATS[results_format])
+
+    source_paths, previous_sources = combine_sources(cell_type, mlc, bg, manifest, output_path)
+    tables = [read_table(columnar_path(path, results_format), columns=columns) for path in source_paths
+              if os.path.exists(columnar_path(path, results_format))]
+
+    if len(tables) == 0:
+        return None
+    combined = pa.concat_tables(tables, promote_options="permissive")
+    write_table(combined, output_file_name, results_format)
+    return output_file_name
+
+
+def combine_technologies(cell_types, mlc, results_formats=["csv"], chunk_size=65536, output_path="output"):
+    """ Merges the per-technology combined results for several cell types into a single dataset with
+    one union schema. Cell parameters a technology does not define are left empty in the csv and
+    stored as explicit nulls in columnar formats.
+
+    :param cell_types: NVM technologies to merge (e.g., ["SRAM", "STT", "RRAM"])
+    :type cell_types: list of Strings
+    :param mlc: int indicating the number of bits per cell
+    :type mlc: int
+    :param results_formats: output formats; any of "csv", "parquet", "feather"
+    :type results_formats: list of Strings
+    :param chunk_size: number of rows converted at a time for columnar output
+    :type chunk_size: int
+    :param output_path: the study's output directory
+    :type output_path: String
+    :return: paths to the merged files
+    :rtype: list of Strings
+    """
+    source_paths = [combined_file_name(cell_type, mlc, output_path=output_path) for cell_type in cell_types]
+    source_paths = [path for path in source_paths if os.path.exists(path) and os.path.getsize(path) > 0]
+    output_file_name = "{}/results/all_technologies_{}BPC-combined.csv".format(output_path, mlc)
+
+    # First pass reads only the header line of each file
+    source_headers = []
+    for path in source_paths:
+        with open(path, 'r', newline='') as little_fp:
+            source_headers.append(next(csv.reader(little_fp)))
+    headers = union_headers(source_headers)
+    column_index = {name: i for (i, name) in enumerate(headers)}
+
+    csv_fp = None
+    if "csv" in results_formats:
+        csv_fp = open(output_file_name + ".tmp", 'w', newline='')
+        csv_writer = csv.writer(csv_fp, dialect='excel')
+        csv_writer.writerow(headers)
+    columnar_formats = [f for f in results_formats if f in COLUMNAR_FORMATS]
+    columnar_tables = []
+    parquet_writer = None
+    if "parquet" in columnar_formats:
+        pa = import_pyarrow()
+        parquet_writer = pa.parquet.ParquetWriter(columnar_path(output_file_name, "parquet") + ".tmp", results_schema(headers))
+
+    def write_chunk(rows):
+        if csv_fp is not None:
+            csv_writer.writerows(rows)
+        if columnar_formats:
+            table = rows_to_table(headers, rows)
+            if parquet_writer is not None:
+                parquet_writer.write_table(table)
+            if "feather" in columnar_formats:
+                columnar_tables.append(table)
+
+    # Second pass streams rows, placing each field at its union column
+    for (path, source_header) in zip(source_paths, source_headers):
+        positions = [column_index[name] for name in unique_column_names(source_header)]
+        rows = []
+        with open(path, 'r', newline='') as little_fp:
+            reader = csv.reader(little_fp)
+            next(reader)
+            for row in reader:
+                if row == source_header:
+                    continue
+                union_row = [None] * len(headers)
+                for (position, value) in zip(positions, row):
+                    union_row[position] = value
+                rows.append(union_row)
+                if len(rows) >= chunk_size:
+                    write_chunk(rows)
+                    rows = []
+        if rows:
+            write_chunk(rows)
+
+    output_paths = []
+    if csv_fp is not None:
+        csv_fp.close()
+        os.replace(output_file_name + ".tmp", output_file_name)
+        output_paths.append(output_file_name)
+    if parquet_writer is not None:
+        parquet_writer.close()
+        os.replace(columnar_path(output_file_name, "parquet") + ".tmp", columnar_path(output_file_name, "parquet"))
+        output_paths.append(columnar_path(output_file_name, "parquet"))
+    if "feather" in columnar_formats:
+        pa = import_pyarrow()
+        table = pa.concat_tables(columnar_tables) if columnar_tables else results_schema(headers).empty_table()
+        write_table(table.unify_dictionaries(), columnar_path(output_file_name, "feather"), "feather")
+        output_paths.append(columnar_path(output_file_name, "feather"))
+    return output_paths
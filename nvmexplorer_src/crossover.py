@@ -0,0 +1,170 @@
+import os
+import json
+import numpy as np
+from nvmexplorer_src.input_defs.nvsim_interface import output_failure
+
+# default traffic domain, spanning the generic_traffic sweep (accesses per second)
+READ_FREQ_RANGE = (0., 1e10)
+WRITE_FREQ_RANGE = (0., 1e7)
+
+
+def power_coefficients(access_pattern, nvsim_input_cfg, nvsim_output):
+  """ Returns (c0, cr, cw) such that total power (mW) = c0 + cr * read_freq + cw * write_freq, as in
+  :meth:`ExperimentResult.evaluate` with the per-second access counts left unrounded (the rounding
+  shifts total power by less than one read plus one write energy, i.e., picowatts)
+
+  :param access_pattern: :class:`PatternConfig` providing the read and write sizes
+  :type access_pattern: :class:`PatternConfig`
+  :param nvsim_input_cfg: :class:`NVSimInputConfig` used for the array simulation
+  :type nvsim_input_cfg: :class:`NVSimInputConfig`
+  :param nvsim_output: parsed NVSim results
+  :type nvsim_output: :class:`NVSimOutputConfig`
+  :rtype: numpy array of 3 floats
+  """
+  read_per_access = 8. * access_pattern.read_size / nvsim_input_cfg.word_width
+  write_per_access = 8. * access_pattern.write_size / nvsim_input_cfg.word_width
+  return np.array([nvsim_output.leakage_power,
+                   read_per_access * nvsim_output.read_energy / 1000. / 1000. / 1000.,
+                   write_per_access * nvsim_output.write_energy / 1000. / 1000. / 1000.])
+
+
+def clip_polygon(polygon, line, tol):
+  """ Clips a convex polygon to the half-plane line[0] + line[1] * r + line[2] * w <= tol
+  """
+  clipped = []
+  for k in range(len(polygon)):
+    p, q = polygon[k], polygon[(k + 1) % len(polygon)]
+    fp = line[0] + line[1] * p[0] + line[2] * p[1]
+    fq = line[0] + line[1] * q[0] + line[2] * q[1]
+    if fp <= tol:
+      clipped.append(p)
+    if (fp <= tol) != (fq <= tol):
+      t = fp / (fp - fq)
+      clipped.append((p[0] + t * (q[0] - p[0]), p[1] + t * (q[1] - p[1])))
+  # drop repeated vertices left by clipping through a corner
+  deduped = []
+  for p in clipped:
+    if not deduped or not np.allclose(p, deduped[-1], rtol=1e-12, atol=0.):
+      deduped.append(p)
+  if len(deduped) > 1 and np.allclose(deduped[0], deduped[-1], rtol=1e-12, atol=0.):
+    deduped.pop()
+  return deduped
+
+
+def polygon_area(polygon):
+  if len(polygon) < 3:
+    return 0.
+  r = np.array([p[0] for p in polygon])
+  w = np.array([p[1] for p in polygon])
+  return 0.5 * abs(np.dot(r, np.roll(w, -1)) - np.dot(w, np.roll(r, -1)))
+
+
+def line_equation(label_a, label_b, line):
+  return "{} = {} where {:.6g} + {:.6g} * read_freq + {:.6g} * write_freq = 0".format(label_a, label_b, line[0], line[1], line[2])
+
+
+def crossover_regions(access_pattern, nvsim_input_cfgs, nvsim_outputs, labels=None,
+                      read_range=READ_FREQ_RANGE, write_range=WRITE_FREQ_RANGE):
+  """ Solves where each design has the lowest total power in (read_freq, write_freq) space. Total power
+  is affine in both frequencies, so every pair of designs crosses over on a line and the region each
+  design wins is a convex polygon; these are computed exactly rather than sampled on a grid. Designs
+  whose NVSim run failed or found no design (see :func:`output_failure`) are left out and listed as skipped.
+
+  :param access_pattern: :class:`PatternConfig` providing the read and write sizes
+  :type access_pattern: :class:`PatternConfig`
+  :param nvsim_input_cfgs: :class:`NVSimInputConfig` objects which were used for array simulation
+  :param nvsim_outputs: parsed NVSim results, one per input cfg
+  :param labels: name per design (e.g., its cell file); defaults to design0, design1, ...
+  :type labels: list of Strings
+  :param read_range: (min, max) reads per second to solve over
+  :param write_range: (min, max) writes per second to solve over
+  :return: dict with the designs' power coefficients, every pairwise crossover line, the winning
+    region of each design as a polygon of (read_freq, write_freq) vertices, the boundary segments
+    between adjacent regions, and the designs skipped with the reason
+  :rtype: dict
+  """
+  if labels is None:
+    labels = ["design{}".format(i) for i in range(len(nvsim_outputs))]
+  skipped = [{"design": labels[i], "reason": output_failure(nvsim_outputs[i])} for i in range(len(nvsim_outputs)) if output_failure(nvsim_outputs[i]) is not None]
+  usable = [i for i in range(len(nvsim_outputs)) if output_failure(nvsim_outputs[i]) is None]
+  nvsim_input_cfgs = [nvsim_input_cfgs[i] for i in usable]
+  nvsim_outputs = [nvsim_outputs[i] for i in usable]
+  labels = [labels[i] for i in usable]
+  coefficients = [power_coefficients(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i]) for i in range(len(nvsim_outputs))]
+  domain = [(read_range[0], write_range[0]), (read_range[1], write_range[0]), (read_range[1], write_range[1]), (read_range[0], write_range[1])]
+  domain_area = polygon_area(domain)
+
+  def line_tol(line):
+    # power differences below this are rounding noise at the far corner of the domain
+    return 1e-12 * (abs(line[0]) + abs(line[1]) * max(abs(r) for r in read_range) + abs(line[2]) * max(abs(w) for w in write_range))
+
+  lines = []
+  for i in range(len(coefficients)):
+    for j in range(i + 1, len(coefficients)):
+      line = coefficients[i] - coefficients[j]
+      lines.append({"designs": [labels[i], labels[j]],
+                    "coefficients": line.tolist(),
+                    "equation": line_equation(labels[i], labels[j], line)})
+
+  polygons = []
+  for i in range(len(coefficients)):
+    polygon = list(domain)
+    for j in range(len(coefficients)):
+      if j == i:
+        continue
+      line = coefficients[i] - coefficients[j]
+      if not line.any() and j < i:
+        # identical designs: the first one claims the region
+        polygon = []
+      if not polygon:
+        break
+      polygon = clip_polygon(polygon, line, line_tol(line))
+    if polygon_area(polygon) <= 1e-12 * domain_area:
+      polygon = []
+    polygons.append(polygon)
+
+  regions = []
+  boundaries = []
+  for i in range(len(coefficients)):
+    if not polygons[i]:
+      continue
+    regions.append({"design": labels[i],
+                    "polygon": [[float(p[0]), float(p[1])] for p in polygons[i]],
+                    "area_fraction": float(polygon_area(polygons[i]) / domain_area) if domain_area > 0 else 0.})
+    for k in range(len(polygons[i])):
+      p, q = polygons[i][k], polygons[i][(k + 1) % len(polygons[i])]
+      for j in range(i + 1, len(coefficients)):
+        if not polygons[j]:
+          continue
+        line = coefficients[i] - coefficients[j]
+        tol = line_tol(line)
+        if abs(line[0] + line[1] * p[0] + line[2] * p[1]) <= tol and abs(line[0] + line[1] * q[0] + line[2] * q[1]) <= tol:
+          boundaries.append({"designs": [labels[i], labels[j]], "segment": [[float(p[0]), float(p[1])], [float(q[0]), float(q[1])]]})
+
+  return {"metric": "Total Power",
+          "read_range": list(read_range),
+          "write_range": list(write_range),
+          "designs": [{"design": labels[i], "leakage_power": float(coefficients[i][0]), "power_per_read_freq": float(coefficients[i][1]),
+                       "power_per_write_freq": float(coefficients[i][2])} for i in range(len(coefficients))],
+          "lines": lines,
+          "regions": regions,
+          "boundaries": boundaries,
+          "skipped": skipped}
+
+
+def best_design(regions, read_freq, write_freq):
+  """ Returns the label of the design with the lowest total power at one traffic point, using the
+  coefficients from :func:`crossover_regions`
+  """
+  powers = [d["leakage_power"] + d["power_per_read_freq"] * read_freq + d["power_per_write_freq"] * write_freq for d in regions["designs"]]
+  return regions["designs"][int(np.argmin(powers))]["design"]
+
+
+def write_crossover_regions(path, regions_list):
+  """ Writes crossover solutions (a list of dicts from :func:`crossover_regions`, each with any extra
+  study details added) to a json file
+  """
+  tmp_path = path + ".tmp"
+  with open(tmp_path, "w") as f:
+    json.dump({"crossovers": regions_list}, f, indent=1)
+  os.replace(tmp_path, path)
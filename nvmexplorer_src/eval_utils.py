@@ -2,9 +2,9 @@ import nvmexplorer_src.input_defs
 import os
 import numpy as np
 #import gspread
-import fileinput
 #from oauth2client.service_account import ServiceAccountCredentials
 import csv
+from nvmexplorer_src.results_store import write_columnar_results, read_results_csv, COLUMNAR_FORMATS
 
 def parse_nvsim_input_file(file_path): # helper function to parse cell cfgs and mem cfgs
   headers = []
@@ -20,6 +20,165 @@ def parse_nvsim_input_file(file_path): # helper function to parse cell cfgs and
         line = fp.readline()
   return headers, vals
 
+cfg_fields_cache = {} # (cell cfg path, mem cfg path) -> (file stamps, cell/mem headers, cell/mem vals)
+
+def load_cfg_fields(cell_cfg_path, mem_cfg_path): # helper to parse a cell cfg and mem cfg pair once and reuse it across rows
+  stamps = []
+  for path in [cell_cfg_path, mem_cfg_path]:
+    stat = os.stat(path)
+    stamps.append((stat.st_mtime_ns, stat.st_size))
+  cached = cfg_fields_cache.get((cell_cfg_path, mem_cfg_path))
+  if cached is not None and cached[0] == stamps:
+    return cached[1], cached[2]
+
+  # Remove empty lines from cfg file to make processing easier
+  with open(mem_cfg_path) as fp:
+    mem_lines = fp.readlines()
+  if any(not line.rstrip() for line in mem_lines):
+    with open(mem_cfg_path, "w") as fp:
+      fp.writelines([line for line in mem_lines if line.rstrip()])
+    stat = os.stat(mem_cfg_path)
+    stamps[1] = (stat.st_mtime_ns, stat.st_size)
+
+  cell_headers, cell_vals = parse_nvsim_input_file(cell_cfg_path)
+  mem_headers, mem_vals = parse_nvsim_input_file(mem_cfg_path)
+  headers = tuple(cell_headers + mem_headers)
+  vals = tuple(cell_vals + mem_vals)
+  cfg_fields_cache[(cell_cfg_path, mem_cfg_path)] = (stamps, headers, vals)
+  return headers, vals
+
+class ResultsWriter:
+  def __init__(self,
+		csv_file_path="output/results/results.csv", #csv file rows are appended to
+		batch_size=4096, #number of rows buffered before they are written out
+		columnar_formats=[], #also write a typed copy of the results in these formats ("parquet", "feather")
+		sinks=[] #other results stores (e.g., SQLiteResultsSink) that receive the file's rows when the writer is closed
+		):
+    self.csv_file_path = csv_file_path
+    self.batch_size = batch_size
+    self.columnar_formats = columnar_formats
+    self.sinks = sinks
+    self.rows = []
+    self.fp = None
+    self.wr = None
+
+  def writerow(self, row):
+    self.rows.append(row)
+    if len(self.rows) >= self.batch_size:
+      self.flush()
+
+  def flush(self):
+    if not self.rows:
+      return
+    if self.fp is None:
+      self.fp = open(self.csv_file_path, "a", newline='')
+      self.wr = csv.writer(self.fp, dialect='excel')
+    self.wr.writerows(self.rows)
+    self.fp.flush()
+    self.rows = []
+
+  def close(self):
+    self.flush()
+    if self.fp is None:
+      return
+    self.fp.close()
+    self.fp = None
+    self.wr = None
+    if self.columnar_formats or self.sinks:
+      # every row of the file, including rows appended before the writer was last closed, since the
+      # columnar copies and sinks replace whatever they hold for the file
+      headers, rows = read_results_csv(self.csv_file_path)
+      for results_format in self.columnar_formats:
+        write_columnar_results(self.csv_file_path, headers, rows, results_format)
+      for sink in self.sinks:
+        sink.write_results(self.csv_file_path, headers, rows, results_metadata.get(self.csv_file_path, {}))
+
+results_writers = {} # csv path -> ResultsWriter shared by everything reporting to that file
+results_columnar_formats = [] # columnar formats written alongside every results csv
+results_sinks = [] # extra results stores every ResultsWriter reports to
+results_metadata = {} # csv path -> study details (cell_type, capacity, opt_target, bits_per_cell, exp_name) for sinks
+results_fragments = set() # csv paths that are pieces of a larger results file, written without columnar copies or sinks
+results_extra_columns = {} # (cell cfg path, mem cfg path) -> (headers, values) appended to every row reported for that cell and mem cfg
+
+def add_results_sink(sink):
+  """ Registers a results store (e.g., :class:`SQLiteResultsSink`) that receives every results file's rows.
+  A file can be reported more than once (e.g., when a study is re-run); a sink replaces the rows it
+  holds for that file each time.
+  """
+  results_sinks.append(sink)
+
+def set_results_metadata(csv_file_path, metadata):
+  """ Attaches study details to a results csv so sinks can index its rows
+  """
+  results_metadata[csv_file_path] = metadata
+
+def set_results_fragment(csv_file_path):
+  """ Marks a csv as one piece of a results file that is assembled later (see :func:`publish_results`),
+  so it is written as plain csv without columnar copies and without reporting to sinks
+  """
+  results_fragments.add(csv_file_path)
+
+def publish_results(csv_file_path, headers, rows):
+  """ Writes the columnar copies of a results file assembled from fragments and reports its rows to the
+  results sinks, as :meth:`ResultsWriter.close` does for a file written directly. Sinks receive every
+  row of the file, including rows reused from an earlier run, and replace what they hold for it.
+  """
+  for results_format in results_columnar_formats:
+    write_columnar_results(csv_file_path, headers, rows, results_format)
+  for sink in results_sinks:
+    sink.write_results(csv_file_path, headers, rows, results_metadata.get(csv_file_path, {}))
+
+def set_extra_columns(cell_cfg_path, mem_cfg_path, headers, values):
+  """ Appends columns (e.g., flags for interpolated results) to the header and every row reported for a
+  cell cfg and mem cfg pair
+  """
+  results_extra_columns[(cell_cfg_path, mem_cfg_path)] = (list(headers), list(values))
+
+def set_results_formats(formats):
+  """ Selects which columnar formats ("parquet", "feather") are written next to each results csv.
+  "csv" is always written and "sqlite" is handled by registering a :class:`SQLiteResultsSink`.
+  """
+  for results_format in formats:
+    if results_format not in ["csv", "sqlite"] and results_format not in COLUMNAR_FORMATS:
+      raise ValueError("Unknown results format {}; expected csv, sqlite, or one of {}".format(results_format, list(COLUMNAR_FORMATS)))
+  results_columnar_formats[:] = [f for f in formats if f in COLUMNAR_FORMATS]
+
+def get_results_writer(csv_file_path):
+  """ Returns the long-lived, buffered :class:`ResultsWriter` for csv_file_path, creating it if needed
+  """
+  if csv_file_path not in results_writers:
+    if csv_file_path in results_fragments:
+      results_writers[csv_file_path] = ResultsWriter(csv_file_path)
+    else:
+      results_writers[csv_file_path] = ResultsWriter(csv_file_path, columnar_formats=list(results_columnar_formats), sinks=list(results_sinks))
+  return results_writers[csv_file_path]
+
+def close_results_writers():
+  """ Flushes and closes every open :class:`ResultsWriter`; call before reading results files back
+  """
+  for writer in results_writers.values():
+    writer.close()
+  results_writers.clear()
+
+def write_benchmark_row(csv_file_path, cell_cfg_path, mem_cfg_path, row_to_insert): # helper to append one benchmark result row to a results csv
+  cfg_headers, cfg_vals = load_cfg_fields(cell_cfg_path, mem_cfg_path)
+
+  if "1BPC" in csv_file_path:
+    bits_per_cell = 1
+  elif "2BPC" in csv_file_path:
+    bits_per_cell = 2
+  elif "3BPC" in csv_file_path:
+    bits_per_cell = 3
+  else:
+    bits_per_cell = 1
+
+  row = list(cfg_vals)
+  row.extend(row_to_insert)
+  row.append(bits_per_cell)
+  if (cell_cfg_path, mem_cfg_path) in results_extra_columns:
+    row.extend(results_extra_columns[(cell_cfg_path, mem_cfg_path)][1])
+  get_results_writer(csv_file_path).writerow(row)
+
 class ExperimentResult:
   def __init__(self,
 		access_pattern = nvmexplorer_src.input_defs.access_pattern.PatternConfig(),
@@ -94,70 +253,31 @@ class ExperimentResult:
 
   def report_header_benchmark(self, to_csv, csv_file_path, cell_cfg_path, mem_cfg_path): #FIXME report all results
     #FIXME: make extra parameters as kwargs
-    
-    # Remove empty lines from cfg file to make processing easier
-    for line in fileinput.FileInput(mem_cfg_path,inplace=1):
-        if line.rstrip():
-            print(line, end="")
-
-    cell_headers, cell_vals = parse_nvsim_input_file(cell_cfg_path)
-    mem_headers, mem_vals = parse_nvsim_input_file(mem_cfg_path)
+    cfg_headers, cfg_vals = load_cfg_fields(cell_cfg_path, mem_cfg_path)
 
     row_to_insert = ["Benchmark Name", "Read Accesses", "Write Accesses", "Total Dynamic Read Power (mW)", "Total Dynamic Write Power (mW)", "Total Power", "Total Dynamic Read Energy (mJ)", "Total Dynamic Write Energy (mJ)", "Total Read Latency (ms)", "Total Write Latency (ms)", "Read BW Util", "Write BW Util", "Area (mm^2)", "Area Efficiency (percent)", "Read Latency (ns)", "Write Latency (ns)", "Read Energy (pJ)", "Write Energy (pJ)", "Leakage Power (mW)", "Bits Per Cell"]
-    
 
-    cell_headers.extend(mem_headers)
+    cell_headers = list(cfg_headers)
     cell_headers.extend(row_to_insert)
+    if (cell_cfg_path, mem_cfg_path) in results_extra_columns:
+      cell_headers.extend(results_extra_columns[(cell_cfg_path, mem_cfg_path)][0])
     row_to_insert = cell_headers
 
-    with open(csv_file_path, "a+", newline='') as fp:
-      wr = csv.writer(fp, dialect='excel')
-      wr.writerow(row_to_insert)
+    get_results_writer(csv_file_path).writerow(row_to_insert)
 
   def report_result_benchmark(self, to_csv, csv_file_path, cell_cfg_path, mem_cfg_path, access_pattern):
     #FIXME: make extra parameters as kwargs
-    
-    # Remove empty lines from cfg file to make processing easier
-    for line in fileinput.FileInput(mem_cfg_path,inplace=1):
-        if line.rstrip():
-            print(line, end="")
-
-    cell_headers, cell_vals = parse_nvsim_input_file(cell_cfg_path)
-    mem_headers, mem_vals = parse_nvsim_input_file(mem_cfg_path)
-
-    if "1BPC" in csv_file_path:
-      bits_per_cell = 1
-    elif "2BPC" in csv_file_path:
-      bits_per_cell = 2
-    elif "3BPC" in csv_file_path:
-      bits_per_cell = 3
-    else:
-      bits_per_cell = 1
-
-    row_to_insert = [access_pattern.benchmark_name, access_pattern.read_freq, access_pattern.write_freq, self.total_dynamic_read_power, self.total_dynamic_write_power, self.total_power, self.total_read_energy, self.total_write_energy, self.total_read_latency, self.total_write_latency, self.read_bw_utilization, self.write_bw_utilization, self.output.area, self.output.area_efficiency, self.output.read_latency, self.output.write_latency, self.output.read_energy, self.output.write_energy, self.output.leakage_power, bits_per_cell]
-
-    cell_vals.extend(mem_vals)
-    cell_vals.extend(row_to_insert)
-    row_to_insert = cell_vals
-    
-    with open(csv_file_path, "a", newline='') as fp:
-      wr = csv.writer(fp, dialect='excel')
-      wr.writerow(row_to_insert)
+    row_to_insert = [access_pattern.benchmark_name, access_pattern.read_freq, access_pattern.write_freq, self.total_dynamic_read_power, self.total_dynamic_write_power, self.total_power, self.total_read_energy, self.total_write_energy, self.total_read_latency, self.total_write_latency, self.read_bw_utilization, self.write_bw_utilization, self.output.area, self.output.area_efficiency, self.output.read_latency, self.output.write_latency, self.output.read_energy, self.output.write_energy, self.output.leakage_power]
+    write_benchmark_row(csv_file_path, cell_cfg_path, mem_cfg_path, row_to_insert)
  
   def report_header_gSheet(self, to_csv, csv_file_path, cell_cfg_path, mem_cfg_path, write_accesses_header, read_accesses_header, sheet_id): #FIXME report all results
     #FIXME: make extra parameters as kwargs
     
-    # Remove empty lines from cfg file to make processing easier
-    for line in fileinput.FileInput(mem_cfg_path,inplace=1):
-        if line.rstrip():
-            print(line, end="")
-
-    cell_headers, cell_vals = parse_nvsim_input_file(cell_cfg_path)
-    mem_headers, mem_vals = parse_nvsim_input_file(mem_cfg_path)
+    cfg_headers, cfg_vals = load_cfg_fields(cell_cfg_path, mem_cfg_path)
+    cell_headers = list(cfg_headers)
 
     row_to_insert = [write_accesses_header, read_accesses_header, "Total Dynamic Read Power (mW)", "Total Dynamic Write Power (mW)", "Total Power", "Total Dynamic Read Energy (mJ)", "Total Dynamic Write Energy (mJ)", "Total Read Latency (ms)", "Total Write Latency (ms)", "Read BW Util", "Write BW Util", "Area (mm^2)", "Area Efficiency (percent)", "Read Latency (ns)", "Write Latency (ns)", "Read Energy (pJ)", "Write Energy (pJ)", "Leakage Power (mW)"]
    
-    cell_headers.extend(mem_headers)
     cell_headers.extend(row_to_insert)
     row_to_insert = cell_headers
 
@@ -180,17 +300,11 @@ class ExperimentResult:
   def report_result_gSheet(self, to_csv, csv_file_path, cell_cfg_path, mem_cfg_path, num_write_accesses, num_read_accesses, sheet_id):
     #FIXME: make extra parameters as kwargs
     
-    # Remove empty lines from cfg file to make processing easier
-    for line in fileinput.FileInput(mem_cfg_path,inplace=1):
-        if line.rstrip():
-            print(line, end="")
-
-    cell_headers, cell_vals = parse_nvsim_input_file(cell_cfg_path)
-    mem_headers, mem_vals = parse_nvsim_input_file(mem_cfg_path)
+    cfg_headers, cfg_vals = load_cfg_fields(cell_cfg_path, mem_cfg_path)
+    cell_vals = list(cfg_vals)
 
     row_to_insert = [num_write_accesses, num_read_accesses, self.total_dynamic_read_power, self.total_dynamic_write_power, self.total_power, self.total_read_energy, self.total_write_energy, self.total_read_latency, self.total_write_latency, self.read_bw_utilization, self.write_bw_utilization, self.output.area, self.output.area_efficiency, self.output.read_latency, self.output.write_latency, self.output.read_energy, self.output.write_energy, self.output.leakage_power]
 
-    cell_vals.extend(mem_vals)
     cell_vals.extend(row_to_insert)
     row_to_insert = cell_vals
     
@@ -205,3 +319,88 @@ class ExperimentResult:
       with open(csv_file_path, "a") as fp:
         wr = csv.writer(fp, dialect='excel')
         wr.writerow(row_to_insert)
+
+
+class BatchExperimentResult:
+  def __init__(self,
+		access_pattern = nvmexplorer_src.input_defs.access_pattern.PatternConfig(), #template for read/write sizes and totals
+		nvsim_input_cfgs = [], #one NVSimInputConfig per cell
+		nvsim_outputs = [], #one NVSimOutputConfig per cell
+		read_freq = [], #reads/s for each traffic point
+		write_freq = [], #writes/s for each traffic point
+		write_latency_scale = 1. #optional per-point scaling of the array write latency
+		):
+    # Evaluates every (cell, traffic point) pair at once; each result is a (num cells, num points) array
+    self.access_pattern = access_pattern
+    self.input_cfgs = nvsim_input_cfgs
+    self.outputs = nvsim_outputs
+    self.read_freq = np.asarray(read_freq, dtype=float)
+    self.write_freq = np.asarray(write_freq, dtype=float)
+    self.write_latency_scale = np.broadcast_to(np.asarray(write_latency_scale, dtype=float), self.read_freq.shape)
+
+  def output_column(self, attr):
+    return np.array([float(getattr(output, attr)) for output in self.outputs])[:, None]
+
+  def evaluate(self):
+    """ Computes the same quantities as :meth:`ExperimentResult.evaluate` for every cell and
+    traffic point using NumPy broadcasting
+    """
+    access_pattern = self.access_pattern
+    word_width = np.array([float(cfg.word_width) for cfg in self.input_cfgs])[:, None]
+    read_freq = self.read_freq[None, :]
+    write_freq = self.write_freq[None, :]
+
+    #if frequency unavailable, approx using total reads & total ins, & freq
+    self.missing_freq = (self.read_freq == -1) | (self.write_freq == -1)
+    if np.any(self.missing_freq):
+      with np.errstate(divide='ignore', invalid='ignore'):
+        read_freq = np.where(self.missing_freq[None, :], (access_pattern.total_reads / access_pattern.total_ins) / 1.e8, read_freq)
+        write_freq = np.where(self.missing_freq[None, :], (access_pattern.total_writes / access_pattern.total_ins) / 1.e8, write_freq)
+    self.approx_read_freq = read_freq[0]
+    self.approx_write_freq = write_freq[0]
+
+    read_energy = self.output_column("read_energy")
+    write_energy = self.output_column("write_energy")
+    read_latency = self.output_column("read_latency")
+    self.write_latency = self.output_column("write_latency") * self.write_latency_scale[None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+      self.read_per_s = np.ceil((8 * access_pattern.read_size * read_freq) / word_width)
+      self.total_dynamic_read_power = self.read_per_s * read_energy / 1000. / 1000. / 1000. #scale to mW
+      self.write_per_s = np.ceil((8 * access_pattern.write_size * write_freq) / word_width)
+      self.total_dynamic_write_power = self.write_per_s * write_energy / 1000. / 1000. /1000. #scale to mW
+
+      #total power = leakage + reads + writes
+      self.total_power = self.output_column("leakage_power") + self.total_dynamic_read_power + self.total_dynamic_write_power
+
+      if (access_pattern.total_reads == -1):
+        #For 1 s timescale assumption, total energy = dynamic power * 1s
+        self.total_read_energy = self.total_dynamic_read_power
+        self.total_write_energy = self.total_dynamic_write_power
+        self.total_read_latency = self.read_per_s * read_latency / 1000. / 1000. #scale to ms
+        self.total_write_latency = self.write_per_s * self.write_latency / 1000. / 1000. #scale to ms
+      else:
+        total_read_access = np.ceil((8 * access_pattern.total_reads * access_pattern.read_size) / word_width)
+        self.total_read_energy = np.broadcast_to(total_read_access * read_energy / 1000. / 1000. / 1000., self.total_power.shape) #scale to mJ
+        total_write_access = np.ceil((8 * access_pattern.total_writes * access_pattern.write_size) / word_width)
+        self.total_write_energy = np.broadcast_to(total_write_access * write_energy / 1000. / 1000. /1000., self.total_power.shape) #scale to mJ
+        self.total_read_latency = np.broadcast_to(total_read_access * read_latency / 1000. / 1000., self.total_power.shape) #scale to ms
+        self.total_write_latency = total_write_access * self.write_latency / 1000. / 1000. #scale to ms
+
+      #BW utilization by total bytes transferred per s / reported BW
+      self.read_bw_utilization = ((self.read_per_s * word_width) / (self.output_column("read_bw") * 8e9)) * 100
+      self.write_bw_utilization = ((self.write_per_s * word_width) / (self.output_column("write_bw") * 8e9)) * 100
+
+  def report_result_benchmark(self, to_csv, csv_file_path, cell_cfg_path, mem_cfg_path, access_pattern, cell_index, point_index):
+    """ Writes the row for one (cell, traffic point) pair in the same format as
+    :meth:`ExperimentResult.report_result_benchmark`
+    """
+    c = cell_index
+    p = point_index
+    output = self.outputs[c]
+    if self.missing_freq[p]:
+      # like ExperimentResult.evaluate, leave the approximated frequencies on the access pattern, so they are reported
+      access_pattern.read_freq = self.approx_read_freq[p]
+      access_pattern.write_freq = self.approx_write_freq[p]
+    row_to_insert = [access_pattern.benchmark_name, access_pattern.read_freq, access_pattern.write_freq, self.total_dynamic_read_power[c, p], self.total_dynamic_write_power[c, p], self.total_power[c, p], self.total_read_energy[c, p], self.total_write_energy[c, p], self.total_read_latency[c, p], self.total_write_latency[c, p], self.read_bw_utilization[c, p], self.write_bw_utilization[c, p], output.area, output.area_efficiency, output.read_latency, self.write_latency[c, p] if self.write_latency_scale[p] != 1. else output.write_latency, output.read_energy, output.write_energy, output.leakage_power]
+    write_benchmark_row(csv_file_path, cell_cfg_path, mem_cfg_path, row_to_insert)
@@ -0,0 +1,134 @@
+import re
+import csv
+import nvmexplorer_src.input_defs
+
+# NVSimOutputConfig field -> (header patterns, unit -> scale to the field's unit), tried in order against each header
+EXPLORATION_COLUMNS = {
+  "read_latency": ([r"read latency"], {"ns": 1., "ps": 1e-3, "us": 1e3, "ms": 1e6, "s": 1e9}),
+  "write_latency": ([r"write latency"], {"ns": 1., "ps": 1e-3, "us": 1e3, "ms": 1e6, "s": 1e9}),
+  "read_energy": ([r"read (dynamic )?energy"], {"pj": 1., "nj": 1e3, "uj": 1e6, "j": 1e12}),
+  "write_energy": ([r"write (dynamic )?energy"], {"pj": 1., "nj": 1e3, "uj": 1e6, "j": 1e12}),
+  "leakage_power": ([r"leakage"], {"mw": 1., "uw": 1e-3, "nw": 1e-6, "w": 1e3}),
+  "area_efficiency": ([r"area efficiency"], {"%": 1.}),
+  "area": ([r"^(total )?area"], {"mm^2": 1., "um^2": 1e-6, "mm2": 1., "um2": 1e-6}),
+  "read_bw": ([r"read bandwidth"], {"gb/s": 1., "mb/s": 1. / 1024., "kb/s": 1. / 1024. / 1024.}),
+  "write_bw": ([r"write bandwidth"], {"gb/s": 1., "mb/s": 1. / 1024., "kb/s": 1. / 1024. / 1024.}),
+}
+# default unit when a header gives none, i.e., the unit NVSimOutputConfig uses
+EXPLORATION_DEFAULT_UNITS = {"read_latency": "ns", "write_latency": "ns", "read_energy": "pj", "write_energy": "pj",
+                             "leakage_power": "mw", "area_efficiency": "%", "area": "mm^2", "read_bw": "gb/s", "write_bw": "gb/s"}
+# columns a candidate needs for every optimization target to be selectable
+EXPLORATION_REQUIRED = ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area"]
+
+# NVSim optimization target -> figure of merit (lower is better) of a candidate organization
+OPT_TARGET_METRICS = {
+  "ReadLatency": lambda c: c["read_latency"],
+  "WriteLatency": lambda c: c["write_latency"],
+  "ReadDynamicEnergy": lambda c: c["read_energy"],
+  "WriteDynamicEnergy": lambda c: c["write_energy"],
+  "ReadEDP": lambda c: c["read_latency"] * c["read_energy"],
+  "WriteEDP": lambda c: c["write_latency"] * c["write_energy"],
+  "LeakagePower": lambda c: c["leakage_power"],
+  "Area": lambda c: c["area"],
+}
+
+
+def exploration_column(header):
+  """ Returns the NVSimOutputConfig field and unit scale for a full exploration csv header, or (None, None) """
+  name = header.strip().lower()
+  unit = None
+  match = re.search(r"\(([^)]*)\)\s*$", name)
+  if match:
+    unit = match.group(1).strip()
+    name = name[:match.start()].strip()
+  elif name.endswith("%"):
+    unit = "%"
+    name = name[:-1].strip()
+  for field, (patterns, scales) in EXPLORATION_COLUMNS.items():
+    if any(re.search(pattern, name) for pattern in patterns):
+      unit = unit if unit is not None else EXPLORATION_DEFAULT_UNITS[field]
+      if unit not in scales:
+        return None, None
+      return field, scales[unit]
+  return None, None
+
+
+def parse_exploration_csv(filepath):
+  """ Returns every candidate organization NVSim wrote in full exploration mode (-OptimizationTarget: Full),
+  with metrics in the units :class:`NVSimOutputConfig` uses. The parser matches columns by name and unit
+  rather than position, skips blank, repeated header, and incomplete rows (e.g., an invalid organization
+  or a run cut short) and the empty column NVSim's trailing commas leave, and keeps every other column
+  of a candidate as text under "columns".
+
+  :param filepath: path to the csv NVSim wrote to [OutputFilePrefix].csv
+  :type filepath: String
+  :return: one dict of metrics per candidate
+  :rtype: list of dicts
+  """
+  with open(filepath, newline='') as f:
+    rows = [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+  if not rows:
+    raise ValueError("NVSim full exploration output {} is empty".format(filepath))
+  header = [cell.strip() for cell in rows[0]]
+  columns = [exploration_column(name) for name in header]
+  found = set(field for (field, scale) in columns if field is not None)
+  missing = [field for field in EXPLORATION_REQUIRED if field not in found]
+  if missing:
+    raise ValueError("NVSim full exploration output {} has no columns for {}".format(filepath, missing))
+
+  candidates = []
+  for row in rows[1:]:
+    if [cell.strip() for cell in row] == header:
+      continue
+    candidate = {"columns": {}}
+    for (name, (field, scale), cell) in zip(header, columns, row):
+      cell = cell.strip()
+      if field is None:
+        if name:
+          candidate["columns"][name] = cell
+        continue
+      try:
+        value = float(cell.rstrip("%")) * scale
+      except ValueError:
+        continue
+      if field not in candidate:
+        candidate[field] = value
+    if all(field in candidate and candidate[field] > 0 for field in EXPLORATION_REQUIRED):
+      candidates.append(candidate)
+  return candidates
+
+
+def select_candidate(candidates, opt_target):
+  """ Returns the candidate organization NVSim would have picked for opt_target, i.e., the one with the
+  lowest figure of merit; ties go to the first candidate, as in NVSim
+
+  :rtype: dict
+  """
+  if opt_target not in OPT_TARGET_METRICS:
+    raise ValueError("Unknown optimization target {}; expected one of {}".format(opt_target, list(OPT_TARGET_METRICS)))
+  if not candidates:
+    raise ValueError("No valid candidate organizations to select a {} design from".format(opt_target))
+  return min(candidates, key=OPT_TARGET_METRICS[opt_target])
+
+
+def parse_exploration_output(filepath, input_cfg):
+  """ Returns a :class:`NVSimOutputConfig` for the candidate in a full exploration csv that wins on
+  input_cfg.opt_target. Bandwidths missing from the csv are taken as one word per access latency.
+
+  :param filepath: path to the full exploration csv
+  :type filepath: String
+  :param input_cfg: :class:`NVSimInputConfig` of the requested design
+  :type input_cfg: :class:`NVSimInputConfig`
+  :rtype: :class:`NVSimOutputConfig`
+  """
+  candidate = select_candidate(parse_exploration_csv(filepath), input_cfg.opt_target)
+  nvsim_output = nvmexplorer_src.input_defs.nvsim_interface.NVSimOutputConfig(input_cfg=input_cfg)
+  for field in EXPLORATION_COLUMNS:
+    if field in candidate:
+      setattr(nvsim_output, field, candidate[field])
+  if "read_bw" not in candidate:
+    nvsim_output.read_bw = input_cfg.word_width / 8. / candidate["read_latency"]
+  if "write_bw" not in candidate:
+    nvsim_output.write_bw = input_cfg.word_width / 8. / candidate["write_latency"]
+  nvsim_output.candidate_columns = candidate["columns"]
+  return nvsim_output
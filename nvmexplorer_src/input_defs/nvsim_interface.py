@@ -1,5 +1,6 @@
 #initialize class for nvsim output class, to be extracted from parsed nvsim results and pickled as input to the analytical model
 #per-technology specifications can be inherit
+import os
 from nvmexplorer_src.input_defs.cell_cfgs import *
 
 class NVSimInputConfig:
@@ -33,6 +34,32 @@ class NVSimInputConfig:
       cfg_file.write("-CellLevels: %d\n" % cell_levels+"\n")
     cfg_file.close()
 
+  def generate_exploration_cfg(self, cfg_path, output_prefix):
+    """ Creates a memory config file like :meth:`generate_mem_cfg` but with NVSim exploring every
+    organization (-OptimizationTarget: Full) and writing each candidate to output_prefix.csv, so one
+    NVSim run serves every optimization target. The file is left alone if it already has this
+    content, since several study points share it and NVSim may be reading it.
+
+    :param cfg_path: path to write the exploration cfg to
+    :type cfg_path: String
+    :param output_prefix: NVSim -OutputFilePrefix; the candidates go to output_prefix.csv
+    :type output_prefix: String
+    """
+    cfg_text = self.cell_type.mem_cfg_base
+    cfg_text += "-ProcessNode: %d\n" % self.process_node+"\n"
+    cfg_text += "-OptimizationTarget: Full\n"
+    cfg_text += "-OutputFilePrefix: "+output_prefix+"\n"
+    cfg_text += "-WordWidth (bit): %d\n" % self.word_width+"\n"
+    cfg_text += "-Capacity (MB): %d\n" % self.capacity+"\n"
+    if self.cell_type.mlc > 1:
+      cfg_text += "-CellLevels: %d\n" % 2**(self.cell_type.mlc)+"\n"
+    if os.path.exists(cfg_path):
+      with open(cfg_path) as cfg_file:
+        if cfg_file.read() == cfg_text:
+          return
+    with open(cfg_path, "w") as cfg_file:
+      cfg_file.write(cfg_text)
+
 class NVSimOutputConfig: #initialized to 16nm SRAM, 4MB
   def __init__(self,
 		exp_name="default", #name or ID
@@ -47,7 +74,8 @@ class NVSimOutputConfig: #initialized to 16nm SRAM, 4MB
 		write_energy=-1, #nJ/access
 		leakage_power=-1, #mW
 		area=-1, #mm^2
-		area_efficiency=-1 #percentage
+		area_efficiency=-1, #percentage
+		organization=None #bank/mat/mux organization NVSim chose, and the active mats and subarrays, if reported
 		):
     # define all parameters
     self.exp_name = exp_name
@@ -61,6 +89,7 @@ class NVSimOutputConfig: #initialized to 16nm SRAM, 4MB
     self.leakage_power = leakage_power
     self.area = area
     self.area_efficiency = area_efficiency
+    self.organization = organization
 
   def print_summary(self):
     """ Prints a summary of the parsed NVSim output results
@@ -76,6 +105,26 @@ class NVSimOutputConfig: #initialized to 16nm SRAM, 4MB
     print("Area (mm^2): %f" % self.area)
     print("Area Efficiency (percent): %f" % self.area_efficiency)
 
+# array characteristics every simulated design has; they stay at -1 if NVSim found no design or failed
+ARRAY_METRICS = ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area"]
+
+def output_failure(nvsim_output):
+  """ Returns why a parsed NVSim result does not describe a simulated design, or None if it does: its
+  NVSim run failed (failure is set by :class:`NVSimPool`), or an array characteristic is missing
+  (non-positive), as in a default :class:`NVSimOutputConfig`. Such results must not compete with
+  real designs, which their -1 energies and leakage would beat everywhere.
+
+  :param nvsim_output: parsed NVSim result
+  :type nvsim_output: :class:`NVSimOutputConfig`
+  :rtype: String
+  """
+  if getattr(nvsim_output, "failure", None) is not None:
+    return nvsim_output.failure
+  missing = [metric for metric in ARRAY_METRICS if getattr(nvsim_output, metric) <= 0]
+  if missing:
+    return "no {} in the NVSim result".format(", ".join(missing))
+  return None
+
 def parse_nvsim_output(filepath='output_examples/sram_0', input_cfg=NVSimInputConfig()):
   """ Returns a :class:`NVSimOutputConfig` object which gets populated with the output results in
   parsed from file_path. 
@@ -96,7 +145,28 @@ def parse_nvsim_output(filepath='output_examples/sram_0', input_cfg=NVSimInputCo
   # Get rid of new lines
   lines = map(lambda x: x.rstrip(), lines)
 
+  organization = {}
+  section = None
   for line in lines:
+    #winning organization, e.g., "Bank Organization: 4 x 2", followed by " - Row Activation   : 1 / 4" and
+    #" - Column Activation: 1 / 2" (active / total), and " - Senseamp Mux      : 8"
+    if line.startswith('Bank Organization:'):
+      section = "bank"
+      organization["bank"] = [int(n) for n in line[line.index(":")+1:].split("x")]
+    elif line.startswith('Mat Organization:'):
+      section = "mat"
+      organization["mat"] = [int(n) for n in line[line.index(":")+1:].split("x")]
+    elif line.startswith(' - Row Activation') and section is not None:
+      organization.setdefault(section + "_active", [None, None])[0] = int(line[line.index(":")+1:].split("/")[0])
+    elif line.startswith(' - Column Activation') and section is not None:
+      organization.setdefault(section + "_active", [None, None])[1] = int(line[line.index(":")+1:].split("/")[0])
+    elif line.startswith(' - Senseamp Mux'):
+      organization["senseamp_mux"] = int(line[line.index(":")+1:])
+    elif line.startswith(' - Output Level-1 Mux'):
+      organization["output_mux1"] = int(line[line.index(":")+1:])
+    elif line.startswith(' - Output Level-2 Mux'):
+      organization["output_mux2"] = int(line[line.index(":")+1:])
+
     if ' - Total Area =' in line and (base.area == -1):
       # sloppy fix, skip to end of line
       if "=" in line[line.index("=")+1:]:
@@ -172,6 +242,8 @@ def parse_nvsim_output(filepath='output_examples/sram_0', input_cfg=NVSimInputCo
         if line[-2:] == "uJ": #scale to pJ
           base.write_energy = base.write_energy * 1000. * 1000.
         
+  if organization:
+    base.organization = organization
   return base
 
 if __name__ == '__main__':
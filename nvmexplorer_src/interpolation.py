@@ -0,0 +1,128 @@
+import json
+import numpy as np
+import nvmexplorer_src.input_defs
+
+# NVSimOutputConfig fields filled in for interpolated capacities, i.e., every array characteristic the traffic evaluation reads
+INTERPOLATED_METRICS = ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area",
+                        "read_bw", "write_bw", "area_efficiency"]
+# columns added to every results row of a study with interpolation, and their values for simulated rows
+INTERPOLATION_HEADERS = ["Interpolated", "Interpolation Error (%)"]
+SIMULATED_COLUMNS = ["False", ""]
+
+
+def choose_anchors(capacities, anchors=None):
+  """ Returns the capacities NVSim is run at. By default these are every other capacity of the sweep,
+  in increasing order, plus the largest, so every other capacity lies between two anchors.
+
+  :param capacities: capacities of the sweep in MB
+  :type capacities: list of ints
+  :param anchors: capacities to run NVSim at instead of the default; ones not in the sweep are ignored
+  :type anchors: list of ints
+  :rtype: list of ints
+  """
+  capacities = sorted(set(capacities))
+  if anchors is not None:
+    return [capacity for capacity in capacities if capacity in anchors]
+  chosen = capacities[::2]
+  if capacities and capacities[-1] not in chosen:
+    chosen.append(capacities[-1])
+  return chosen
+
+
+def isotonic_fit(x, y):
+  """ Returns the least-squares monotone fit to y over increasing x, non-decreasing or non-increasing,
+  whichever the data trends toward (pool adjacent violators)
+  """
+  y = np.asarray(y, dtype=float)
+  decreasing = len(x) > 1 and np.polyfit(x, y, 1)[0] < 0
+  if decreasing:
+    y = -y
+  blocks = [] # [mean, weight]
+  for value in y:
+    blocks.append([value, 1.])
+    while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+      mean, weight = blocks.pop()
+      blocks[-1] = [(blocks[-1][0] * blocks[-1][1] + mean * weight) / (blocks[-1][1] + weight), blocks[-1][1] + weight]
+  fit = np.concatenate([[mean] * int(weight) for (mean, weight) in blocks])
+  return -fit if decreasing else fit
+
+
+class MonotoneLogModel:
+  def __init__(self,
+                capacities=[1, 4], #anchor capacities in MB
+                values=[1., 4.] #metric at each anchor; must be positive
+                ):
+    # metrics scale roughly as power laws in capacity, so the model is piecewise linear in log-log space,
+    # fit monotone so noise in NVSim's organization choice cannot make it wiggle between anchors
+    order = np.argsort(capacities)
+    self.x = np.log2(np.asarray(capacities, dtype=float)[order])
+    self.y = isotonic_fit(self.x, np.log(np.asarray(values, dtype=float)[order]))
+
+  def predict(self, capacity):
+    x = np.log2(float(capacity))
+    if len(self.x) == 1:
+      return float(np.exp(self.y[0]))
+    # extrapolate along the end segments
+    if x < self.x[0]:
+      slope = (self.y[1] - self.y[0]) / (self.x[1] - self.x[0])
+      return float(np.exp(self.y[0] + slope * (x - self.x[0])))
+    if x > self.x[-1]:
+      slope = (self.y[-1] - self.y[-2]) / (self.x[-1] - self.x[-2])
+      return float(np.exp(self.y[-1] + slope * (x - self.x[-1])))
+    return float(np.exp(np.interp(x, self.x, self.y)))
+
+
+def interpolate_output(anchor_outputs, input_cfg):
+  """ Returns a :class:`NVSimOutputConfig` for input_cfg.capacity from NVSim results of the same cell at
+  anchor capacities, with each metric from a monotone log-log model of the anchors. Metrics an anchor
+  is missing (non-positive, e.g., from a failed NVSim run) are fit on the remaining anchors.
+
+  :param anchor_outputs: anchor capacity -> parsed NVSim result
+  :type anchor_outputs: dict
+  :param input_cfg: :class:`NVSimInputConfig` of the interpolated design
+  :type input_cfg: :class:`NVSimInputConfig`
+  :rtype: :class:`NVSimOutputConfig`
+  """
+  nvsim_output = nvmexplorer_src.input_defs.nvsim_interface.NVSimOutputConfig(input_cfg=input_cfg)
+  for metric in INTERPOLATED_METRICS:
+    points = [(capacity, getattr(output, metric)) for (capacity, output) in anchor_outputs.items() if getattr(output, metric) > 0]
+    if points:
+      setattr(nvsim_output, metric, MonotoneLogModel([c for (c, v) in points], [v for (c, v) in points]).predict(input_cfg.capacity))
+  return nvsim_output
+
+
+def holdout_errors(anchor_outputs):
+  """ Estimates interpolation error by refitting without each anchor that lies between two others and
+  comparing the prediction at its capacity with its NVSim result
+
+  :param anchor_outputs: anchor capacity -> parsed NVSim result
+  :type anchor_outputs: dict
+  :return: metric -> largest relative error over the held-out anchors, or an empty dict with fewer than 3 anchors
+  :rtype: dict
+  """
+  capacities = sorted(anchor_outputs)
+  errors = {}
+  for held_out in capacities[1:-1]:
+    rest = dict((capacity, output) for (capacity, output) in anchor_outputs.items() if capacity != held_out)
+    actual = anchor_outputs[held_out]
+    predicted = interpolate_output(rest, actual.input_cfg)
+    for metric in INTERPOLATED_METRICS:
+      if getattr(actual, metric) > 0 and getattr(predicted, metric) > 0:
+        error = abs(getattr(predicted, metric) / getattr(actual, metric) - 1.)
+        errors[metric] = max(errors.get(metric, 0.), error)
+  return errors
+
+
+def interpolated_columns(errors):
+  """ Returns the flag columns of an interpolated row: the largest held-out relative error over all
+  metrics, in percent, or empty if it could not be estimated
+  """
+  if not errors:
+    return ["True", ""]
+  return ["True", "%.2f" % (100. * max(errors.values()))]
+
+
+def write_interpolation_report(report_path, records):
+  """ Writes the anchors, held-out errors, and interpolated capacities of every interpolated cell """
+  with open(report_path, "w") as f:
+    json.dump(records, f, indent=1, sort_keys=True)
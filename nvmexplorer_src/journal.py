@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+import threading
+
+
+def file_digest(path):
+  """ Returns the sha256 of a file's contents, or None if it does not exist """
+  if not os.path.exists(path):
+    return None
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def inputs_digest(inputs):
+  """ Returns a digest of any json-serializable description of a unit's inputs """
+  return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StudyJournal:
+  def __init__(self,
+                journal_path="output/results/default-journal.jsonl", #append-only record of the study's finished units of work
+                resume=False #keep the records of an earlier, interrupted run of the study instead of starting a new journal
+                ):
+    # each line is one finished unit: an NVSim job ("nvsim") or the traffic evaluation of a study point ("evaluate"),
+    # with a digest of its inputs and of what it wrote, so resumed work is only skipped if nothing it depends on changed
+    self.journal_path = journal_path
+    self.resume = resume
+    self.records = {} # (unit, key) -> latest record
+    self.lock = threading.Lock()
+    journal_dir = os.path.dirname(self.journal_path)
+    if journal_dir and not os.path.exists(journal_dir):
+      os.makedirs(journal_dir, exist_ok=True)
+    if resume and os.path.exists(self.journal_path):
+      complete_size = 0
+      with open(self.journal_path, 'rb') as f:
+        for line in f:
+          if not line.endswith(b"\n"):
+            # the last line is cut short if the study was killed while writing it
+            break
+          complete_size += len(line)
+          try:
+            record = json.loads(line)
+          except ValueError:
+            continue
+          self.records[(record["unit"], record["key"])] = record
+      # drop the partial line so new records start on a line of their own
+      with open(self.journal_path, 'r+b') as f:
+        f.truncate(complete_size)
+    self.fp = open(self.journal_path, "a" if resume else "w")
+
+  def record(self, unit, key, **fields):
+    """ Appends a finished unit of work to the journal and syncs it to disk before returning, so a
+    crash right after never loses a unit the study went on to depend on
+
+    :param unit: kind of work, "nvsim" or "evaluate"
+    :type unit: String
+    :param key: identifies the unit within the study (e.g., the path it wrote)
+    :type key: String
+    """
+    record = dict(fields, unit=unit, key=key)
+    with self.lock:
+      self.fp.write(json.dumps(record, sort_keys=True) + "\n")
+      self.fp.flush()
+      os.fsync(self.fp.fileno())
+      self.records[(unit, key)] = record
+
+  def completed(self, unit, key, inputs, output_path=None):
+    """ Returns whether a unit finished in this or a resumed run with the same inputs digest, and,
+    if it wrote output_path, that the file is still exactly what was written
+
+    :rtype: bool
+    """
+    with self.lock:
+      record = self.records.get((unit, key))
+    if record is None or record.get("inputs") != inputs:
+      return False
+    if output_path is not None and file_digest(output_path) != record.get("output_digest"):
+      return False
+    return True
+
+  def count(self, unit):
+    return len([key for key in self.records if key[0] == unit])
+
+  def close(self):
+    if self.fp is not None:
+      self.fp.close()
+      self.fp = None
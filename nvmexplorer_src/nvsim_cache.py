@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import pickle
+import hashlib
+import threading
+
+binary_digests = {} # (path, size, mtime) of an NVSim binary -> sha256 of its contents
+binary_digests_lock = threading.Lock()
+
+
+def nvsim_binary_digest(nvsim_path):
+  """ Returns a digest of the NVSim binary, memoized on its path, size, and mtime so that
+  rebuilding NVSim invalidates every result keyed on it
+  """
+  stat = os.stat(nvsim_path)
+  stamp = (os.path.abspath(nvsim_path), stat.st_size, stat.st_mtime)
+  with binary_digests_lock:
+    if stamp not in binary_digests:
+      digest = hashlib.sha256()
+      with open(nvsim_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+          digest.update(chunk)
+      binary_digests[stamp] = digest.hexdigest()
+    return binary_digests[stamp]
+
+
+def nvsim_run_key(job, nvsim_path):
+  """ Returns the content hash of the NVSim run a :class:`NVSimJob` needs, from its rendered cell file,
+  the mem cfg NVSim runs on, and the NVSim binary. The cell file path and full exploration output
+  prefix are dropped from the cfg so identical runs under different names share a key.
+
+  :param job: NVSim job whose cell file and mem cfg have already been generated
+  :type job: :class:`NVSimJob`
+  :param nvsim_path: path to NVSim binary
+  :type nvsim_path: String
+  :return: hex digest identifying the NVSim run
+  :rtype: String
+  """
+  with open(job.run_cfg_path) as f:
+    cfg_text = f.read()
+  with open(job.input_cfg.cell_type.cell_file_path) as f:
+    cell_text = f.read()
+  cfg_text = re.sub(r"-MemoryCellInputFile:.*\n", "", cfg_text)
+  cfg_text = re.sub(r"-OutputFilePrefix:.*\n", "", cfg_text)
+
+  digest = hashlib.sha256()
+  digest.update(nvsim_binary_digest(nvsim_path).encode())
+  digest.update(b'\0')
+  digest.update(cell_text.encode())
+  digest.update(b'\0')
+  digest.update(cfg_text.encode())
+  return digest.hexdigest()
+
+
+def nvsim_job_key(job, nvsim_path, run_key=None):
+  """ Returns the content hash for the result of a :class:`NVSimJob`: the key of its NVSim run (see
+  :func:`nvsim_run_key`), plus, for a design picked from a full exploration run, the optimization
+  target it was picked for
+
+  :param run_key: the job's run key, if already computed
+  :type run_key: String
+  :return: hex digest identifying the NVSim result
+  :rtype: String
+  """
+  if run_key is None:
+    run_key = nvsim_run_key(job, nvsim_path)
+  if job.exploration_csv is None:
+    return run_key
+  return hashlib.sha256("{}\0{}".format(run_key, job.input_cfg.opt_target).encode()).hexdigest()
+
+
+class NVSimCache:
+  def __init__(self,
+                cache_dir="output/nvsim_cache" #directory holding one pickled NVSimOutputConfig per key
+                ):
+    self.cache_dir = cache_dir
+    if not os.path.exists(self.cache_dir):
+      os.makedirs(self.cache_dir, exist_ok=True)
+
+  def path(self, key):
+    return os.path.join(self.cache_dir, key + ".pkl")
+
+  def load(self, key, input_cfg=None):
+    """ Returns the cached :class:`NVSimOutputConfig` for key, or None on a miss
+
+    :param key: content hash from :func:`nvsim_job_key`
+    :type key: String
+    :param input_cfg: :class:`NVSimInputConfig` to attach to the cached output
+    :type input_cfg: :class:`NVSimInputConfig`
+    """
+    if not os.path.exists(self.path(key)):
+      return None
+    try:
+      with open(self.path(key), 'rb') as f:
+        nvsim_output = pickle.load(f)
+    except (EOFError, pickle.UnpicklingError):
+      return None
+    if input_cfg is not None:
+      nvsim_output.input_cfg = input_cfg
+    return nvsim_output
+
+  def store(self, key, nvsim_output):
+    """ Adds a parsed :class:`NVSimOutputConfig` to the cache. Entries are written to a temporary
+    file first so concurrent readers never see a partial pickle.
+    """
+    tmp_path = "{}.{}.{}.tmp".format(self.path(key), os.getpid(), threading.get_ident())
+    with open(tmp_path, 'wb') as f:
+      pickle.dump(nvsim_output, f)
+    os.replace(tmp_path, self.path(key))
+
+  def failure_path(self, key):
+    return os.path.join(self.cache_dir, key + ".failed.json")
+
+  def load_failure(self, key):
+    """ Returns why NVSim failed on the inputs with this key in an earlier run, or None if it has not
+
+    :param key: content hash from :func:`nvsim_job_key`
+    :type key: String
+    :rtype: String
+    """
+    if not os.path.exists(self.failure_path(key)):
+      return None
+    try:
+      with open(self.failure_path(key)) as f:
+        return json.load(f)["reason"]
+    except (ValueError, KeyError):
+      return None
+
+  def store_failure(self, key, reason, cfg_path=None):
+    """ Records that NVSim cannot simulate the inputs with this key, and why, so later runs can skip
+    them. The record is keyed like a result, so it no longer applies once NVSim or the inputs change.
+    """
+    tmp_path = "{}.{}.{}.tmp".format(self.failure_path(key), os.getpid(), threading.get_ident())
+    with open(tmp_path, 'w') as f:
+      json.dump({"reason": reason, "cfg_path": cfg_path}, f)
+    os.replace(tmp_path, self.failure_path(key))
@@ -0,0 +1,312 @@
+import os
+import re
+import pickle
+import shutil
+import hashlib
+import socket
+import threading
+import subprocess
+import nvmexplorer_src.input_defs
+from nvmexplorer_src.nvsim_cache import nvsim_job_key, nvsim_run_key
+from nvmexplorer_src.exploration import parse_exploration_output
+from nvmexplorer_src.journal import file_digest
+
+
+# messages NVSim prints when a configuration cannot be simulated; matched case-insensitively against each stdout line
+NVSIM_FAILURE_PATTERNS = [r"no valid solution", r"^\s*\[?error\b", r"can ?not (open|find|read)", r"can't (open|find|read)"]
+
+
+def nvsim_failure(lines):
+  """ Returns the first line of NVSim output reporting that the configuration cannot be simulated, or None
+
+  :param lines: NVSim stdout, e.g., an open log file
+  :type lines: iterable of Strings
+  :rtype: String
+  """
+  for line in lines:
+    if any(re.search(pattern, line, re.IGNORECASE) for pattern in NVSIM_FAILURE_PATTERNS):
+      return line.strip()
+  return None
+
+
+def run_nvsim_process(nvsim_path, cfg_path, stdout_log, stderr_log):
+  """ Runs NVSim on one mem cfg, writing its stdout and stderr to the given logs. Stdout is read
+  while NVSim runs, and NVSim is stopped as soon as it reports that the configuration cannot be
+  simulated (see :func:`nvsim_failure`) rather than left to finish a search that cannot succeed.
+
+  :return: NVSim's exit code
+  :rtype: int
+  """
+  with open(stdout_log, "w") as f_out:
+    with open(stderr_log, "w") as f_error:
+      p1 = subprocess.Popen([nvsim_path, cfg_path], stdout=subprocess.PIPE, stderr=f_error, universal_newlines=True)
+      for line in p1.stdout:
+        f_out.write(line)
+        if nvsim_failure([line]) is not None:
+          p1.kill()
+          break
+      p1.stdout.close()
+      p1.wait()
+  return p1.returncode
+
+
+def run_nvsim_task(payload):
+  """ Work queue handler for "nvsim" tasks submitted by :meth:`NVSimPool.run_nvsim`. Logs are written under
+  names of their own and moved into place when NVSim exits, so an orphaned NVSim process from a worker
+  that lost its lease cannot interleave its output with the worker that took the task over.
+  """
+  suffix = ".{}.{}.tmp".format(socket.gethostname(), os.getpid())
+  returncode = run_nvsim_process(payload["nvsim_path"], payload["cfg_path"], payload["stdout_log"] + suffix, payload["stderr_log"] + suffix)
+  os.replace(payload["stdout_log"] + suffix, payload["stdout_log"])
+  os.replace(payload["stderr_log"] + suffix, payload["stderr_log"])
+  return returncode
+
+
+class NVSimJob:
+  def __init__(self,
+                input_cfg=nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(), #NVSimInputConfig used to render the cfg
+                cfg_path="data/mem_cfgs/test_SRAM.cfg", #path to nvsim cfg input
+                output_path="output/nvsim_output/test_SRAM_nvsim_output.pkl", #path for pickled NVSimOutputConfig
+                stdout_log="output/logs/test_SRAM_output", #path to stdout of the NVSim run
+                stderr_log="output/logs/test_SRAM_error", #path to stderr of the NVSim run
+                run_cfg_path=None, #mem cfg NVSim actually runs on, if not cfg_path (e.g., a full exploration cfg shared by every opt_target)
+                exploration_csv=None #where that run writes its full exploration candidates; the job's result is picked from them
+                ):
+    self.input_cfg = input_cfg
+    self.cfg_path = cfg_path
+    self.output_path = output_path
+    self.stdout_log = stdout_log
+    self.stderr_log = stderr_log
+    self.run_cfg_path = run_cfg_path if run_cfg_path is not None else cfg_path
+    self.exploration_csv = exploration_csv
+    self.run_key = None #content hash of the NVSim run: cell file, run cfg, and NVSim binary
+    self.cache_key = None #content hash of the job's result: its run key, plus the opt_target picked for from an exploration
+    self.cached_output = None #set by NVSimPool.run_nvsim when the cache or journal already holds this job's result
+    self.resumed = False #whether the result was reused from an earlier run of the study
+    self.shared_from = None #earlier job with the same run_key whose NVSim run this job reused
+    self.predicted = False #whether the result is a surrogate prediction rather than an NVSim run
+    self.warm_from = None #parsed result of the nearby design whose organization this job's NVSim search was forced to
+    self.failure = None #why NVSim could not simulate this job's configuration, now or in an earlier study
+
+  def result_key(self):
+    """ Returns the key evaluated results of this job are reused under; surrogate predictions never
+    stand in for a simulated result
+    """
+    if self.predicted:
+      return "predicted:" + self.cache_key
+    return self.cache_key
+
+
+class NVSimPool:
+  def __init__(self,
+                nvsim_path="nvmexplorer_src/nvsim/nvsim", #path to NVSim binary
+                cache=None, #optional NVSimCache consulted before launching NVSim
+                journal=None, #optional StudyJournal recording finished jobs; with a resumed journal, jobs it lists are not re-run
+                queue=None, #optional WorkQueue; NVSim then runs on whichever worker claims the job instead of in this process
+                screen=None, #optional SurrogateScreen; jobs it predicts confidently to be dominated are not run
+                warm_start=None, #optional WarmStart; jobs near an already searched design are searched around its organization
+                retry_failed=False #whether to re-run jobs the cache records as failing instead of skipping them
+                ):
+    self.nvsim_path = nvsim_path
+    self.cache = cache
+    self.journal = journal
+    self.queue = queue
+    self.screen = screen
+    self.warm_start = warm_start
+    self.retry_failed = retry_failed
+    # run_key -> [first job with that key, Event set once its NVSim run has ended, error it raised], so jobs
+    # that render to the same cell file and mem cfg (e.g., SRAM at several bits per cell) run NVSim only once
+    self.runs = {}
+    self.lock = threading.Lock()
+    self.stats = {"requested": 0, "run": 0, "shared": 0, "cached": 0, "resumed": 0, "predicted": 0, "warm": 0, "failed": 0, "known_failed": 0}
+
+  def run_nvsim(self, job):
+    """ Runs the NVSim process for a :class:`NVSimJob`, writing its stdout and stderr logs, unless a
+    resumed journal shows the job already finished with the same inputs and its pickled output is
+    intact, the cache already holds its result, or the pool's surrogate screen predicts it instead. A job identical to one this pool already ran (or
+    is running) waits for that run and copies its logs instead of starting NVSim again. With a warm
+    start, a design near one already searched is searched only around that design's organization, and
+    again in full if the result looks off.
+
+    :return: whether NVSim was run
+    :rtype: bool
+    """
+    job.run_key = nvsim_run_key(job, self.nvsim_path)
+    job.cache_key = nvsim_job_key(job, self.nvsim_path, run_key=job.run_key)
+    self.count("requested")
+    if self.reuse(job):
+      return False
+    if self.cache is not None and not self.retry_failed:
+      job.failure = self.cache.load_failure(job.cache_key)
+      if job.failure is not None:
+        print("Skipping NVSim job {}: its configuration failed before ({})".format(job.cfg_path, job.failure))
+        self.count("known_failed")
+        return False
+    warm = self.warm_start is not None and job.exploration_csv is None
+    if warm:
+      # warm-started results are kept apart from full searches, so they are only reused with warm starts on
+      full_keys = (job.run_cfg_path, job.run_key, job.cache_key)
+      job.cache_key = hashlib.sha256("warm\0{}".format(job.cache_key).encode()).hexdigest()
+      if self.reuse(job):
+        return False
+      job.cache_key = full_keys[2]
+    if self.screen is not None:
+      job.cached_output = self.screen.screen(job)
+      if job.cached_output is not None:
+        job.predicted = True
+        self.count("predicted")
+        return False
+
+    if warm:
+      neighbor = self.warm_start.neighbor(job.input_cfg)
+      if neighbor is not None:
+        job.run_cfg_path = self.warm_start.write_cfg(job.run_cfg_path, neighbor)
+        job.run_key = nvsim_run_key(job, self.nvsim_path)
+        job.cache_key = hashlib.sha256("warm\0{}".format(full_keys[2]).encode()).hexdigest()
+        job.warm_from = neighbor
+        ran = self.launch(job)
+        try:
+          reason = self.warm_start.check(self.parse_output(job), neighbor)
+        except (ValueError, IndexError) as e:
+          reason = "unparseable output: {}".format(e)
+        self.warm_start.log(job, neighbor, reason)
+        if reason is None:
+          self.count("warm")
+          return ran
+        print("Warm-started NVSim run {} looks off ({}); running a full search".format(job.run_cfg_path, reason))
+        job.run_cfg_path, job.run_key, job.cache_key = full_keys
+        job.warm_from = None
+    ran = self.launch(job)
+    job.failure = self.find_failure(job)
+    if job.failure is not None:
+      print("NVSim job {} failed: {}".format(job.cfg_path, job.failure))
+      self.count("failed")
+      if ran and self.cache is not None:
+        # jobs with the same inputs are skipped in later studies, until NVSim or the inputs change
+        self.cache.store_failure(job.cache_key, job.failure, cfg_path=job.run_cfg_path)
+      return ran
+    if ran and (self.screen is not None or warm):
+      # later candidates are screened against and warm-started from this result without waiting for its parse task
+      nvsim_output = self.parse_output(job)
+      if self.screen is not None:
+        self.screen.observe(nvsim_output)
+      if warm:
+        self.warm_start.add(nvsim_output)
+    return ran
+
+  def reuse(self, job):
+    """ Loads a job's result instead of running NVSim if a resumed journal lists it as finished under
+    job.cache_key with its pickled output intact, or the cache holds a result under that key
+
+    :return: whether the result was reused
+    :rtype: bool
+    """
+    if self.journal is not None and self.journal.completed("nvsim", job.output_path, job.cache_key, output_path=job.output_path):
+      with open(job.output_path, 'rb') as f:
+        job.cached_output = pickle.load(f)
+      job.cached_output.input_cfg = job.input_cfg
+      job.resumed = True
+      self.count("resumed")
+      return True
+    if self.cache is not None:
+      job.cached_output = self.cache.load(job.cache_key, input_cfg=job.input_cfg)
+      if job.cached_output is not None:
+        self.count("cached")
+        return True
+    return False
+
+  def launch(self, job):
+    """ Runs NVSim on job.run_cfg_path, locally or through the work queue, or waits for a run with the
+    same run key that this pool already started and copies its logs
+
+    :return: whether NVSim was run
+    :rtype: bool
+    """
+    with self.lock:
+      run = self.runs.get(job.run_key)
+      if run is None:
+        self.runs[job.run_key] = [job, threading.Event(), None]
+    if run is not None:
+      first_job, finished = run[0], run[1]
+      finished.wait()
+      if run[2] is not None:
+        raise RuntimeError("NVSim job {} shares its inputs with {}, which failed: {}".format(job.run_cfg_path, first_job.run_cfg_path, run[2]))
+      if first_job.stdout_log != job.stdout_log:
+        shutil.copyfile(first_job.stdout_log, job.stdout_log)
+        shutil.copyfile(first_job.stderr_log, job.stderr_log)
+      if job.exploration_csv is not None and first_job.exploration_csv != job.exploration_csv:
+        shutil.copyfile(first_job.exploration_csv, job.exploration_csv)
+      job.shared_from = first_job
+      self.count("shared")
+      return False
+
+    try:
+      if self.queue is not None:
+        # the worker writes the logs to the shared filesystem and the parse happens here
+        self.queue.submit("nvsim:{}".format(os.path.abspath(job.output_path)), "nvsim",
+                          {"nvsim_path": self.nvsim_path, "cfg_path": job.run_cfg_path, "stdout_log": job.stdout_log, "stderr_log": job.stderr_log}).result()
+      else:
+        run_nvsim_process(self.nvsim_path, job.run_cfg_path, job.stdout_log, job.stderr_log)
+    except Exception as e:
+      self.runs[job.run_key][2] = e
+      raise
+    finally:
+      self.runs[job.run_key][1].set()
+    self.count("run")
+    return True
+
+  def find_failure(self, job):
+    """ Returns why a job's NVSim run failed, or None: NVSim reported that the configuration cannot be
+    simulated, or its stdout has none of the metrics parse_nvsim_output looks for
+    """
+    with open(job.stdout_log) as f:
+      failure = nvsim_failure(f)
+    if failure is not None or job.exploration_csv is not None:
+      return failure
+    nvsim_output = self.parse_output(job)
+    if all(getattr(nvsim_output, metric) == -1 for metric in ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area"]):
+      return "no results in NVSim output {}".format(job.stdout_log)
+    return None
+
+  def count(self, stat):
+    with self.lock:
+      self.stats[stat] += 1
+
+  def print_stats(self):
+    print("NVSim jobs: {requested} requested, {run} run, {shared} shared with an identical job, {cached} from the cache, {resumed} resumed, {predicted} predicted by the surrogate, {warm} warm-started, {failed} failed, {known_failed} skipped as known failures".format(**self.stats))
+
+  def parse_output(self, job):
+    """ Parses the result of a job's NVSim run: its stdout log, or for a full exploration run, the
+    candidate that wins on the job's opt_target
+    """
+    if job.exploration_csv is not None:
+      return parse_exploration_output(job.exploration_csv, job.input_cfg)
+    nvsim_output = nvmexplorer_src.input_defs.nvsim_interface.parse_nvsim_output(job.stdout_log, input_cfg=job.input_cfg)
+    nvsim_output.warm_started = job.warm_from is not None
+    return nvsim_output
+
+  def parse_job(self, job):
+    """ Returns the parsed results of a :class:`NVSimJob` after :meth:`run_nvsim`, from the cache or
+    its stdout log, and pickles them to the job's output path
+    """
+    nvsim_output = job.cached_output
+    if job.resumed:
+      return nvsim_output
+    if job.failure is not None:
+      # evaluated like the unparseable NVSim output failed runs used to leave, but never cached as a result
+      nvsim_output = nvmexplorer_src.input_defs.nvsim_interface.NVSimOutputConfig(input_cfg=job.input_cfg)
+      nvsim_output.failure = job.failure
+    elif nvsim_output is None:
+      nvsim_output = self.parse_output(job)
+      if self.cache is not None:
+        self.cache.store(job.cache_key, nvsim_output)
+
+    output_dir = os.path.dirname(job.output_path)
+    if output_dir and not os.path.exists(output_dir):
+      os.makedirs(output_dir, exist_ok=True)
+    with open(job.output_path, 'wb') as f:
+      pickle.dump(nvsim_output, f)
+    if self.journal is not None and not job.predicted:
+      # predictions are not journaled, so a resumed study screens them again with whatever has been simulated since
+      self.journal.record("nvsim", job.output_path, inputs=job.cache_key, output_digest=file_digest(job.output_path))
+    return nvsim_output
@@ -0,0 +1,244 @@
+import os
+import csv
+import bisect
+import numpy as np
+from nvmexplorer_src.results_store import unique_column_names, union_headers, to_float
+
+# objective columns are minimized unless marked "max"
+PARETO_SENSES = {"min": 1., "max": -1.}
+
+
+def skyline_2d(points):
+  """ Non-dominated flags for unique, lexicographically sorted 2-objective points: a point survives
+  iff its second objective beats every point before it
+  """
+  running_min = np.minimum.accumulate(points[:, 1])
+  return points[:, 1] < np.concatenate(([np.inf], running_min[:-1]))
+
+
+def skyline_3d(points):
+  """ Non-dominated flags for unique, lexicographically sorted 3-objective points. Sweeps in order of
+  the first objective while keeping a staircase of the (second, third) objective values seen so far:
+  ys ascending and zs strictly descending, so the best third objective among all earlier points with
+  a second objective <= y is found with one bisection. Each step is removed at most once, so the
+  sweep does O(n log n) comparisons, but splicing the Python lists moves up to O(n) entries per kept
+  point, so the worst case (a staircase that keeps growing) is O(n^2) element moves.
+  """
+  keep = np.zeros(len(points), dtype=bool)
+  ys = []
+  zs = []
+  for i, (x, y, z) in enumerate(points.tolist()):
+    j = bisect.bisect_right(ys, y)
+    if j > 0 and zs[j-1] <= z:
+      continue
+    keep[i] = True
+    # replace the staircase steps this point covers
+    start = bisect.bisect_left(ys, y)
+    end = start
+    while end < len(ys) and zs[end] >= z:
+      end += 1
+    ys[start:end] = [y]
+    zs[start:end] = [z]
+  return keep
+
+
+def skyline_nd(points):
+  """ Non-dominated flags for unique points with any number of objectives. Points are visited in
+  order of their summed per-objective ranks, which a dominating point always has less of, so each
+  point only needs to be checked against the frontier found so far.
+  """
+  ranks = np.empty(points.shape, dtype=np.int64)
+  for d in range(points.shape[1]):
+    ranks[:, d] = np.unique(points[:, d], return_inverse=True)[1].ravel()
+  order = np.argsort(ranks.sum(axis=1), kind="stable")
+  keep = np.zeros(len(points), dtype=bool)
+  frontier = np.empty(points.shape)
+  num_frontier = 0
+  for i in order:
+    if num_frontier > 0 and np.all(frontier[:num_frontier] <= points[i], axis=1).any():
+      continue
+    keep[i] = True
+    frontier[num_frontier] = points[i]
+    num_frontier += 1
+  return keep
+
+
+def pareto_mask(points):
+  """ Returns which rows of points are Pareto-optimal when every objective is minimized. Rows with a
+  NaN objective are never on the frontier, and identical rows are either all kept or all dropped.
+  Two objectives take O(n log n). Three objectives take O(n log n) comparisons but O(n^2) list
+  moves in the worst case (see skyline_3d); more objectives fall back to a sorted block-nested-loop,
+  O(n * frontier size).
+
+  :param points: objective values, one row per design
+  :type points: (n, d) array-like of floats
+  :return: True for each non-dominated row
+  :rtype: (n,) numpy bool array
+  """
+  points = np.asarray(points, dtype=float)
+  mask = np.zeros(len(points), dtype=bool)
+  valid = ~np.isnan(points).any(axis=1)
+  if not valid.any():
+    return mask
+  # np.unique sorts rows lexicographically, which the sweeps below rely on
+  unique, inverse = np.unique(points[valid], axis=0, return_inverse=True)
+  if unique.shape[1] == 1:
+    keep = np.arange(len(unique)) == 0
+  elif unique.shape[1] == 2:
+    keep = skyline_2d(unique)
+  elif unique.shape[1] == 3:
+    keep = skyline_3d(unique)
+  else:
+    keep = skyline_nd(unique)
+  mask[valid] = keep[inverse.ravel()]
+  return mask
+
+
+def objective_signs(objectives, senses=None):
+  if senses is None:
+    senses = ["min"] * len(objectives)
+  if len(senses) != len(objectives):
+    raise ValueError("Expected one sense per objective, got {} for {}".format(senses, objectives))
+  for sense in senses:
+    if sense not in PARETO_SENSES:
+      raise ValueError("Unknown objective sense {}; expected one of {}".format(sense, list(PARETO_SENSES)))
+  return np.array([PARETO_SENSES[sense] for sense in senses])
+
+
+def pareto_frontier(df, objectives=["Total Power", "Read Latency (ns)", "Area (mm^2)"], senses=None, group_by=["Benchmark Name"]):
+  """ Returns the rows of a results dataframe that are Pareto-optimal within each group
+
+  :param df: results, e.g., from :func:`load_results` on a combined results file
+  :type df: pandas dataframe
+  :param objectives: 2-4 columns to optimize
+  :type objectives: list of Strings
+  :param senses: "min" or "max" per objective; all objectives are minimized by default
+  :type senses: list of Strings
+  :param group_by: columns identifying one benchmark or traffic point, or [] for one global frontier
+  :type group_by: list of Strings
+  :rtype: pandas dataframe
+  """
+  signs = objective_signs(objectives, senses)
+  values = df[objectives].apply(lambda column: column.astype(float)).values * signs
+  mask = np.zeros(len(df), dtype=bool)
+  if len(group_by) == 0:
+    mask = pareto_mask(values)
+  else:
+    for indices in df.groupby(group_by, sort=False).indices.values():
+      mask[indices] = pareto_mask(values[indices])
+  return df[mask]
+
+
+class ParetoFrontier:
+  def __init__(self,
+                objectives=["Total Power", "Read Latency (ns)", "Area (mm^2)"], #2-4 results columns to optimize
+                senses=None, #"min" or "max" per objective; all minimized by default
+                group_by=["Benchmark Name", "Read Accesses", "Write Accesses"], #columns identifying one benchmark or traffic point
+                output_csv=None #if set, the current frontier is rewritten here after every update
+                ):
+    if not 2 <= len(objectives) <= 4:
+      raise ValueError("Pareto frontiers support 2-4 objectives, got {}".format(objectives))
+    self.objectives = objectives
+    self.signs = objective_signs(objectives, senses)
+    self.group_by = group_by
+    self.output_csv = output_csv
+    self.headers = [] # header of every results file added so far, for the union schema
+    self.sources = {} # results file (or None) -> group key -> (signed objective values, row dicts) of the file's own frontier
+    self.groups = {} # group key -> (signed objective values, row dicts) of its current frontier
+
+  def add(self, headers, rows, source=None):
+    """ Merges results rows into the frontier. Rows from a source (e.g., a results csv) replace the rows
+    added from that source before, so a file reported again is not counted twice; rows without a source
+    accumulate. Only the frontiers of the affected groups are re-examined, so the cost scales with the
+    frontiers and the new rows rather than every row seen so far.
+
+    :param headers: results csv header
+    :type headers: list of Strings
+    :param rows: results rows matching headers
+    :type rows: list of lists
+    :param source: results file the rows are every row of, or None to add to the rows seen so far
+    :type source: String
+    :return: number of groups whose frontier changed
+    :rtype: int
+    """
+    names = unique_column_names(headers)
+    for name in self.objectives + self.group_by:
+      if name not in names:
+        raise KeyError("Results are missing Pareto column {}".format(name))
+    if headers not in self.headers:
+      self.headers.append(list(headers))
+    objective_indices = [names.index(name) for name in self.objectives]
+    group_indices = [names.index(name) for name in self.group_by]
+
+    new_rows = {}
+    for row in rows:
+      key = tuple(str(row[i]).strip() for i in group_indices)
+      new_rows.setdefault(key, []).append(row)
+
+    previous = self.sources.get(source, {})
+    if source is None:
+      groups = dict(previous)
+    else:
+      groups = {}
+    for key, group_rows in new_rows.items():
+      values = np.array([[to_float(row[i]) for i in objective_indices] for row in group_rows], dtype=float) * self.signs
+      row_dicts = [dict(zip(names, row)) for row in group_rows]
+      if key in groups:
+        values = np.concatenate((groups[key][0], values))
+        row_dicts = groups[key][1] + row_dicts
+      mask = pareto_mask(values)
+      groups[key] = (values[mask], [row for row, keep in zip(row_dicts, mask) if keep])
+    self.sources[source] = groups
+
+    # a group's frontier is the frontier of its sources' frontiers
+    num_changed = 0
+    for key in set(previous) | set(new_rows):
+      source_groups = [self.sources[other][key] for other in self.sources if key in self.sources[other]]
+      if not source_groups:
+        del self.groups[key]
+        num_changed += 1
+        continue
+      values = np.concatenate([group[0] for group in source_groups])
+      row_dicts = [row for group in source_groups for row in group[1]]
+      mask = pareto_mask(values)
+      frontier_rows = [row for row, keep in zip(row_dicts, mask) if keep]
+      if key not in self.groups or frontier_rows != self.groups[key][1]:
+        num_changed += 1
+      self.groups[key] = (values[mask], frontier_rows)
+    return num_changed
+
+  def write_results(self, csv_file_path, headers, rows, metadata={}):
+    """ Results sink interface (see :func:`add_results_sink`): replaces a results file's rows in the
+    frontier each time the file is written and saves the frontier if output_csv is set
+    """
+    if self.add(headers, rows, source=csv_file_path) > 0 and self.output_csv is not None:
+      self.save()
+
+  def frontier(self, key=None):
+    """ Returns the frontier rows (as dicts keyed by column name) for one group key, or for every group
+    """
+    if key is not None:
+      return list(self.groups.get(key, (None, []))[1])
+    return [row for key in self.groups for row in self.groups[key][1]]
+
+  def to_dataframe(self):
+    import pandas as pd
+    return pd.DataFrame(self.frontier(), columns=union_headers(self.headers))
+
+  def save(self, path=None):
+    """ Writes the current frontier of every group to a csv with the union of the results headers
+    """
+    if path is None:
+      path = self.output_csv
+    columns = union_headers(self.headers)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline='') as f:
+      wr = csv.writer(f, dialect='excel')
+      wr.writerow(columns)
+      for row in self.frontier():
+        wr.writerow([row.get(column, "") for column in columns])
+    os.replace(tmp_path, path)
+
+  def close(self):
+    if self.output_csv is not None and self.headers:
+      self.save()
@@ -0,0 +1,363 @@
+import os
+import re
+import csv
+import json
+import sqlite3
+import hashlib
+
+# pyarrow is only needed for columnar results; it is imported on first use so CSV-only studies do not depend on it
+
+# Columns reported by ExperimentResult.report_result_benchmark after the cell and mem cfg fields
+METRIC_COLUMNS = ["Read Accesses", "Write Accesses", "Total Dynamic Read Power (mW)", "Total Dynamic Write Power (mW)", "Total Power", "Total Dynamic Read Energy (mJ)", "Total Dynamic Write Energy (mJ)", "Total Read Latency (ms)", "Total Write Latency (ms)", "Read BW Util", "Write BW Util", "Area (mm^2)", "Area Efficiency (percent)", "Read Latency (ns)", "Write Latency (ns)", "Read Energy (pJ)", "Write Energy (pJ)", "Leakage Power (mW)"]
+INTEGER_COLUMNS = ["Bits Per Cell"]
+# cfg fields are numeric if they carry a unit, e.g. "Capacity (MB)", or are one of these unitless numbers
+NUMERIC_CFG_COLUMNS = ["CellAspectRatio", "ProcessNode", "Stitching", "CellLevels"]
+# trailing block of every results row, after the technology-specific cell and mem cfg fields
+RESULT_COLUMNS = ["Benchmark Name"] + METRIC_COLUMNS + INTEGER_COLUMNS
+# optional columns after RESULT_COLUMNS, added by studies that interpolate capacities (INTERPOLATION_HEADERS)
+# or pre-screen with a surrogate (PREDICTED_HEADERS); flags are stored as 0/1 in the database
+EXTRA_RESULT_COLUMNS = ["Interpolated", "Interpolation Error (%)", "Predicted"]
+FLAG_COLUMNS = ["Interpolated", "Predicted"]
+SCHEMA_VERSION = "1"
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+
+
+def import_pyarrow():
+  try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.feather
+  except ImportError:
+    raise ImportError("Columnar results output requires pyarrow; install it with `pip install pyarrow` or drop results_formats from the config")
+  return pyarrow
+
+
+def to_flag(value):
+  """ Returns 1/0 for a "True"/"False" results field, or None if it is blank """
+  if value in (None, ""):
+    return None
+  return 1 if str(value) == "True" else 0
+
+
+def unique_column_names(headers):
+  """ Returns headers with repeated names suffixed the same way pandas.read_csv does (e.g., CellLevels.1),
+  since a cell file and a mem cfg can both define the same field
+  """
+  seen = {}
+  names = []
+  for header in headers:
+    if header in seen:
+      seen[header] += 1
+      names.append("{}.{}".format(header, seen[header]))
+    else:
+      seen[header] = 0
+      names.append(header)
+  return names
+
+
+def column_type(pa, name):
+  base_name = name.split(".")[0] if name.split(".")[-1].isdigit() else name
+  if base_name in METRIC_COLUMNS:
+    return pa.float64()
+  if base_name in INTEGER_COLUMNS:
+    return pa.int64()
+  if base_name in NUMERIC_CFG_COLUMNS or base_name.endswith(")"):
+    return pa.float64()
+  # cfg fields and benchmark names repeat on every row, so store them dictionary-encoded
+  return pa.dictionary(pa.int32(), pa.string())
+
+
+def results_schema(headers):
+  """ Returns the pyarrow schema for a results file with the given csv header: metrics and numeric
+  cfg fields are float64, bits per cell is int64, and every other cfg field and the benchmark name
+  is a dictionary-encoded string
+
+  :param headers: csv header row as written by report_header_benchmark
+  :type headers: list of Strings
+  :rtype: pyarrow.Schema
+  """
+  pa = import_pyarrow()
+  fields = [pa.field(name, column_type(pa, name)) for name in unique_column_names(headers)]
+  return pa.schema(fields, metadata={"nvmexplorer_schema_version": SCHEMA_VERSION})
+
+
+def to_float(value):
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def rows_to_table(headers, rows):
+  """ Converts csv-style header and rows into a typed pyarrow Table
+
+  :param headers: csv header row
+  :type headers: list of Strings
+  :param rows: result rows, in header order
+  :type rows: list of lists
+  :rtype: pyarrow.Table
+  """
+  pa = import_pyarrow()
+  schema = results_schema(headers)
+  arrays = []
+  for (i, field) in enumerate(schema):
+    column = [row[i] if i < len(row) else None for row in rows]
+    if pa.types.is_floating(field.type):
+      arrays.append(pa.array([to_float(v) for v in column], type=pa.float64()))
+    elif pa.types.is_integer(field.type):
+      arrays.append(pa.array([None if to_float(v) is None else int(to_float(v)) for v in column], type=pa.int64()))
+    else:
+      arrays.append(pa.array([None if v is None else str(v) for v in column], type=pa.string()).dictionary_encode())
+  return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def columnar_path(csv_file_path, results_format):
+  """ Returns the path of the columnar copy of a results csv (e.g., foo.csv -> foo.parquet)
+  """
+  if results_format not in COLUMNAR_FORMATS:
+    raise ValueError("Unknown results format {}; expected one of {}".format(results_format, list(COLUMNAR_FORMATS)))
+  return os.path.splitext(csv_file_path)[0] + COLUMNAR_FORMATS[results_format]
+
+
+def write_table(table, path, results_format):
+  pa = import_pyarrow()
+  tmp_path = path + ".tmp"
+  if results_format == "parquet":
+    pa.parquet.write_table(table, tmp_path, use_dictionary=True)
+  else:
+    pa.feather.write_feather(table, tmp_path)
+  os.replace(tmp_path, path)
+
+
+def write_columnar_results(csv_file_path, headers, rows, results_format="parquet"):
+  """ Writes results rows next to csv_file_path as a typed Parquet or Feather file
+
+  :param csv_file_path: path of the csv the rows belong to
+  :type csv_file_path: String
+  :param headers: csv header row
+  :type headers: list of Strings
+  :param rows: result rows, in header order
+  :type rows: list of lists
+  :param results_format: "parquet" or "feather"
+  :type results_format: String
+  :return: path to the columnar file
+  :rtype: String
+  """
+  path = columnar_path(csv_file_path, results_format)
+  write_table(rows_to_table(headers, rows), path, results_format)
+  return path
+
+
+def union_headers(headers_list):
+  """ Returns the union of several results headers: cfg fields in first-seen order followed by the
+  shared benchmark and metric columns, so every technology maps onto one schema
+
+  :param headers_list: csv header rows, one per results file
+  :type headers_list: list of lists of Strings
+  :rtype: list of Strings
+  """
+  cfg_columns = []
+  for headers in headers_list:
+    for name in unique_column_names(headers):
+      if name not in RESULT_COLUMNS and name not in cfg_columns:
+        cfg_columns.append(name)
+  return cfg_columns + RESULT_COLUMNS
+
+
+def read_table(path, columns=None):
+  """ Reads a Parquet or Feather results file into a pyarrow Table, loading only the requested columns
+  """
+  pa = import_pyarrow()
+  if path.endswith(COLUMNAR_FORMATS["parquet"]):
+    return pa.parquet.read_table(path, columns=columns)
+  return pa.feather.read_table(path, columns=columns)
+
+
+def load_results(path, columns=None):
+  """ Returns a pandas dataframe for a results file, reading only the requested columns.
+  Parquet and Feather files are read with pyarrow; anything else is read as csv. Given a path
+  without an extension (e.g., "SRAM_1BPC-combined"), the typed .parquet or .feather copy a study
+  wrote is preferred over the .csv.
+
+  :param path: path to a .parquet, .feather, or .csv results file, or to one without its extension
+  :type path: String
+  :param columns: columns to load, or None for all of them
+  :type columns: list of Strings
+  :rtype: pandas dataframe
+  """
+  if os.path.splitext(path)[1] == "":
+    candidates = [path + extension for extension in COLUMNAR_FORMATS.values() if os.path.exists(path + extension)]
+    path = candidates[0] if candidates else path + ".csv"
+  if os.path.splitext(path)[1] in COLUMNAR_FORMATS.values():
+    return read_table(path, columns=columns).to_pandas()
+  import pandas as pd
+  return pd.read_csv(path, usecols=columns)
+
+
+def read_results_csv(path):
+  """ Returns (header, rows) for a per-run results csv, dropping repeated headers like combine_csv does.
+  Values are kept as strings, as results sinks receive them when a study writes the file.
+  """
+  header = None
+  rows = []
+  with open(path, newline='') as f:
+    for row in csv.reader(f):
+      if header is None:
+        header = row
+      elif row != header:
+        rows.append(row)
+  return header, rows
+
+
+def sql_column_name(name):
+  """ Returns a SQL-friendly name for a results column, e.g. "Total Read Latency (ms)" -> total_read_latency_ms
+  """
+  return re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()
+
+
+def sql_column_type(name):
+  return "INTEGER" if name in FLAG_COLUMNS else "REAL"
+
+
+class SQLiteResultsSink:
+  def __init__(self,
+                db_path="output/results/nvmexplorer_results.db", #sqlite database shared across studies
+                exp_name="default" #study name recorded with every row
+                ):
+    # cfg fields are stored once per distinct configuration; each evaluated scenario is one row in results
+    self.db_path = db_path
+    self.exp_name = exp_name
+    self.config_ids = {}
+    db_dir = os.path.dirname(self.db_path)
+    if db_dir and not os.path.exists(db_dir):
+      os.makedirs(db_dir, exist_ok=True)
+    self.conn = sqlite3.connect(self.db_path)
+    self.conn.execute("PRAGMA journal_mode=WAL")
+    self.create_tables()
+
+  def create_tables(self):
+    metric_columns = ",\n".join(["  {} REAL".format(sql_column_name(name)) for name in METRIC_COLUMNS] +
+                               ["  {} {}".format(sql_column_name(name), sql_column_type(name)) for name in EXTRA_RESULT_COLUMNS])
+    self.conn.executescript("""
+CREATE TABLE IF NOT EXISTS configs (
+  config_id INTEGER PRIMARY KEY,
+  config_hash TEXT UNIQUE NOT NULL,
+  cell_type TEXT,
+  mem_cell_type TEXT,
+  capacity REAL,
+  opt_target TEXT,
+  bits_per_cell INTEGER,
+  word_width INTEGER,
+  process_node INTEGER,
+  cell_file TEXT,
+  fields TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+  result_id INTEGER PRIMARY KEY,
+  config_id INTEGER NOT NULL REFERENCES configs(config_id),
+  exp_name TEXT,
+  results_file TEXT,
+  benchmark_name TEXT,
+{}
+);
+CREATE INDEX IF NOT EXISTS configs_cell_type ON configs(cell_type);
+CREATE INDEX IF NOT EXISTS configs_capacity ON configs(capacity);
+CREATE INDEX IF NOT EXISTS configs_opt_target ON configs(opt_target);
+CREATE INDEX IF NOT EXISTS configs_bits_per_cell ON configs(bits_per_cell);
+CREATE INDEX IF NOT EXISTS configs_study_point ON configs(cell_type, capacity, opt_target, bits_per_cell);
+CREATE INDEX IF NOT EXISTS results_config ON results(config_id);
+CREATE INDEX IF NOT EXISTS results_benchmark ON results(benchmark_name);
+CREATE INDEX IF NOT EXISTS results_exp_name ON results(exp_name);
+CREATE VIEW IF NOT EXISTS results_view AS
+  SELECT configs.cell_type, configs.mem_cell_type, configs.capacity, configs.opt_target, configs.bits_per_cell,
+         configs.word_width, configs.process_node, configs.cell_file, results.*
+  FROM results JOIN configs USING (config_id);
+""".format(metric_columns))
+    # databases written before results were tracked per file get the column; their rows have no file to be replaced by
+    existing_columns = [column[1] for column in self.conn.execute("PRAGMA table_info(results)")]
+    if "results_file" not in existing_columns:
+      self.conn.execute("ALTER TABLE results ADD COLUMN results_file TEXT")
+    # likewise for databases written before interpolation and surrogate flags had columns of their own
+    for name in EXTRA_RESULT_COLUMNS:
+      if sql_column_name(name) not in existing_columns:
+        self.conn.execute("ALTER TABLE results ADD COLUMN {} {}".format(sql_column_name(name), sql_column_type(name)))
+    self.conn.execute("CREATE INDEX IF NOT EXISTS results_source ON results(exp_name, results_file)")
+    self.conn.commit()
+
+  def config_id(self, cfg_fields, metadata, bits_per_cell):
+    """ Returns the id of the configs row for a set of cell/mem cfg fields, inserting it if needed
+    """
+    cell_type = metadata.get("cell_type", cfg_fields.get("MemCellType"))
+    fields = json.dumps(cfg_fields, sort_keys=True)
+    config_hash = hashlib.sha1("{}|{}|{}".format(cell_type, bits_per_cell, fields).encode()).hexdigest()
+    if config_hash not in self.config_ids:
+      self.conn.execute("INSERT OR IGNORE INTO configs (config_hash, cell_type, mem_cell_type, capacity, opt_target, bits_per_cell, word_width, process_node, cell_file, fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (config_hash, cell_type, cfg_fields.get("MemCellType"),
+                         to_float(metadata.get("capacity", cfg_fields.get("Capacity (MB)"))),
+                         metadata.get("opt_target", cfg_fields.get("OptimizationTarget")),
+                         bits_per_cell,
+                         to_float(cfg_fields.get("WordWidth (bit)")),
+                         to_float(cfg_fields.get("ProcessNode")),
+                         cfg_fields.get("MemoryCellInputFile"),
+                         fields))
+      self.config_ids[config_hash] = self.conn.execute("SELECT config_id FROM configs WHERE config_hash = ?", (config_hash,)).fetchone()[0]
+    return self.config_ids[config_hash]
+
+  def write_results(self, csv_file_path, headers, rows, metadata={}):
+    """ Stores the rows of one results file, replacing any rows stored for it earlier under the same
+    exp_name, so re-running or re-evaluating a study never duplicates results
+
+    :param csv_file_path: results csv the rows were written to
+    :type csv_file_path: String
+    :param headers: csv header row
+    :type headers: list of Strings
+    :param rows: result rows, in header order
+    :type rows: list of lists
+    :param metadata: study details for the file (cell_type, capacity, opt_target, bits_per_cell, exp_name)
+    :type metadata: dict
+    """
+    names = unique_column_names(headers)
+    result_positions = [names.index(name) for name in RESULT_COLUMNS]
+    # interpolation and surrogate flags describe how a row was evaluated, not its configuration
+    extra_positions = [names.index(name) if name in names else None for name in EXTRA_RESULT_COLUMNS]
+    cfg_positions = [i for (i, name) in enumerate(names) if name not in RESULT_COLUMNS and name not in EXTRA_RESULT_COLUMNS]
+    exp_name = metadata.get("exp_name", self.exp_name)
+
+    records = []
+    for row in rows:
+      cfg_fields = {names[i]: row[i] for i in cfg_positions}
+      values = [row[i] for i in result_positions]
+      bits_per_cell = metadata.get("bits_per_cell", values[-1])
+      config_id = self.config_id(cfg_fields, metadata, int(to_float(bits_per_cell) or 1))
+      extras = [None if i is None else (to_flag(row[i]) if name in FLAG_COLUMNS else to_float(row[i]))
+                for (name, i) in zip(EXTRA_RESULT_COLUMNS, extra_positions)]
+      records.append([config_id, exp_name, csv_file_path, str(values[0])] + [to_float(v) for v in values[1:-1]] + extras)
+
+    placeholders = ", ".join(["?"] * (4 + len(METRIC_COLUMNS) + len(EXTRA_RESULT_COLUMNS)))
+    with self.conn:
+      # one transaction, so readers see either the old rows of the file or the new ones
+      self.conn.execute("DELETE FROM results WHERE exp_name = ? AND results_file = ?", (exp_name, csv_file_path))
+      self.conn.executemany("INSERT INTO results (config_id, exp_name, results_file, benchmark_name, {}) VALUES ({})".format(
+                            ", ".join(sql_column_name(name) for name in METRIC_COLUMNS + EXTRA_RESULT_COLUMNS), placeholders), records)
+
+  def close(self):
+    self.conn.close()
+
+
+def query_results(db_path, sql, params=()):
+  """ Runs a query against a results database and returns a pandas dataframe. The results_view
+  view joins every result with its configuration, e.g.
+  SELECT * FROM results_view WHERE cell_type = 'PCM' AND capacity = 4 AND benchmark_name = 'ResNet50w'
+
+  :param db_path: path to the sqlite database written by :class:`SQLiteResultsSink`
+  :type db_path: String
+  :param sql: query to run
+  :type sql: String
+  :param params: query parameters
+  :type params: tuple
+  :rtype: pandas dataframe
+  """
+  import pandas as pd
+  with sqlite3.connect(db_path) as conn:
+    return pd.read_sql_query(sql, conn, params=params)
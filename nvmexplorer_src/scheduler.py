@@ -0,0 +1,132 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Task:
+  def __init__(self,
+                name="task", #unique name within the graph, e.g., "nvsim/RRAM_1MB_ReadLatency_1BPC/0"
+                fn=None, #callable run with no arguments once every dependency has finished
+                deps=[], #names of tasks that must finish first
+                on_main=False #run on the scheduler's thread, serialized with other main tasks, instead of a worker
+                ):
+    self.name = name
+    self.fn = fn
+    self.deps = list(deps)
+    self.on_main = on_main
+    self.result = None
+    self.done = False
+    self.elapsed = 0.
+
+
+class TaskGraph:
+  def __init__(self):
+    self.tasks = {} # name -> Task, in insertion order
+
+  def add(self, name, fn, deps=[], on_main=False):
+    """ Adds a task to the graph; its dependencies must already have been added
+
+    :param name: unique task name
+    :type name: String
+    :param fn: callable run with no arguments; its return value is kept as the task's result
+    :param deps: names of tasks that must finish first
+    :type deps: list of Strings
+    :param on_main: run on the scheduler's thread rather than a worker thread
+    :type on_main: bool
+    :rtype: :class:`Task`
+    """
+    if name in self.tasks:
+      raise ValueError("Duplicate task {}".format(name))
+    for dep in deps:
+      if dep not in self.tasks:
+        raise KeyError("Task {} depends on unknown task {}".format(name, dep))
+    self.tasks[name] = Task(name=name, fn=fn, deps=deps, on_main=on_main)
+    return self.tasks[name]
+
+  def result(self, name):
+    return self.tasks[name].result
+
+  def __len__(self):
+    return len(self.tasks)
+
+
+class TaskScheduler:
+  def __init__(self,
+                num_workers=1 #max number of worker tasks (e.g., NVSim runs) in flight at once
+                ):
+    self.num_workers = max(1, num_workers)
+
+  def run(self, graph):
+    """ Runs every task in a :class:`TaskGraph` once its dependencies have finished. Worker tasks run
+    concurrently on a thread pool; main tasks run one at a time on this thread in the order they
+    become ready, so they can share state (e.g., results writers) without locking. Main tasks run
+    while worker tasks are still in flight, e.g., evaluating finished arrays while NVSim is running.
+    If a task raises, no new tasks are started and the exception is re-raised once running tasks finish.
+
+    :param graph: tasks to run
+    :type graph: :class:`TaskGraph`
+    :return: the graph, with each task's result filled in
+    :rtype: :class:`TaskGraph`
+    """
+    remaining = {name: len(task.deps) for (name, task) in graph.tasks.items()}
+    dependents = {name: [] for name in graph.tasks}
+    for task in graph.tasks.values():
+      for dep in task.deps:
+        dependents[dep].append(task.name)
+
+    executor = ThreadPoolExecutor(max_workers=self.num_workers)
+    main_ready = deque()
+    in_flight = {}
+    error = None
+
+    def run_task(task):
+      start = time.time()
+      result = task.fn()
+      task.elapsed = time.time() - start
+      return result
+
+    def release(task):
+      if task.on_main:
+        main_ready.append(task)
+      else:
+        in_flight[executor.submit(run_task, task)] = task
+
+    def finish(task, result):
+      task.result = result
+      task.done = True
+      for name in dependents[task.name]:
+        remaining[name] -= 1
+        if remaining[name] == 0:
+          release(graph.tasks[name])
+
+    try:
+      for task in graph.tasks.values():
+        if remaining[task.name] == 0:
+          release(task)
+      while (main_ready or in_flight) and error is None:
+        # collect finished workers first so their dependents are released as early as possible
+        done = [future for future in in_flight if future.done()]
+        if not done and not main_ready:
+          done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+          task = in_flight.pop(future)
+          if future.exception() is not None:
+            error = future.exception()
+            break
+          finish(task, future.result())
+        if main_ready and error is None:
+          task = main_ready.popleft()
+          try:
+            finish(task, run_task(task))
+          except Exception as e:
+            error = e
+    finally:
+      for future in in_flight:
+        future.cancel()
+      executor.shutdown(wait=True)
+    if error is not None:
+      raise error
+    unfinished = [name for (name, task) in graph.tasks.items() if not task.done]
+    if unfinished:
+      raise RuntimeError("Tasks never became ready: {}".format(unfinished))
+    return graph
@@ -0,0 +1,368 @@
+import os
+import csv
+import json
+import pickle
+import shutil
+import nvmexplorer_src.input_defs
+from nvmexplorer_src.eval_utils import *
+from nvmexplorer_src.traffic import *
+from nvmexplorer_src.tentpoles import *
+from nvmexplorer_src.nvsim_pool import NVSimJob
+from nvmexplorer_src.workspace import StudyWorkspace
+from nvmexplorer_src.journal import file_digest, inputs_digest
+from nvmexplorer_src.results_store import read_results_csv
+
+
+class StudyPoint:
+  def __init__(self,
+                cell_type="SRAM", #memory cell technology
+                opt_target="ReadLatency", #NVSim optimization target
+                capacity=1, #capacity in MB
+                bits_per_cell=1, #bits per cell
+                results_csv="output/results/SRAM_1MB_ReadLatency_1BPC-default.csv" #per-point results file
+                ):
+    # one iteration of the cell_type/opt_target/capacity/bits_per_cell loop
+    self.cell_type = cell_type
+    self.opt_target = opt_target
+    self.capacity = capacity
+    self.bits_per_cell = bits_per_cell
+    self.results_csv = results_csv
+    self.cell_paths = []
+    self.cell_cfgs = []
+    self.cfg_paths = []
+    self.nvsim_input_cfgs = []
+    self.jobs = []
+    self.futures = [] #filled in once the jobs are submitted to an NVSimPool
+    self.nvsim_outputs = [] #parsed NVSim results, in the same order as jobs, once they have all finished
+    self.extra_columns = [] #(headers, values) appended to the results rows of each cell, e.g., interpolation flags; empty for none
+    self.evaluated = False
+
+  def add_cell(self, cell_path, cell_cfg, cfg_path, nvsim_input_cfg, output_path, stdout_log, stderr_log, run_cfg_path=None, exploration_csv=None):
+    self.cell_paths.append(cell_path)
+    self.cell_cfgs.append(cell_cfg)
+    self.cfg_paths.append(cfg_path)
+    self.nvsim_input_cfgs.append(nvsim_input_cfg)
+    self.jobs.append(NVSimJob(input_cfg=nvsim_input_cfg,
+                              cfg_path=cfg_path,
+                              output_path=output_path,
+                              stdout_log=stdout_log,
+                              stderr_log=stderr_log,
+                              run_cfg_path=run_cfg_path,
+                              exploration_csv=exploration_csv))
+
+
+def count_study_cells(config, cell_type, cell_tentpoles=True):
+  """ Returns how many cells (and so NVSim jobs) :func:`setup_study_point` will create for cell_type
+  """
+  if cell_tentpoles == True:
+      return 2 # worst and best case
+  if len(config["custom_cells"]) == 0:
+      return 1 # default cell
+  return len([cell for cell in config["custom_cells"] if cell["cell_type"] == cell_type])
+
+
+def exploration_run(nvsim_input_cfg, workspace, label):
+  """ Generates the full exploration cfg every opt_target of one cell, capacity, and bits per cell
+  shares, and returns its path and the csv NVSim will write the candidate organizations to
+  """
+  run_cfg_path = "{}/{}-full.cfg".format(workspace.mem_cfg_dir, label)
+  exploration_prefix = "{}/{}-candidates".format(workspace.log_dir, label)
+  nvsim_input_cfg.generate_exploration_cfg(run_cfg_path, exploration_prefix)
+  return run_cfg_path, exploration_prefix + ".csv"
+
+
+def setup_study_point(config, data_df, cell_type, opt_target, capacity, bits_per_cell, exp_name="default",
+                      process_node=22, word_width=64, output_path="output", cell_tentpoles=True, workspace=None, multi_target=False):
+  """ Generates the cell files and mem cfgs for one cell_type/opt_target/capacity/bits_per_cell
+  combination and returns a :class:`StudyPoint` holding the NVSim jobs needed to evaluate it
+
+  :param config: parsed JSON study config
+  :type config: dict
+  :param data_df: pandas dataframe object containing NVM spreadsheet data for cell_type
+  :type data_df: pandas dataframe
+  :param cell_type: String specifying which NVM technology to use
+  :type cell_type: String
+  :param opt_target: NVSim optimization target
+  :type opt_target: String
+  :param capacity: capacity in MB
+  :type capacity: int
+  :param bits_per_cell: number of bits per cell
+  :type bits_per_cell: int
+  :param cell_tentpoles: whether to run a tentpole-style study rather than custom cells
+  :type cell_tentpoles: bool
+  :param workspace: where generated cell files, mem cfgs, logs, and NVSim outputs go; defaults to the shared data/ and output/ directories
+  :type workspace: :class:`StudyWorkspace`
+  :param multi_target: run NVSim in full exploration mode, once per cell for every opt_target, and pick this point's design from the candidates
+  :type multi_target: bool
+  :return: study point with its NVSim jobs
+  :rtype: :class:`StudyPoint`
+  """
+  if workspace is None:
+      workspace = StudyWorkspace(exp_name=exp_name, output_path=output_path)
+  results_csv = "{}/results/{}_{}MB_{}_{}BPC-{}.csv".format(output_path, cell_type, capacity, opt_target, bits_per_cell, exp_name)
+
+  point = StudyPoint(cell_type=cell_type, opt_target=opt_target, capacity=capacity,
+                     bits_per_cell=bits_per_cell, results_csv=results_csv)
+
+  if (cell_tentpoles == True): #set up default, tentpole-style study per cell type
+      # Creates the tentpoles per technology
+      best_case_cell_path, worst_case_cell_path, best_case_cell_cfg, worst_case_cell_cfg = form_tentpoles(data_df, cell_type, bits_per_cell, cell_dir=workspace.cell_dir)
+      cases = [("worst_case", worst_case_cell_path, worst_case_cell_cfg), ("best_case", best_case_cell_path, best_case_cell_cfg)]
+
+      for case, cell_path, cell_cfg in cases:
+          cfg_path = "{}/{}_{}MB_{}_{}BPC-{}.cfg".format(workspace.mem_cfg_dir, cell_type, capacity, opt_target, bits_per_cell, case)
+          stdout_log = "{}/{}_{}MB_{}_{}BPC-{}_output".format(workspace.log_dir, cell_type, capacity, opt_target, bits_per_cell, case)
+          stderr_log = "{}/{}_{}MB_{}_{}BPC-{}_error".format(workspace.log_dir, cell_type, capacity, opt_target, bits_per_cell, case)
+          nvsim_output_path = "{}/{}_{}MB_{}_{}BPC_{}b-{}_nvsim_output.pkl".format(workspace.nvsim_output_dir, cell_type, capacity, opt_target, bits_per_cell, word_width, case)
+
+          ## Generate corresponding mem cfgs
+          nvsim_input_cfg = nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(mem_cfg_file_path = cfg_path,
+                                           process_node = process_node,
+                                           opt_target = opt_target,
+                                           word_width = word_width,
+                                           capacity = capacity,
+                                           cell_type = cell_cfg)
+          nvsim_input_cfg.generate_mem_cfg()
+          run_cfg_path, exploration_csv = None, None
+          if multi_target:
+              run_cfg_path, exploration_csv = exploration_run(nvsim_input_cfg, workspace, "{}_{}MB_{}BPC-{}".format(cell_type, capacity, bits_per_cell, case))
+          point.add_cell(cell_path, cell_cfg, cfg_path, nvsim_input_cfg, nvsim_output_path, stdout_log, stderr_log,
+                         run_cfg_path=run_cfg_path, exploration_csv=exploration_csv)
+  else: #initialize cell configs according to input over-rides or default settings
+      if len(config["custom_cells"]) == 0: #use default values per technology
+        custom_cell_inputs = [{"name":"default", "bits_per_cell":bits_per_cell}]
+      else:
+        custom_cell_inputs = []
+        for i in range(len(config["custom_cells"])):
+          this_custom_cell_input = config["custom_cells"][i]
+          #if no name, assign a unique one
+          if this_custom_cell_input["cell_type"] == cell_type:
+            if not "name" in this_custom_cell_input:
+              this_custom_cell_input["name"] = "custom"+cell_type+str(i)
+            custom_cell_inputs.append(this_custom_cell_input)
+
+      for this_custom_cell_input in custom_cell_inputs:
+        name = this_custom_cell_input["name"]
+        this_cell_path, this_cell_cfg = gen_custom_cell(cell_type, this_custom_cell_input, cell_dir=workspace.cell_dir)
+        this_cfg_path = "{}/{}_{}MB_{}_{}BPC_{}.cfg".format(workspace.mem_cfg_dir, cell_type, capacity, opt_target, bits_per_cell, name)
+        nvsim_input_cfg = nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(mem_cfg_file_path = this_cfg_path,
+                                         process_node = process_node,
+                                         opt_target = opt_target,
+                                         word_width = word_width,
+                                         capacity = capacity,
+                                         cell_type = this_cell_cfg)
+        nvsim_input_cfg.generate_mem_cfg()
+        run_cfg_path, exploration_csv = None, None
+        if multi_target:
+          run_cfg_path, exploration_csv = exploration_run(nvsim_input_cfg, workspace, "{}_{}MB_{}BPC_{}".format(cell_type, capacity, bits_per_cell, name))
+        point.add_cell(this_cell_path, this_cell_cfg, this_cfg_path, nvsim_input_cfg,
+                       "{}/{}_{}MB_{}_{}BPC_{}b_{}_nvsim_output.pkl".format(workspace.nvsim_output_dir, cell_type, capacity, opt_target, bits_per_cell, word_width, name),
+                       "{}/{}_{}MB_{}_{}BPC_{}_output".format(workspace.log_dir, cell_type, capacity, opt_target, bits_per_cell, name),
+                       "{}/{}_{}MB_{}_{}BPC_{}_error".format(workspace.log_dir, cell_type, capacity, opt_target, bits_per_cell, name),
+                       run_cfg_path=run_cfg_path, exploration_csv=exploration_csv)
+
+  return point
+
+
+def study_point_metadata(point, exp_name="default"):
+  """ Returns the study details results sinks record with a :class:`StudyPoint`'s results """
+  return {"cell_type": point.cell_type, "capacity": point.capacity, "opt_target": point.opt_target,
+          "bits_per_cell": point.bits_per_cell, "exp_name": exp_name}
+
+
+def evaluation_code_digest():
+  """ Returns a digest of the analytical model and workload sources, so that editing them invalidates
+  every reused workload fragment. Memoized per process.
+  """
+  if "digest" not in evaluation_code_digests:
+      src_dir = os.path.dirname(os.path.abspath(__file__))
+      paths = [os.path.join(src_dir, "eval_utils.py"), os.path.join(src_dir, "traffic.py")]
+      workload_dir = os.path.join(os.path.dirname(src_dir), "data", "workload_data")
+      if os.path.exists(workload_dir):
+          paths.extend(os.path.join(workload_dir, name) for name in sorted(os.listdir(workload_dir)) if name.endswith(".py"))
+      evaluation_code_digests["digest"] = inputs_digest([file_digest(path) for path in paths])
+  return evaluation_code_digests["digest"]
+
+evaluation_code_digests = {}
+
+
+def study_point_fragment_dir(point):
+  """ Returns the directory holding the per-workload fragments a study point's results csv is assembled from """
+  results_dir, results_name = os.path.split(point.results_csv)
+  return os.path.join(results_dir, "fragments", os.path.splitext(results_name)[0])
+
+
+def fragment_pattern_path(fragment_path):
+  """ Returns where the access pattern a sweep fragment left behind is saved """
+  return os.path.splitext(fragment_path)[0] + "-pattern.pkl"
+
+
+def load_fragment_pattern(fragment_path):
+  """ Returns the access pattern saved after a sweep fragment was evaluated, or None if it cannot be read """
+  try:
+      with open(fragment_pattern_path(fragment_path), "rb") as f:
+          return pickle.load(f)
+  except (OSError, EOFError, pickle.UnpicklingError):
+      return None
+
+
+def relabel_fragment(fragment_path, old_paths, new_paths):
+  """ Rewrites the cell cfg paths reported in a reused sweep fragment, e.g., when it was evaluated in
+  another isolated workspace, so its rows name the cells of this run
+  """
+  relabel = dict((old, new) for (old, new) in zip(old_paths, new_paths) if old != new)
+  if not relabel:
+      return
+  with open(fragment_path, newline='') as f:
+      rows = list(csv.reader(f))
+  # fields keep the leading space load_cfg_fields leaves in cfg values
+  rows = [[field.replace(field.strip(), relabel[field.strip()]) if field.strip() in relabel else field for field in row] for row in rows]
+  tmp_path = fragment_path + ".tmp"
+  with open(tmp_path, "w", newline='') as f:
+      csv.writer(f, dialect='excel').writerows(rows)
+  os.replace(tmp_path, fragment_path)
+
+
+def evaluate_study_point(point, nvsim_outputs, access_pattern, traffic, exp_name="default", adaptive_points=None, adaptive_traffic={}):
+  """ Runs the application-level traffic sweeps for a :class:`StudyPoint` whose NVSim jobs
+  have all finished and writes the results to its CSV.
+
+  Each cell's header and each (cell, traffic type) sweep is written to a fragment of its own, and the
+  point's CSV is assembled from them. A fragment is reused from an earlier run if everything it
+  depends on is unchanged: the NVSim inputs of the point's cells, the access pattern it started from,
+  the traffic type, and the analytical model and workload sources. NVSim inputs are compared by content,
+  so a fragment evaluated in another isolated workspace is reused too, with its rows relabeled with
+  this run's cell paths. Adding a traffic type to a study therefore only evaluates the new sweeps.
+
+  :param point: study point to evaluate
+  :type point: :class:`StudyPoint`
+  :param nvsim_outputs: parsed NVSim outputs, in the same order as point.jobs
+  :type nvsim_outputs: list of :class:`NVSimOutputConfig`
+  :param access_pattern: :class:`PatternConfig` object
+  :type access_pattern: :class:`PatternConfig`
+  :param traffic: list of traffic types to evaluate (e.g., "generic", "dnn")
+  :type traffic: list of Strings
+  :param exp_name: study name recorded by results sinks
+  :type exp_name: String
+  :param adaptive_points: (reads/s, writes/s) points for "adaptive_generic" traffic, or None to refine them over this point's cells
+  :type adaptive_points: list of tuples
+  :param adaptive_traffic: options for :func:`adaptive_traffic_points` used when adaptive_points is None
+  :type adaptive_traffic: dict
+  :return: traffic types that were evaluated rather than reused, per cell
+  :rtype: list of lists of Strings
+  """
+  # Results are appended as they are reported, so start from an empty file
+  if os.path.exists(point.results_csv):
+      os.remove(point.results_csv)
+  set_results_metadata(point.results_csv, study_point_metadata(point, exp_name))
+  nvsim_input_cfgs = point.nvsim_input_cfgs
+  cell_paths = point.cell_paths
+  cfg_paths = point.cfg_paths
+
+  fragment_dir = study_point_fragment_dir(point)
+  if not os.path.exists(fragment_dir):
+      os.makedirs(fragment_dir, exist_ok=True)
+  fragments_json = os.path.join(fragment_dir, "fragments.json")
+  previous_fragments = {}
+  if os.path.exists(fragments_json):
+      with open(fragments_json) as f:
+          previous_fragments = json.load(f)
+  # fragments can only be matched to their inputs if the NVSim inputs of every cell are known
+  job_keys = [job.result_key() for job in point.jobs]
+  reusable = None not in job_keys and len(job_keys) == len(nvsim_outputs)
+  for i in range(len(point.extra_columns)):
+      set_extra_columns(cell_paths[i], cfg_paths[i], *point.extra_columns[i])
+
+  fragments = {}
+  fragment_paths = []
+  evaluated = []
+  # Report results, add cell config params, mem config params, and whatever we are sweeping to the header
+  for i in range(len(nvsim_outputs)):
+      result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
+      result.evaluate()
+
+      print("Retrieved Array-Level Results; Running Analytical Model")
+
+      # Run application-level sweeps and save results
+      #FIXME also add conditional for customized traffic inputs
+      evaluated.append([])
+      if len(traffic) > 0:
+          # First function call prints header to the spreadsheet, second one prints to csv. Only need to report the header once
+          header_path = os.path.join(fragment_dir, "{}-header.csv".format(i))
+          if os.path.exists(header_path):
+              os.remove(header_path)
+          set_results_fragment(header_path)
+          result.report_header_benchmark(1, header_path, cell_paths[i], cfg_paths[i])
+          fragment_paths.append(header_path)
+
+          for traffic_type in [t for t in TRAFFIC_TYPES if t in traffic]:
+              name = "{}-{}.csv".format(i, traffic_type)
+              fragment_path = os.path.join(fragment_dir, name)
+              fragment_paths.append(fragment_path)
+              # sweeps leave the benchmark name and frequencies they last reported in access_pattern, so the
+              # next sweep's rows depend on the state it starts from
+              inputs = inputs_digest({"nvsim": job_keys, "cell": i,
+                                      "traffic_type": traffic_type, "access_pattern": vars(access_pattern), "columns": point.extra_columns,
+                                      "adaptive_points": adaptive_points if traffic_type == "adaptive_generic" else None,
+                                      "adaptive_traffic": adaptive_traffic if traffic_type == "adaptive_generic" else None,
+                                      "code": evaluation_code_digest()})
+              previous = previous_fragments.get(name)
+              if reusable and previous is not None and previous["inputs"] == inputs and file_digest(fragment_path) == previous["output_digest"]:
+                  previous_pattern = load_fragment_pattern(fragment_path)
+                  if previous_pattern is not None:
+                      # the following sweeps continue from a copy of the pattern this sweep left behind
+                      access_pattern = previous_pattern
+                      relabel_fragment(fragment_path, previous["cell_paths"], cell_paths)
+                      fragments[name] = dict(previous, cell_paths=cell_paths, output_digest=file_digest(fragment_path))
+                      continue
+
+              if os.path.exists(fragment_path):
+                  os.remove(fragment_path)
+              set_results_fragment(fragment_path)
+              run_traffic(traffic_type, access_pattern, nvsim_input_cfgs, nvsim_outputs, fragment_path, cell_paths, cfg_paths,
+                          adaptive_points=adaptive_points, adaptive_traffic=adaptive_traffic)
+              get_results_writer(fragment_path).close()
+              if not os.path.exists(fragment_path):
+                  open(fragment_path, "w").close()
+              with open(fragment_pattern_path(fragment_path), "wb") as f:
+                  pickle.dump(access_pattern, f)
+              fragments[name] = {"inputs": inputs, "output_digest": file_digest(fragment_path), "cell_paths": cell_paths}
+              evaluated[i].append(traffic_type)
+
+  # Results are buffered per csv; make sure they are on disk before this point is assembled and combined
+  close_results_writers()
+
+  if fragment_paths:
+      tmp_path = point.results_csv + ".tmp"
+      with open(tmp_path, "wb") as results_fp:
+          for fragment_path in fragment_paths:
+              with open(fragment_path, "rb") as fragment_fp:
+                  shutil.copyfileobj(fragment_fp, results_fp)
+      os.replace(tmp_path, point.results_csv)
+
+      headers, rows = read_results_csv(point.results_csv)
+      publish_results(point.results_csv, headers, rows)
+
+  num_evaluated = sum(len(traffic_types) for traffic_types in evaluated)
+  if len(fragments) > num_evaluated:
+      print("Reused {} of {} traffic sweeps from earlier runs".format(len(fragments) - num_evaluated, len(fragments)))
+
+  tmp_json = fragments_json + ".tmp"
+  with open(tmp_json, "w") as f:
+      json.dump(fragments, f, indent=1)
+  os.replace(tmp_json, fragments_json)
+  return evaluated
+
+
+def evaluate_study_point_task(payload):
+  """ Work queue handler for "evaluate" tasks: runs :func:`evaluate_study_point` on a worker, writing the
+  point's results csv, fragments, and columnar copies to the shared filesystem
+
+  :param payload: the point, its parsed NVSim outputs, access pattern, traffic, exp_name, adaptive_points, and results_formats
+  :type payload: dict
+  :return: traffic types evaluated rather than reused, per cell, as from :func:`evaluate_study_point`
+  :rtype: list of lists of Strings
+  """
+  set_results_formats(payload["results_formats"])
+  return evaluate_study_point(payload["point"], payload["nvsim_outputs"], payload["access_pattern"], payload["traffic"],
+                              exp_name=payload["exp_name"], adaptive_points=payload["adaptive_points"])
@@ -0,0 +1,259 @@
+import os
+import json
+import pickle
+import threading
+import numpy as np
+import nvmexplorer_src.input_defs
+from nvmexplorer_src.warm_start import organization_family
+
+# NVSimOutputConfig fields the surrogate predicts, i.e., every array characteristic the traffic evaluation reads
+SURROGATE_TARGETS = ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area",
+                     "read_bw", "write_bw", "area_efficiency"]
+# column added to every results row of a study with a surrogate screen, flagging rows evaluated with predicted array characteristics
+PREDICTED_HEADERS = ["Predicted"]
+
+
+def surrogate_features(input_cfg):
+  """ Returns the numeric description of a design the surrogate learns from: every numeric parameter of
+  the cell, the array capacity, word width and process node, and one-hot encodings of the cell type
+  and optimization target
+
+  :param input_cfg: mem cfg of the design
+  :type input_cfg: :class:`NVSimInputConfig`
+  :return: feature name -> value
+  :rtype: dict
+  """
+  features = {}
+  for (name, value) in vars(input_cfg.cell_type).items():
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+      features["cell." + name] = float(value)
+  features["cell_type=" + str(input_cfg.cell_type.mem_cell_type)] = 1.
+  features["opt_target=" + str(input_cfg.opt_target)] = 1.
+  features["log_capacity"] = float(np.log2(input_cfg.capacity))
+  features["word_width"] = float(input_cfg.word_width)
+  features["process_node"] = float(input_cfg.process_node)
+  return features
+
+
+def predicted_columns(predicted):
+  """ Returns the values of the :data:`PREDICTED_HEADERS` columns for a design that was (or was not) predicted """
+  return ["True" if predicted else "False"]
+
+
+class GaussianProcess:
+  def __init__(self,
+                length_scale=None, #RBF length scale in standardized feature units; defaults to the median distance between training designs
+                noise=1e-2 #observation noise variance, relative to the standardized target variance
+                ):
+    self.length_scale = length_scale
+    self.noise = noise
+
+  def kernel(self, a, b):
+    sq_dist = (a**2).sum(axis=1)[:, None] + (b**2).sum(axis=1)[None, :] - 2. * a.dot(b.T)
+    return np.exp(-0.5 * np.maximum(sq_dist, 0.) / self.fitted_length_scale**2)
+
+  def fit(self, x, y):
+    """ Fits independent GPs with a shared RBF kernel to each column of y
+
+    :param x: training features, one row per design
+    :type x: numpy array
+    :param y: training targets, one row per design and one column per target
+    :type y: numpy array
+    """
+    self.x_mean = x.mean(axis=0)
+    self.x_std = x.std(axis=0)
+    self.x_std[self.x_std == 0] = 1.
+    self.y_mean = y.mean(axis=0)
+    self.y_std = y.std(axis=0)
+    self.y_std[self.y_std == 0] = 1.
+    self.x_train = (x - self.x_mean) / self.x_std
+    self.fitted_length_scale = self.length_scale
+    if self.fitted_length_scale is None:
+      dist = np.sqrt(np.maximum((self.x_train**2).sum(axis=1)[:, None] + (self.x_train**2).sum(axis=1)[None, :] - 2. * self.x_train.dot(self.x_train.T), 0.))
+      nonzero = dist[dist > 0]
+      self.fitted_length_scale = float(np.median(nonzero)) if len(nonzero) else 1.
+    k = self.kernel(self.x_train, self.x_train) + self.noise * np.eye(len(self.x_train))
+    self.chol = np.linalg.cholesky(k)
+    self.alpha = np.linalg.solve(self.chol.T, np.linalg.solve(self.chol, (y - self.y_mean) / self.y_std))
+    return self
+
+  def predict(self, x):
+    """ Returns the posterior mean and standard deviation of every target for each row of x
+
+    :rtype: tuple of numpy arrays
+    """
+    k_star = self.kernel((x - self.x_mean) / self.x_std, self.x_train)
+    mean = k_star.dot(self.alpha) * self.y_std + self.y_mean
+    v = np.linalg.solve(self.chol, k_star.T)
+    var = np.maximum(1. + self.noise - (v**2).sum(axis=0), 0.)
+    return mean, np.sqrt(var)[:, None] * self.y_std[None, :]
+
+
+class ArraySurrogate:
+  def __init__(self,
+                targets=SURROGATE_TARGETS, #NVSimOutputConfig fields to predict
+                max_samples=2000 #most training designs to fit on; the GP fit is cubic in this
+                ):
+    self.targets = list(targets)
+    self.max_samples = max_samples
+    self.feature_names = []
+    self.model = None
+    self.num_samples = 0
+    self.training = [] # (features, log targets, organization_family) per training design
+
+  def fit(self, nvsim_outputs):
+    """ Fits the surrogate to parsed NVSim results. Targets are modeled in log space, so predictions
+    are always positive and the predicted standard deviation is a relative error. Results with a
+    missing (non-positive) target, e.g., from a failed NVSim run, are skipped.
+
+    :param nvsim_outputs: parsed NVSim results with their input cfgs attached
+    :type nvsim_outputs: list of :class:`NVSimOutputConfig`
+    :return: number of designs fit on
+    :rtype: int
+    """
+    self.training = []
+    for nvsim_output in nvsim_outputs[-self.max_samples:]:
+      values = [getattr(nvsim_output, target) for target in self.targets]
+      if min(values) <= 0:
+        continue
+      self.training.append((surrogate_features(nvsim_output.input_cfg), np.log(values), organization_family(nvsim_output.input_cfg)))
+    self.num_samples = len(self.training)
+    if self.num_samples == 0:
+      self.model = None
+      return 0
+    self.feature_names = sorted(set(name for (features, y, family) in self.training for name in features))
+    x = np.array([self.feature_vector(features) for (features, y, family) in self.training])
+    y = np.array([y for (features, y, family) in self.training])
+    self.model = GaussianProcess().fit(x, y)
+    return self.num_samples
+
+  def feature_vector(self, features):
+    return [features.get(name, 0.) for name in self.feature_names]
+
+  def predict(self, input_cfg):
+    """ Predicts the array characteristics of a design
+
+    :param input_cfg: mem cfg of the design
+    :type input_cfg: :class:`NVSimInputConfig`
+    :return: target -> predicted value, and target -> standard deviation of its log (roughly, the relative error)
+    :rtype: tuple of dicts
+    """
+    features = surrogate_features(input_cfg)
+    mean, std = self.model.predict(np.array([self.feature_vector(features)]))
+    return dict(zip(self.targets, [float(value) for value in np.exp(mean[0])])), dict(zip(self.targets, [float(value) for value in std[0]]))
+
+  def known_designs(self):
+    """ Returns :func:`organization_family` -> log targets of the training designs in that family """
+    known = {}
+    for (features, y, family) in self.training:
+      known.setdefault(family, []).append(y)
+    return known
+
+
+def load_cached_outputs(cache_dir):
+  """ Returns every parsed NVSim result in an :class:`NVSimCache` directory, oldest first """
+  if not os.path.exists(cache_dir):
+    return []
+  paths = sorted((os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".pkl")), key=os.path.getmtime)
+  nvsim_outputs = []
+  for path in paths:
+    try:
+      with open(path, 'rb') as f:
+        nvsim_outputs.append(pickle.load(f))
+    except (EOFError, pickle.UnpicklingError):
+      continue
+  return nvsim_outputs
+
+
+class SurrogateScreen:
+  def __init__(self,
+                surrogate=None, #fitted ArraySurrogate
+                log_path="output/results/default-surrogate.jsonl", #where every screening decision is appended
+                objectives=["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area"], #targets a design must win on (lower is better) to be worth simulating
+                uncertainty=0.25, #simulate any design whose predicted log standard deviation on an objective exceeds this
+                margin=2., #standard deviations a prediction is shifted toward "better" before checking dominance
+                min_samples=20 #simulate everything until the surrogate has been fit on this many designs
+                ):
+    self.surrogate = surrogate
+    self.log_path = log_path
+    self.objectives = list(objectives)
+    self.uncertainty = uncertainty
+    self.margin = margin
+    self.min_samples = min_samples
+    self.lock = threading.Lock()
+    log_dir = os.path.dirname(self.log_path)
+    if log_dir and not os.path.exists(log_dir):
+      os.makedirs(log_dir, exist_ok=True)
+    self.fp = open(self.log_path, "w")
+    self.counts = {"simulate": 0, "predict": 0}
+    # organization_family -> log targets of every simulated design a candidate competes with; grows as the study runs
+    self.known = surrogate.known_designs() if surrogate is not None else {}
+
+  def observe(self, nvsim_output):
+    """ Adds a simulated design to the ones later candidates are compared against
+
+    :param nvsim_output: parsed NVSim result
+    :type nvsim_output: :class:`NVSimOutputConfig`
+    """
+    if self.surrogate is None:
+      return
+    values = [getattr(nvsim_output, target) for target in self.surrogate.targets]
+    if min(values) <= 0:
+      return
+    with self.lock:
+      self.known.setdefault(organization_family(nvsim_output.input_cfg), []).append(np.log(values))
+
+  def screen(self, job):
+    """ Decides whether a :class:`NVSimJob` needs a real NVSim run. A design is predicted rather than
+    simulated only if the surrogate is confident about it (every objective within the uncertainty
+    bound) and even its optimistic prediction is dominated by a design already simulated with the same
+    cell type, capacity, word width, optimization target, process node, and bits per cell (see
+    :func:`organization_family`), either before the surrogate was fit or earlier in this study. Every
+    decision is logged with the predictions behind it.
+
+    :param job: NVSim job whose mem cfg has been generated
+    :type job: :class:`NVSimJob`
+    :return: a predicted :class:`NVSimOutputConfig` to use instead of running NVSim, or None to run it
+    :rtype: :class:`NVSimOutputConfig`
+    """
+    record = {"cfg_path": job.cfg_path, "cell_path": job.input_cfg.cell_type.cell_file_path, "key": job.cache_key,
+              "samples": self.surrogate.num_samples if self.surrogate is not None else 0}
+    prediction = None
+    if self.surrogate is None or self.surrogate.model is None or self.surrogate.num_samples < self.min_samples:
+      decision, reason = "simulate", "surrogate fit on fewer than {} designs".format(self.min_samples)
+    else:
+      predicted, std = self.surrogate.predict(job.input_cfg)
+      record.update({"predicted": predicted, "std": std})
+      uncertain = [target for target in self.objectives if std[target] > self.uncertainty]
+      optimistic = np.array([np.log(predicted[target]) - self.margin * std[target] for target in self.objectives])
+      objective_idx = [self.surrogate.targets.index(target) for target in self.objectives]
+      dominated_by = None
+      with self.lock:
+        known_designs = list(self.known.get(organization_family(job.input_cfg), []))
+      for y in known_designs:
+        known = y[objective_idx]
+        if (known <= optimistic).all() and (known < optimistic).any():
+          dominated_by = dict(zip(self.objectives, np.exp(known)))
+          break
+      if uncertain:
+        decision, reason = "simulate", "uncertain prediction of {}".format(uncertain)
+      elif dominated_by is None:
+        decision, reason = "simulate", "possibly non-dominated"
+      else:
+        decision, reason = "predict", "dominated by a simulated design"
+        record["dominated_by"] = dominated_by
+        prediction = nvmexplorer_src.input_defs.nvsim_interface.NVSimOutputConfig(input_cfg=job.input_cfg, **predicted)
+    record.update({"decision": decision, "reason": reason})
+    with self.lock:
+      self.counts[decision] += 1
+      self.fp.write(json.dumps(record, sort_keys=True, default=float) + "\n")
+      self.fp.flush()
+    return prediction
+
+  def print_summary(self):
+    print("Surrogate screening: {} designs simulated, {} predicted; decisions logged to {}".format(self.counts["simulate"], self.counts["predict"], self.log_path))
+
+  def close(self):
+    if self.fp is not None:
+      self.fp.close()
+      self.fp = None
@@ -0,0 +1,204 @@
+import os
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# survey spreadsheet per technology, as exported to output/NVM_data/<name>_data.pkl
+SURVEY_NAMES = {"STT": "STTRAM", "RRAM": "RRAM", "PCM": "PCM", "CTT": "CTT", "FeFET": "FeFET", "FeRAM": "FeRAM"}
+SURVEY_DB = "nvm_survey.db"
+SURVEY_SCHEMA_VERSION = "1"
+
+survey_cache = {} # (db_path, mtime, technology, columns) -> dataframe
+
+
+def survey_db_path(data_dir="output/NVM_data"):
+  return os.path.join(data_dir, SURVEY_DB)
+
+
+def is_numeric_column(values):
+  """ A survey column is numeric if every non-empty entry is a number """
+  for value in values:
+    if isinstance(value, str):
+      if value.strip() == "":
+        continue
+      return False
+    if value is not None and not isinstance(value, (int, float, np.integer, np.floating)):
+      return False
+  return True
+
+
+def publication_year(value):
+  match = re.search(r"(19|20)\d\d", str(value))
+  return int(match.group(0)) if match else None
+
+
+def ingest_survey_data(data_dir="output/NVM_data", db_path=None):
+  """ Builds the survey database from the per-technology spreadsheet pickles. Numeric columns are
+  coerced to REAL with empty entries as NULL, and each row gets its technology and publication year
+  so the survey can be queried across technologies. This is a one-time migration; the database is
+  what studies read.
+
+  :param data_dir: directory holding the <TECH>_data.pkl files
+  :type data_dir: String
+  :param db_path: database to (re)create, by default nvm_survey.db in data_dir
+  :type db_path: String
+  :return: path to the database
+  :rtype: String
+  """
+  if db_path is None:
+    db_path = survey_db_path(data_dir)
+  tmp_path = db_path + ".tmp"
+  if os.path.exists(tmp_path):
+    os.remove(tmp_path)
+  conn = sqlite3.connect(tmp_path)
+  conn.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+  conn.execute("INSERT INTO metadata VALUES ('schema_version', ?)", (SURVEY_SCHEMA_VERSION,))
+  # column order and type per technology, so each technology's frame is rebuilt exactly as surveyed
+  conn.execute("CREATE TABLE survey_columns (technology TEXT, position INTEGER, name TEXT, numeric INTEGER)")
+
+  frames = {}
+  for technology, name in SURVEY_NAMES.items():
+    pkl_path = os.path.join(data_dir, "{}_data.pkl".format(name))
+    if os.path.exists(pkl_path):
+      frames[technology] = pd.read_pickle(pkl_path)
+
+  all_columns = []
+  numeric_columns = set()
+  for technology, df in frames.items():
+    for position, column in enumerate(df.columns):
+      numeric = is_numeric_column(df[column].tolist())
+      conn.execute("INSERT INTO survey_columns VALUES (?, ?, ?, ?)", (technology, position, column, int(numeric)))
+      if column not in all_columns:
+        all_columns.append(column)
+      if numeric:
+        numeric_columns.add(column)
+  # a column that is text for any technology is stored as text for all of them
+  for technology, df in frames.items():
+    for column in df.columns:
+      if not is_numeric_column(df[column].tolist()):
+        numeric_columns.discard(column)
+
+  # SQL column names are case-insensitive and surveys differ only in case (e.g., "Cell Area [um2]" and
+  # "Cell area [um2]"), so columns are stored as c0, c1, ... with their survey names in survey_column_names
+  conn.execute("CREATE TABLE survey_column_names (name TEXT, sql_name TEXT, numeric INTEGER)")
+  sql_names = {}
+  for column in all_columns:
+    sql_names[column] = "c{}".format(len(sql_names))
+    conn.execute("INSERT INTO survey_column_names VALUES (?, ?, ?)", (column, sql_names[column], int(column in numeric_columns)))
+  column_defs = ", ".join("{} {}".format(sql_names[column], "REAL" if column in numeric_columns else "TEXT") for column in all_columns)
+  conn.execute("CREATE TABLE survey (technology TEXT, row_index INTEGER, year INTEGER, {})".format(column_defs))
+  for technology, df in frames.items():
+    names = ", ".join(sql_names[column] for column in df.columns)
+    placeholders = ", ".join("?" for column in df.columns)
+    rows = []
+    for index, row in zip(df.index, df.itertuples(index=False)):
+      values = []
+      for column, value in zip(df.columns, row):
+        if isinstance(value, str) and value.strip() == "":
+          value = None
+        elif column in numeric_columns and value is not None:
+          value = float(value)
+        values.append(value)
+      year = publication_year(df.at[index, "Publication/Year"]) if "Publication/Year" in df.columns else None
+      rows.append([technology, int(index), year] + values)
+    conn.executemany("INSERT INTO survey (technology, row_index, year, {}) VALUES (?, ?, ?, {})".format(names, placeholders), rows)
+  conn.execute("CREATE INDEX survey_technology ON survey (technology, row_index)")
+  conn.execute("CREATE INDEX survey_year ON survey (year)")
+  conn.commit()
+  conn.close()
+  os.replace(tmp_path, db_path)
+  return db_path
+
+
+def query_survey(technologies=None, years=None, ranges={}, columns=None, db_path=None):
+  """ Returns surveyed cells matching the given filters as a dataframe with technology and year columns
+
+  :param technologies: technologies to include (e.g., ["STT", "RRAM"]), or None for all
+  :type technologies: list of Strings
+  :param years: (first, last) publication years, inclusive, or None for all
+  :type years: tuple of ints
+  :param ranges: column -> (min, max) inclusive bounds; either bound may be None
+  :type ranges: dict
+  :param columns: survey columns to return, or None for all
+  :type columns: list of Strings
+  :param db_path: survey database, by default output/NVM_data/nvm_survey.db
+  :type db_path: String
+  :rtype: pandas dataframe
+  """
+  if db_path is None:
+    db_path = survey_db_path()
+  if not os.path.exists(db_path):
+    ingest_survey_data(os.path.dirname(db_path), db_path)
+  conn = sqlite3.connect(db_path)
+  try:
+    sql_names = dict(conn.execute("SELECT name, sql_name FROM survey_column_names").fetchall())
+    for column in list(ranges) + list(columns or []):
+      if column not in sql_names:
+        raise KeyError("Unknown survey column {}".format(column))
+    conditions = []
+    params = []
+    if technologies is not None:
+      conditions.append("technology IN ({})".format(", ".join("?" for t in technologies)))
+      params.extend(technologies)
+    if years is not None:
+      conditions.append("year BETWEEN ? AND ?")
+      params.extend(years)
+    for column, (low, high) in ranges.items():
+      if low is not None:
+        conditions.append("{} >= ?".format(sql_names[column]))
+        params.append(low)
+      if high is not None:
+        conditions.append("{} <= ?".format(sql_names[column]))
+        params.append(high)
+    if columns is None:
+      columns = list(sql_names)
+    selected = ", ".join(["technology", "row_index", "year"] + [sql_names[column] for column in columns])
+    sql = "SELECT {} FROM survey".format(selected)
+    if conditions:
+      sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY technology, row_index"
+    df = pd.read_sql_query(sql, conn, params=params)
+  finally:
+    conn.close()
+  df.columns = ["technology", "row_index", "year"] + list(columns)
+  return df
+
+
+def load_survey_data(technology, columns=None, db_path=None):
+  """ Returns one technology's survey as a dataframe with its original columns, in order, and its
+  original row index. Numeric columns are float64 and empty entries are NaN. Results are memoized
+  in-process until the database changes.
+
+  :param technology: technology name (e.g., "STT", "RRAM")
+  :type technology: String
+  :param columns: columns to load, or None for every column surveyed for this technology
+  :type columns: list of Strings
+  :param db_path: survey database, by default output/NVM_data/nvm_survey.db
+  :type db_path: String
+  :rtype: pandas dataframe
+  """
+  if db_path is None:
+    db_path = survey_db_path()
+  if not os.path.exists(db_path):
+    ingest_survey_data(os.path.dirname(db_path), db_path)
+  key = (os.path.abspath(db_path), os.stat(db_path).st_mtime_ns, technology, None if columns is None else tuple(columns))
+  if key not in survey_cache:
+    conn = sqlite3.connect(db_path)
+    try:
+      surveyed = conn.execute("SELECT name, numeric FROM survey_columns WHERE technology = ? ORDER BY position", (technology,)).fetchall()
+    finally:
+      conn.close()
+    if columns is None:
+      columns = [name for (name, numeric) in surveyed]
+    numeric = dict(surveyed)
+    df = query_survey(technologies=[technology], columns=columns, db_path=db_path)
+    df = df.set_index("row_index")
+    df.index.name = None
+    df = df[list(columns)]
+    for column in columns:
+      if numeric.get(column, 1):
+        df[column] = df[column].astype(float)
+    survey_cache[key] = df
+  # callers get their own copy so the memoized frame is never modified
+  return survey_cache[key].copy()
@@ -0,0 +1,111 @@
+import itertools
+
+# cell types form_tentpoles has best/worst case models for; anything else would silently become an SRAM cell
+TENTPOLE_CELL_TYPES = ["SRAM", "STT", "PCM", "CTT", "RRAM", "FeFET"]
+# cell types whose tentpole cells are generated with bits_per_cell levels; the rest are always single-level
+MLC_CELL_TYPES = ["RRAM", "FeFET"]
+# optimization targets NVSim accepts
+NVSIM_OPT_TARGETS = ["ReadLatency", "WriteLatency", "ReadDynamicEnergy", "WriteDynamicEnergy", "ReadEDP", "WriteEDP", "LeakagePower", "Area"]
+
+
+def effective_bits_per_cell(cell_type, bits_per_cell, cell_tentpoles=True):
+  """ Returns the bits per cell NVSim actually simulates for a study point. Only RRAM and FeFET
+  tentpole cells are multi-level; custom cells take their levels from the custom cell's "mlc" input,
+  so bits_per_cell only labels their results.
+
+  :param cell_type: String specifying which NVM technology to use
+  :type cell_type: String
+  :param bits_per_cell: requested number of bits per cell
+  :type bits_per_cell: int
+  :param cell_tentpoles: whether the study is tentpole-style rather than custom cells
+  :type cell_tentpoles: bool
+  :rtype: int
+  """
+  if cell_tentpoles and cell_type in MLC_CELL_TYPES:
+    return bits_per_cell
+  return 1
+
+
+def invalid_reason(cell_type, opt_target, capacity, bits_per_cell, cell_tentpoles=True):
+  """ Returns why a cell_type/opt_target/capacity/bits_per_cell combination cannot be simulated, or
+  None if it can
+  """
+  if cell_tentpoles and cell_type not in TENTPOLE_CELL_TYPES:
+    return "no tentpole cell model for {} (expected one of {})".format(cell_type, TENTPOLE_CELL_TYPES)
+  if opt_target not in NVSIM_OPT_TARGETS:
+    return "unknown NVSim optimization target {} (expected one of {})".format(opt_target, NVSIM_OPT_TARGETS)
+  if not isinstance(capacity, (int, float)) or isinstance(capacity, bool) or int(capacity) < 1:
+    # NVSim takes whole MB, so anything below 1 would be written to the mem cfg as 0
+    return "capacity {} is not a whole number of MB >= 1".format(capacity)
+  if not isinstance(bits_per_cell, int) or isinstance(bits_per_cell, bool) or bits_per_cell < 1:
+    return "bits_per_cell {} is not a positive integer".format(bits_per_cell)
+  return None
+
+
+class SweepPlan:
+  def __init__(self,
+                points=[], #valid (cell_type, opt_target, capacity, bits_per_cell) study points, in sweep order
+                effective={}, #study point -> the point NVSim actually simulates for it
+                dropped=[], #(study point, reason) for each invalid combination
+                cells_per_point={} #cell_type -> NVSim jobs per study point
+                ):
+    self.points = list(points)
+    self.effective = dict(effective)
+    self.dropped = list(dropped)
+    self.cells_per_point = dict(cells_per_point)
+
+  def cell_types(self):
+    """ Returns the cell types with at least one valid study point, in sweep order """
+    return list(dict.fromkeys(point[0] for point in self.points))
+
+  def num_jobs(self):
+    """ Returns the number of NVSim jobs the valid study points request """
+    return sum(self.cells_per_point[point[0]] for point in self.points)
+
+  def num_effective_jobs(self):
+    """ Returns the number of NVSim jobs left once every study point is normalized to its effective configuration """
+    return sum(self.cells_per_point[point[0]] for point in set(self.effective.values()))
+
+  def print_summary(self):
+    for point, reason in self.dropped:
+      print("Dropped study point {0}_{2}MB_{1}_{3}BPC: {4}".format(*point, reason))
+    print("Sweep plan: {} study points ({} invalid dropped); {} NVSim jobs requested, {} after normalizing to effective configurations".format(
+          len(self.points), len(self.dropped), self.num_jobs(), self.num_effective_jobs()))
+
+
+def plan_sweep(cell_types, opt_targets, capacities, bits_per_cells, cells_per_point, cell_tentpoles=True, multi_target=False):
+  """ Expands a study's cell_type x opt_target x capacity x bits_per_cell sweep, dropping combinations
+  NVSim cannot simulate and mapping each remaining point to the configuration NVSim actually sees
+  (e.g., SRAM at 2 bits per cell is SRAM at 1). Points sharing an effective configuration still get
+  their own results; identical NVSim jobs are run once by :class:`NVSimPool`.
+
+  :param cell_types: NVM technologies to sweep
+  :type cell_types: list of Strings
+  :param opt_targets: NVSim optimization targets to sweep
+  :type opt_targets: list of Strings
+  :param capacities: capacities in MB to sweep
+  :type capacities: list of ints
+  :param bits_per_cells: bits per cell to sweep
+  :type bits_per_cells: list of ints
+  :param cells_per_point: callable returning the number of NVSim jobs per study point for a cell_type
+  :param cell_tentpoles: whether the study is tentpole-style rather than custom cells
+  :type cell_tentpoles: bool
+  :param multi_target: whether every opt_target is picked from one full exploration run
+  :type multi_target: bool
+  :rtype: :class:`SweepPlan`
+  """
+  points = []
+  effective = {}
+  dropped = []
+  for cell_type, bits_per_cell, opt_target, capacity in itertools.product(cell_types, bits_per_cells, opt_targets, capacities):
+    point = (cell_type, opt_target, capacity, bits_per_cell)
+    if point in effective or any(point == p for (p, reason) in dropped):
+      continue # listed twice in the config
+    reason = invalid_reason(cell_type, opt_target, capacity, bits_per_cell, cell_tentpoles)
+    if reason is not None:
+      dropped.append((point, reason))
+      continue
+    points.append(point)
+    effective[point] = (cell_type, "Full" if multi_target else opt_target, capacity, effective_bits_per_cell(cell_type, bits_per_cell, cell_tentpoles))
+  return SweepPlan(points=points, effective=effective, dropped=dropped,
+                   cells_per_point={cell_type: cells_per_point(cell_type) for cell_type in dict.fromkeys(point[0] for point in points)})
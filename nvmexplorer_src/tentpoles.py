@@ -1,12 +1,46 @@
-import math
+import os
+import numpy as np
 import pandas as pd
 import nvmexplorer_src.input_defs
 
 
+# survey columns each technology's tentpoles are derived from
+TENTPOLE_COLUMNS = {"STT": ['Capacity [Mb]', 'Cell Area [F2]', 'Read Voltage [V]', 'Read Power [mW]', 'Write Speed [ns]', 'Write Energy [pJ]'],
+                    "PCM": ['Capacity [Mb]', 'Cell Area [F2]', 'Read Voltage [V]', 'RESET Speed [ns]', 'SET Speed [ns]', 'RESET current [uA]', 'SET Current [uA]'],
+                    "RRAM": ['Capacity [Mb]', 'Cell Area [F2]', 'Read Voltage [V]', 'RESET Speed [ns]', 'SET Speed [ns]'],
+                    "FeFET": ['Capacity [Mb]', 'Cell Area [F2]', 'Write Speed [ns]', 'Write Energy [pJ]'],
+                    "CTT": ['Capacity [Mb]', 'Cell Area [F2]']}
+
+tentpole_cache = {} # (cell_type, bits_per_cell, cell_dir) -> (data_df, form_tentpoles result), so each cell file is written once per study
+
+
+def survey_number(value):
+  """ Returns a surveyed value as an int when it is integral, so cell files print it as the spreadsheet did (e.g., 20 rather than 20.0)
+  """
+  value = float(value)
+  if value.is_integer():
+    return int(value)
+  return value
+
+
+def tentpole_indices(data_df):
+  """ Returns the index labels of the surveyed cells with the lowest and highest F^2 per Mb. Rows missing
+  either value are skipped and ties go to the first row; if no row has both, the first label is 0.
+  """
+  F2_per_Mb = data_df['Cell Area [F2]'].astype(float) / data_df['Capacity [Mb]'].astype(float)
+  valid = F2_per_Mb.notna().to_numpy()
+  if not valid.any():
+    return 0, 0
+  values = F2_per_Mb.to_numpy()[valid]
+  labels = data_df.index[valid]
+  return labels[np.argmin(values)], labels[np.argmax(values)]
+
+
 ## Find technology tentpoles based on lowest/highest Mb per F^2
-def form_tentpoles(data_df, cell_type, bits_per_cell):
+def form_tentpoles(data_df, cell_type, bits_per_cell, cell_dir="data/cell_cfgs"):
   """ Generates best-case and worst-case NVSim cell files for a specified cell type and multi-level 
-  cell configuration
+  cell configuration. Results are memoized per (cell_type, bits_per_cell) for the same data_df, so
+  the cell files are only written the first time.
 
   :param data_df: pandas dataframe object containing NVM spreadsheet data
   :type access_pattern: pandas dataframe
@@ -14,60 +48,56 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
   :type cell_type: String
   :param bits_per_cell: number of bits per cell for a potential multi-level cell configuration
   :type bits_per_cell: String
+  :param cell_dir: directory the cell files are written to
+  :type cell_dir: String
   :return: list of paths to NVSim cell files and :class:`NVSimInputConfig` objects containing NVSim input cfgs 
   for best-case and worst-case scenarios
   :rtype: list of Strings and :class:`NVSimInputConfig` objects
   """
-  best_F2_per_Mb = 0.0
+  if (cell_type, bits_per_cell, cell_dir) in tentpole_cache:
+    cached_df, tentpoles = tentpole_cache[(cell_type, bits_per_cell, cell_dir)]
+    if cached_df is data_df and os.path.exists(tentpoles[0]) and os.path.exists(tentpoles[1]):
+      return tentpoles
+  tentpoles = generate_tentpoles(data_df, cell_type, bits_per_cell, cell_dir)
+  tentpole_cache[(cell_type, bits_per_cell, cell_dir)] = (data_df, tentpoles)
+  return tentpoles
+
+
+def generate_tentpoles(data_df, cell_type, bits_per_cell, cell_dir="data/cell_cfgs"):
   best_F2_per_Mb_idx = 0
-  worst_F2_per_Mb = 0.0
   worst_F2_per_Mb_idx = 0
-  first = 1
  
   if (cell_type != 'SRAM'): 
-      for index, row in data_df.iterrows():
-          if not math.isnan(row['Cell Area [F2]']) and not math.isnan(row['Capacity [Mb]']):
-              curr_F2_per_Mb = (row['Cell Area [F2]']/row['Capacity [Mb]'])
-              if first == 1:
-                  best_F2_per_Mb = curr_F2_per_Mb
-                  best_F2_per_Mb_idx = index 
-                  worst_F2_per_Mb = curr_F2_per_Mb
-                  worst_F2_per_Mb_idx = index 
-                  first = 0
-              elif curr_F2_per_Mb < best_F2_per_Mb:
-                  best_F2_per_Mb = curr_F2_per_Mb
-                  best_F2_per_Mb_idx = index 
-              elif curr_F2_per_Mb > worst_F2_per_Mb:
-                  worst_F2_per_Mb = curr_F2_per_Mb
-                  worst_F2_per_Mb_idx = index 
+      best_F2_per_Mb_idx, worst_F2_per_Mb_idx = tentpole_indices(data_df)
   
   ## Form cell cfgs and mem cfgs for best-case and worst-case default technologies
-  best_case_cell_path = "data/cell_cfgs/{}_best_case.cell".format(cell_type)
-  worst_case_cell_path = "data/cell_cfgs/{}_worst_case.cell".format(cell_type)
+  # cell files are keyed by bits per cell so MLC variants can be simulated side by side
+  best_case_cell_path = "{}/{}_{}BPC_best_case.cell".format(cell_dir, cell_type, bits_per_cell)
+  worst_case_cell_path = "{}/{}_{}BPC_worst_case.cell".format(cell_dir, cell_type, bits_per_cell)
   
   if (cell_type == 'STT'):
       # STTRAM absolute best-case cell config
       best_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.STTRAMCellConfig(
           cell_file_path=best_case_cell_path,
           cell_area_F2=data_df.at[best_F2_per_Mb_idx, 'Cell Area [F2]'],
-          read_voltage=data_df['Read Voltage [V]'].min(skipna=True),
-          read_power=data_df['Read Power [mW]'].min(skipna=True),
-          reset_pulse=data_df['Write Speed [ns]'].min(skipna=True),
-          reset_energy=data_df['Write Energy [pJ]'].min(skipna=True),
-          set_pulse=data_df['Write Speed [ns]'].min(skipna=True),
-          set_energy=data_df['Write Energy [pJ]'].min(skipna=True),
+          read_voltage=survey_number(data_df['Read Voltage [V]'].min(skipna=True)),
+          read_power=survey_number(data_df['Read Power [mW]'].min(skipna=True)),
+          reset_pulse=survey_number(data_df['Write Speed [ns]'].min(skipna=True)),
+          reset_energy=survey_number(data_df['Write Energy [pJ]'].min(skipna=True)),
+          set_pulse=survey_number(data_df['Write Speed [ns]'].min(skipna=True)),
+          set_energy=survey_number(data_df['Write Energy [pJ]'].min(skipna=True)),
          )
       
       # STTRAM absolute worst-case cell config
       worst_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.STTRAMCellConfig(
           cell_file_path=worst_case_cell_path,
           cell_area_F2=data_df.at[worst_F2_per_Mb_idx, 'Cell Area [F2]'],
-          read_voltage=data_df['Read Voltage [V]'].max(skipna=True),
-          read_power=data_df['Read Power [mW]'].max(skipna=True),
-          reset_pulse=data_df['Write Speed [ns]'].max(skipna=True),
-          reset_energy=data_df['Write Energy [pJ]'].max(skipna=True),
-          set_pulse=data_df['Write Speed [ns]'].max(skipna=True),
-          set_energy=data_df['Write Energy [pJ]'].max(skipna=True),
+          read_voltage=survey_number(data_df['Read Voltage [V]'].max(skipna=True)),
+          read_power=survey_number(data_df['Read Power [mW]'].max(skipna=True)),
+          reset_pulse=survey_number(data_df['Write Speed [ns]'].max(skipna=True)),
+          reset_energy=survey_number(data_df['Write Energy [pJ]'].max(skipna=True)),
+          set_pulse=survey_number(data_df['Write Speed [ns]'].max(skipna=True)),
+          set_energy=survey_number(data_df['Write Energy [pJ]'].max(skipna=True)),
          )
       
       best_case_cell_cfg.generate_cell_file()
@@ -80,22 +110,22 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
       best_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.PCMCellConfig(
           cell_file_path=best_case_cell_path,
           cell_area_F2=data_df.at[best_F2_per_Mb_idx, 'Cell Area [F2]'],
-          read_voltage=data_df['Read Voltage [V]'].min(skipna=True),
-          reset_pulse=data_df['RESET Speed [ns]'].min(skipna=True),
-          set_pulse=data_df['SET Speed [ns]'].min(skipna=True),
-          reset_current=data_df['RESET current [uA]'].min(skipna=True),
-          set_current=data_df['SET Current [uA]'].min(skipna=True),
+          read_voltage=survey_number(data_df['Read Voltage [V]'].min(skipna=True)),
+          reset_pulse=survey_number(data_df['RESET Speed [ns]'].min(skipna=True)),
+          set_pulse=survey_number(data_df['SET Speed [ns]'].min(skipna=True)),
+          reset_current=survey_number(data_df['RESET current [uA]'].min(skipna=True)),
+          set_current=survey_number(data_df['SET Current [uA]'].min(skipna=True)),
          )
       
       # STTRAM absolute worst-case cell config
       worst_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.PCMCellConfig(
           cell_file_path=worst_case_cell_path,
           cell_area_F2=data_df.at[worst_F2_per_Mb_idx, 'Cell Area [F2]'],
-          read_voltage=data_df['Read Voltage [V]'].max(skipna=True),
-          reset_pulse=data_df['RESET Speed [ns]'].max(skipna=True),
-          set_pulse=data_df['SET Speed [ns]'].max(skipna=True),
-          reset_current=data_df['RESET current [uA]'].max(skipna=True),
-          set_current=data_df['SET Current [uA]'].max(skipna=True),
+          read_voltage=survey_number(data_df['Read Voltage [V]'].max(skipna=True)),
+          reset_pulse=survey_number(data_df['RESET Speed [ns]'].max(skipna=True)),
+          set_pulse=survey_number(data_df['SET Speed [ns]'].max(skipna=True)),
+          reset_current=survey_number(data_df['RESET current [uA]'].max(skipna=True)),
+          set_current=survey_number(data_df['SET Current [uA]'].max(skipna=True)),
          )
       
       best_case_cell_cfg.generate_cell_file()
@@ -112,9 +142,9 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
       best_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.RRAMCellConfig(
           cell_file_path=best_case_cell_path,
           cell_area_F2=data_df.at[best_F2_per_Mb_idx, 'Cell Area [F2]'],
-          read_voltage=data_df['Read Voltage [V]'].min(skipna=True),
-          reset_pulse=data_df['RESET Speed [ns]'].min(skipna=True),
-          set_pulse=data_df['SET Speed [ns]'].min(skipna=True),
+          read_voltage=survey_number(data_df['Read Voltage [V]'].min(skipna=True)),
+          reset_pulse=survey_number(data_df['RESET Speed [ns]'].min(skipna=True)),
+          set_pulse=survey_number(data_df['SET Speed [ns]'].min(skipna=True)),
           mlc=bits_per_cell,
          )
       
@@ -122,9 +152,9 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
       worst_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.RRAMCellConfig(
           cell_file_path=worst_case_cell_path,
           cell_area_F2=data_df.at[worst_F2_per_Mb_idx, 'Cell Area [F2]'],
-          read_voltage=data_df['Read Voltage [V]'].max(skipna=True),
-          reset_pulse=data_df['RESET Speed [ns]'].max(skipna=True),
-          set_pulse=data_df['SET Speed [ns]'].max(skipna=True),
+          read_voltage=survey_number(data_df['Read Voltage [V]'].max(skipna=True)),
+          reset_pulse=survey_number(data_df['RESET Speed [ns]'].max(skipna=True)),
+          set_pulse=survey_number(data_df['SET Speed [ns]'].max(skipna=True)),
           mlc=bits_per_cell,
          )
       
@@ -138,10 +168,10 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
       best_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.FeFETCellConfig(
           cell_file_path=best_case_cell_path,
           cell_area_F2=data_df.at[best_F2_per_Mb_idx, 'Cell Area [F2]'], 
-          set_pulse=data_df['Write Speed [ns]'].min(skipna=True),
-          reset_pulse=data_df['Write Speed [ns]'].min(skipna=True),
-          set_energy=data_df['Write Energy [pJ]'].min(skipna=True),
-          reset_energy=data_df['Write Energy [pJ]'].min(skipna=True),
+          set_pulse=survey_number(data_df['Write Speed [ns]'].min(skipna=True)),
+          reset_pulse=survey_number(data_df['Write Speed [ns]'].min(skipna=True)),
+          set_energy=survey_number(data_df['Write Energy [pJ]'].min(skipna=True)),
+          reset_energy=survey_number(data_df['Write Energy [pJ]'].min(skipna=True)),
           mlc=bits_per_cell,
          )
       
@@ -149,10 +179,10 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
       worst_case_cell_cfg = nvmexplorer_src.input_defs.cell_cfgs.FeFETCellConfig(
           cell_file_path=worst_case_cell_path,
           cell_area_F2=data_df.at[worst_F2_per_Mb_idx, 'Cell Area [F2]'],
-          set_pulse=data_df['Write Speed [ns]'].min(skipna=True),
-          reset_pulse=data_df['Write Speed [ns]'].min(skipna=True),
-          set_energy=data_df['Write Energy [pJ]'].min(skipna=True),
-          reset_energy=data_df['Write Energy [pJ]'].min(skipna=True),
+          set_pulse=survey_number(data_df['Write Speed [ns]'].min(skipna=True)),
+          reset_pulse=survey_number(data_df['Write Speed [ns]'].min(skipna=True)),
+          set_energy=survey_number(data_df['Write Energy [pJ]'].min(skipna=True)),
+          reset_energy=survey_number(data_df['Write Energy [pJ]'].min(skipna=True)),
           mlc=bits_per_cell,
          )
       
@@ -184,17 +214,18 @@ def form_tentpoles(data_df, cell_type, bits_per_cell):
 
 
 ## Generate cell configuration from user input
-def gen_custom_cell(cell_type, custom_cell_inputs):
+def gen_custom_cell(cell_type, custom_cell_inputs, cell_dir="data/cell_cfgs"):
   """ Generates NVSim cell files for a specified cell type and input characteristics
 
   :param cell_type: String specifying which NVM technology to use
   :type cell_type: String
   :param custom_cell_inputs: dictionary object specifying possible input params to cell def
+  :param cell_dir: directory the cell file is written to
   :return: path to NVSim cell file and :class:`NVSimInputConfig` object containing NVSim input cfgs 
   """
   
   ## Form cell cfgs and mem cfgs for best-case and worst-case default technologies
-  cell_path = "data/cell_cfgs/{}_{}.cell".format(cell_type, custom_cell_inputs["name"])
+  cell_path = "{}/{}_{}.cell".format(cell_dir, cell_type, custom_cell_inputs["name"])
  
   # depending on cell type, initialize default cell, then over-write params as provided, then generate cell file
  
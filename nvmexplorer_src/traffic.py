@@ -4,6 +4,43 @@ from data.workload_data.dnn_inputs import *
 from nvmexplorer_src.eval_utils import *
 
 
+# traffic types, in the order a study point reports them
+TRAFFIC_TYPES = ["generic", "graph", "dnn", "spec", "generic_write_buff", "adaptive_generic"]
+
+
+def report_benchmark_traffic(points, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths):
+  """  Evaluates a list of named benchmark traffic points for every cell in a single batch and writes the results
+
+  :param points: (benchmark name, reads/s, writes/s) tuples; points with reads/s of None are skipped
+  :type points: list of tuples
+  :param access_pattern: :class:`AccessPattern` object
+  :type access_pattern: :class:`AccessPattern`
+  :param nvsim_input_cfgs: :class:`NVSimInputConfig` objects which were used for array simulation
+  :param nvsim_outputs: paths to NVSim output files
+  :param results_csv: path to CSV file containing results
+  :type results_csv: String
+  :param cell_paths: paths to NVSim input cell files
+  :param cfg_paths: paths to NVSim input config files
+  """
+  evaluated_points = [point for point in points if point[1] is not None]
+  batch_result = BatchExperimentResult(access_pattern, nvsim_input_cfgs, nvsim_outputs,
+                                       read_freq=[rd for (name, rd, wr) in evaluated_points],
+                                       write_freq=[wr for (name, rd, wr) in evaluated_points])
+  batch_result.evaluate()
+
+  p = 0
+  for (name, rd, wr) in points:
+      access_pattern.benchmark_name = name
+      if rd is not None:
+        access_pattern.name = name
+        access_pattern.write_freq = wr
+        access_pattern.read_freq = rd
+        for i in range(len(cell_paths)):
+            # These print to csv
+            batch_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern, i, p)
+        p += 1
+
+
 def generic_traffic(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths):
   """  Evaluates and writes results for scenarios from apre-set, generic traffic sweep
 
@@ -19,15 +56,123 @@ def generic_traffic(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv
   # this is a helper function to use existing, arbitrary range of traffic pattern inputs
   write_accesses = [0, 1, 2, 1e1, 2e1, 1e2, 2e2, 1e3, 2e3, 1e4, 2e4, 1e5, 2e5, 1e6, 2e6, 1e7]
   read_accesses = [0, 1, 2, 1e1, 2e1, 1e2, 2e2, 1e3, 2e3, 1e4, 2e4, 1e5, 2e5, 1e6, 2e6, 1e7, 2e7, 1e8, 2e8, 1e9, 2e9, 1e10]
-  for wr in write_accesses:
-    for rd in read_accesses:
+  points = [(wr, rd) for wr in write_accesses for rd in read_accesses]
+  batch_result = BatchExperimentResult(access_pattern, nvsim_input_cfgs, nvsim_outputs,
+                                       read_freq=[rd for (wr, rd) in points],
+                                       write_freq=[wr for (wr, rd) in points])
+  batch_result.evaluate()
+  for (p, (wr, rd)) in enumerate(points):
       access_pattern.write_freq = wr
       access_pattern.read_freq = rd
       for i in range(len(cell_paths)):
-          this_result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-          this_result.evaluate()
           # These print to csv
-          this_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern)
+          batch_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern, i, p)
+
+
+def adaptive_traffic_points(access_pattern, nvsim_input_cfgs, nvsim_outputs, metric="total_power", criterion="best",
+                            read_range=(1., 1e10), write_range=(1., 1e7), resolution=0.125):
+  """  Picks (reads/s, writes/s) traffic points that resolve where the designs' ordering changes. Starts from
+  a grid with one point per decade, then recursively splits only the grid cells whose corners disagree on
+  the best design (or the full ranking), until cells are resolution decades wide. Boundaries that enter
+  and leave a coarse cell through the same edge are not detected. Designs whose NVSim run failed or
+  found no design (see :func:`output_failure`) are left out, so they cannot create boundaries.
+
+  :param access_pattern: :class:`AccessPattern` object
+  :type access_pattern: :class:`AccessPattern`
+  :param nvsim_input_cfgs: :class:`NVSimInputConfig` objects which were used for array simulation
+  :param nvsim_outputs: parsed NVSim results, one per input cfg
+  :param metric: :class:`BatchExperimentResult` attribute to rank designs by (e.g., "total_power", "total_read_latency")
+  :type metric: String
+  :param criterion: "best" refines where the lowest-metric design changes; "ranking" refines where any two designs swap
+  :type criterion: String
+  :param read_range: (min, max) reads per second; both must be positive since points are log-spaced
+  :param write_range: (min, max) writes per second; both must be positive since points are log-spaced
+  :param resolution: finest grid spacing in decades
+  :type resolution: float
+  :return: (reads/s, writes/s) points, ordered like :func:`generic_traffic` (writes outer, reads inner)
+  :rtype: list of tuples
+  """
+  if criterion not in ["best", "ranking"]:
+    raise ValueError("Unknown adaptive traffic criterion {}; expected best or ranking".format(criterion))
+  usable = [i for i in range(len(nvsim_outputs)) if nvmexplorer_src.input_defs.nvsim_interface.output_failure(nvsim_outputs[i]) is None]
+  if len(usable) < len(nvsim_outputs):
+    print("Adaptive traffic: leaving out {} of {} designs without NVSim results".format(len(nvsim_outputs) - len(usable), len(nvsim_outputs)))
+  nvsim_input_cfgs = [nvsim_input_cfgs[i] for i in usable]
+  nvsim_outputs = [nvsim_outputs[i] for i in usable]
+  log_min = np.log10([read_range[0], write_range[0]])
+  log_max = np.log10([read_range[1], write_range[1]])
+  # integer grid coordinates at the finest resolution; coarse cells span one decade
+  steps_per_decade = 2 ** max(0, int(np.ceil(np.log2(1. / resolution))))
+  num_steps = np.ceil((log_max - log_min) * steps_per_decade - 1e-9).astype(int)
+
+  def frequency(axis, step):
+    return float("{:.12g}".format(10 ** min(log_min[axis] + step / steps_per_decade, log_max[axis])))
+
+  signatures = {}
+  def evaluate(coords):
+    new_coords = sorted(set(coords) - set(signatures))
+    if not new_coords:
+      return
+    if not nvsim_outputs:
+      # nothing to rank, so no boundaries to refine
+      signatures.update((coord, 0) for coord in new_coords)
+      return
+    batch_result = BatchExperimentResult(access_pattern, nvsim_input_cfgs, nvsim_outputs,
+                                         read_freq=[frequency(0, a) for (a, b) in new_coords],
+                                         write_freq=[frequency(1, b) for (a, b) in new_coords])
+    batch_result.evaluate()
+    values = np.where(np.isnan(getattr(batch_result, metric)), np.inf, getattr(batch_result, metric))
+    for k, coord in enumerate(new_coords):
+      if criterion == "best":
+        signatures[coord] = int(np.argmin(values[:, k]))
+      else:
+        signatures[coord] = tuple(np.argsort(values[:, k], kind="stable"))
+
+  def coarse_steps(axis):
+    return list(range(0, num_steps[axis], steps_per_decade)) + [num_steps[axis]]
+
+  read_steps = coarse_steps(0)
+  write_steps = coarse_steps(1)
+  cells = [(read_steps[i], read_steps[i+1], write_steps[j], write_steps[j+1]) for i in range(len(read_steps) - 1) for j in range(len(write_steps) - 1)]
+  if len(read_steps) == 1 or len(write_steps) == 1:
+    evaluate([(a, b) for a in read_steps for b in write_steps])
+  while cells:
+    evaluate([corner for (a0, a1, b0, b1) in cells for corner in [(a0, b0), (a1, b0), (a0, b1), (a1, b1)]])
+    next_cells = []
+    for (a0, a1, b0, b1) in cells:
+      if len(set(signatures[corner] for corner in [(a0, b0), (a1, b0), (a0, b1), (a1, b1)])) == 1:
+        continue
+      read_splits = [a0, (a0 + a1) // 2, a1] if a1 - a0 > 1 else [a0, a1]
+      write_splits = [b0, (b0 + b1) // 2, b1] if b1 - b0 > 1 else [b0, b1]
+      if len(read_splits) == 2 and len(write_splits) == 2:
+        continue
+      for i in range(len(read_splits) - 1):
+        for j in range(len(write_splits) - 1):
+          next_cells.append((read_splits[i], read_splits[i+1], write_splits[j], write_splits[j+1]))
+    cells = next_cells
+
+  return [(frequency(0, a), frequency(1, b)) for (b, a) in sorted((b, a) for (a, b) in signatures)]
+
+
+def adaptive_generic_traffic(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths, points=None, **kwargs):
+  """  Evaluates and writes results for an adaptively refined generic traffic sweep
+
+  :param access_pattern: :class:`AccessPattern` object
+  :type access_pattern: :class:`AccessPattern`
+  :param nvsim_input_cfgs: :class:`NVSimInputConfig` objects which were used for array simulation
+  :param nvsim_outputs: paths to NVSim output files
+  :param results_csv: path to CSV file containing results
+  :type results_csv: String
+  :param cell_paths: paths to NVSim input cell files
+  :param cfg_paths: paths to NVSim input config files
+  :param points: (reads/s, writes/s) points from :func:`adaptive_traffic_points`, e.g., refined across every
+    technology in the study; if None, they are refined over these cells using kwargs
+  :type points: list of tuples
+  """
+  if points is None:
+    points = adaptive_traffic_points(access_pattern, nvsim_input_cfgs, nvsim_outputs, **kwargs)
+  report_benchmark_traffic([(access_pattern.benchmark_name, rd, wr) for (rd, wr) in points],
+                           access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
 
 
 def graph_traffic(graph8MB, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths):
@@ -43,17 +188,13 @@ def graph_traffic(graph8MB, access_pattern, nvsim_input_cfgs, nvsim_outputs, res
   :param cfg_paths: paths to NVSim input config files
   """
   # this is a helper function to use existing graph workload template inputs
+  points = []
   for (i, name) in enumerate(graph8MB["names"]):
-      access_pattern.benchmark_name = name
       if (graph8MB["read_freq"][i] > 0):
-        access_pattern.name = name
-        access_pattern.write_freq = graph8MB["write_freq"][i] 
-        access_pattern.read_freq = graph8MB["read_freq"][i]
-        for i in range(len(cell_paths)):
-            this_result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-            this_result.evaluate()
-            # These print to csv
-            this_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern)
+        points.append((name, graph8MB["read_freq"][i], graph8MB["write_freq"][i]))
+      else:
+        points.append((name, None, None))
+  report_benchmark_traffic(points, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
   
 
 def dnn_traffic(DNN_weights, DNN_weights_acts, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths):
@@ -70,18 +211,14 @@ def dnn_traffic(DNN_weights, DNN_weights_acts, access_pattern, nvsim_input_cfgs,
   """
   # this is a helper function to use existing dnn workload template inputs
   dnns = [ DNN_weights, DNN_weights_acts ]
+  points = []
   for dnn in dnns:
     for (i, name) in enumerate(dnn["names"]):
-      access_pattern.benchmark_name = name
       if (dnn["reads"][i] > 0):
-        access_pattern.name = name
-        access_pattern.read_freq = dnn["reads"][i] * dnn["ips"][i]
-        access_pattern.write_freq = dnn["writes"][i] * dnn["ips"][i]
-        for i in range(len(cell_paths)):
-            this_result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-            this_result.evaluate()
-            # These print to csv
-            this_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern)
+        points.append((name, dnn["reads"][i] * dnn["ips"][i], dnn["writes"][i] * dnn["ips"][i]))
+      else:
+        points.append((name, None, None))
+  report_benchmark_traffic(points, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
 
 
 def spec_traffic(spec8MBLLC, spec16MBLLC, spec16MBDRAM, spec16MBL2, spec32MBLLC, spec64MBLLC, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths):
@@ -97,18 +234,14 @@ def spec_traffic(spec8MBLLC, spec16MBLLC, spec16MBDRAM, spec16MBL2, spec32MBLLC,
   :param cfg_paths: paths to NVSim input config files
   """
   # this is a helper function to use existing SPEC2017 benchmark template inputs
+  points = []
   for benchmark in [spec8MBLLC, spec16MBLLC, spec16MBDRAM, spec16MBL2, spec32MBLLC, spec64MBLLC]:
     for (i, name) in enumerate(benchmark["names"]):  
-      access_pattern.benchmark_name = name
       if (benchmark["reads"][i] > 0):
-        access_pattern.name = name
-        access_pattern.write_freq = benchmark["writes"][i] / benchmark["ex_time"][i]
-        access_pattern.read_freq = benchmark["reads"][i] / benchmark["ex_time"][i]
-        for i in range(len(cell_paths)):
-            this_result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-            this_result.evaluate()
-            # These print to csv
-            this_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern)
+        points.append((name, benchmark["reads"][i] / benchmark["ex_time"][i], benchmark["writes"][i] / benchmark["ex_time"][i]))
+      else:
+        points.append((name, None, None))
+  report_benchmark_traffic(points, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
 
 def generic_traffic_with_write_buff(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths):
   """  Evaluates and writes results for pre-defined case study scenarios from a generic application traffic sweep with write buffering that is evaluated
@@ -130,29 +263,63 @@ def generic_traffic_with_write_buff(access_pattern, nvsim_input_cfgs, nvsim_outp
   percent_write_traffic_reduction = [0.001, 0.01, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99, 0.999, 1.0]
   percent_write_latency_mask = [0.001, 0.01, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99, 0.999, 1.0]
 
+  # each (traffic, mask) pair contributes a spec geomean point followed by a graph example point
+  points = []
   for pct_traffic in percent_write_traffic_reduction:
     for pct_mask in percent_write_latency_mask:
-      for i in range(len(cell_paths)):
-        #create temp write latency, scale just for eval, reset
-        temp_write_latency = nvsim_outputs[i].write_latency
-        #set updated write latency
-        nvsim_outputs[i].write_latency = temp_write_latency * pct_mask
-        #repeat for spec geomean, graph example      
-        access_pattern.write_freq = wr_base_spec * pct_traffic
-        access_pattern.read_freq = rd_base_spec
-        access_pattern.benchmark_name = "spec_"+str(pct_traffic)+"_"+str(pct_mask)
-        this_result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-        this_result.evaluate()
-        # These print to csv
-        this_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern)
-        #graph example start
-        access_pattern.write_freq = wr_base_graph * pct_traffic
-        access_pattern.read_freq = rd_base_graph
-        access_pattern.benchmark_name = "fbbfs_"+str(pct_traffic)+"_"+str(pct_mask)
-        this_result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-        this_result.evaluate()
+      points.append(("spec_"+str(pct_traffic)+"_"+str(pct_mask), rd_base_spec, wr_base_spec * pct_traffic, pct_mask))
+      points.append(("fbbfs_"+str(pct_traffic)+"_"+str(pct_mask), rd_base_graph, wr_base_graph * pct_traffic, pct_mask))
+
+  batch_result = BatchExperimentResult(access_pattern, nvsim_input_cfgs, nvsim_outputs,
+                                       read_freq=[rd for (name, rd, wr, mask) in points],
+                                       write_freq=[wr for (name, rd, wr, mask) in points],
+                                       write_latency_scale=[mask for (name, rd, wr, mask) in points])
+  batch_result.evaluate()
+
+  for p in range(0, len(points), 2):
+    for i in range(len(cell_paths)):
+      for (name, rd, wr, mask), point_index in [(points[p], p), (points[p+1], p+1)]:
+        access_pattern.write_freq = wr
+        access_pattern.read_freq = rd
+        access_pattern.benchmark_name = name
         # These print to csv
-        this_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern)
-        #reset write latency
-        nvsim_outputs[i].write_latency = temp_write_latency
+        batch_result.report_result_benchmark(1, results_csv, cell_paths[i], cfg_paths[i], access_pattern, i, point_index)
+
 
+def run_traffic(traffic_type, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths, adaptive_points=None, adaptive_traffic={}):
+  """  Runs one of the :data:`TRAFFIC_TYPES` sweeps and writes its results
+
+  :param traffic_type: which sweep to run (e.g., "generic", "dnn")
+  :type traffic_type: String
+  :param access_pattern: :class:`AccessPattern` object
+  :type access_pattern: :class:`AccessPattern`
+  :param nvsim_input_cfgs: :class:`NVSimInputConfig` objects which were used for array simulation
+  :param nvsim_outputs: paths to NVSim output files
+  :param results_csv: path to CSV file containing results
+  :type results_csv: String
+  :param cell_paths: paths to NVSim input cell files
+  :param cfg_paths: paths to NVSim input config files
+  :param adaptive_points: (reads/s, writes/s) points for "adaptive_generic" traffic
+  :param adaptive_traffic: options for :func:`adaptive_traffic_points` used when adaptive_points is None
+  """
+  if traffic_type == "generic":
+      # GENERIC traffic sweep; report all outputs
+      generic_traffic(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  elif traffic_type == "graph":
+      # Graph traffic sweep
+      graph_traffic(graph8MB, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  elif traffic_type == "dnn":
+      # DNN traffic sweep
+      dnn_traffic(DNN_weights, DNN_weights_acts, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  elif traffic_type == "spec":
+      # SPEC2017 traffic
+      spec_traffic(spec8MBLLC, spec16MBLLC, spec16MBDRAM, spec16MBL2, spec32MBLLC, spec64MBLLC, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  elif traffic_type == "generic_write_buff":
+      #next, run generic traffic with write buffer proxy
+      generic_traffic_with_write_buff(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  elif traffic_type == "adaptive_generic":
+      # generic traffic refined only where the best design changes
+      adaptive_generic_traffic(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths,
+                               points=adaptive_points, **adaptive_traffic)
+  else:
+      raise ValueError("Unknown traffic type {}; expected one of {}".format(traffic_type, TRAFFIC_TYPES))
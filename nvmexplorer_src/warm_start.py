@@ -0,0 +1,172 @@
+import os
+import json
+import threading
+import numpy as np
+
+# organization NVSim reports for its chosen design -> mem cfg option forcing it in a later search. Banks
+# and mats are forced as total mats (subarrays) per row and column, and how many of them are active.
+FORCE_OPTIONS = {
+  "bank": "-ForceBank (Total AxB, Active CxD): {}x{}, {}x{}\n",
+  "mat": "-ForceMat (Total AxB, Active CxD): {}x{}, {}x{}\n",
+  "senseamp_mux": "-ForceMuxSenseAmp: {}\n",
+  "output_mux1": "-ForceMuxOutputLev1: {}\n",
+  "output_mux2": "-ForceMuxOutputLev2: {}\n",
+}
+# metrics a warm-started result is checked against the result it was warm-started from on
+WARM_START_METRICS = ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area"]
+
+
+def organization_family(input_cfg):
+  """ Returns what a design must share with another for that design's organization to be a sensible
+  starting point: everything in the mem cfg except the cell's parameters
+  """
+  return (input_cfg.cell_type.mem_cell_type, input_cfg.capacity, input_cfg.word_width,
+          input_cfg.opt_target, input_cfg.process_node, input_cfg.cell_type.mlc)
+
+
+def cell_parameters(input_cfg):
+  """ Returns every numeric parameter of a design's cell """
+  return dict((name, float(value)) for (name, value) in vars(input_cfg.cell_type).items()
+              if isinstance(value, (int, float)) and not isinstance(value, bool))
+
+
+def cell_distance(params, other_params):
+  """ Returns how far apart two cells are: the sum over their numeric parameters of |log(a / b)|, so
+  doubling set_pulse is a distance of 0.69; a parameter that changes sign or from or to zero counts 1.
+  None if the cells do not have the same parameters.
+  """
+  if set(params) != set(other_params):
+    return None
+  distance = 0.
+  for (name, value) in params.items():
+    other = other_params[name]
+    if value == other:
+      continue
+    if value > 0 and other > 0:
+      distance += abs(np.log(value / other))
+    else:
+      distance += 1.
+  return distance
+
+
+def force_options(organization, force):
+  """ Returns the mem cfg lines forcing the parts of an organization listed in force, e.g., ["bank", "mat"].
+  A bank or mat is only forced if both its size and its active mats or subarrays were reported.
+  """
+  lines = ""
+  for part in force:
+    if part not in organization:
+      continue
+    if isinstance(organization[part], list):
+      total, active = organization[part], organization.get(part + "_active", [])
+      if len(total) != 2 or len(active) != 2 or None in active:
+        continue # 3D banks are not forced
+      lines += FORCE_OPTIONS[part].format(*(total + active))
+    else:
+      lines += FORCE_OPTIONS[part].format(organization[part])
+  return lines
+
+
+class WarmStart:
+  def __init__(self,
+                force=["bank", "mat"], #parts of a neighbor's organization to force; NVSim still searches the rest (subarrays, muxes)
+                radius=1., #largest cell_distance at which a design is warm-started from another
+                tolerance=10., #fall back to a full search if a warm-started metric is off from its neighbor's by more than this factor
+                log_path="output/results/default-warm-start.jsonl" #where every warm-start decision is appended
+                ):
+    unknown = [part for part in force if part not in FORCE_OPTIONS]
+    if unknown:
+      raise ValueError("Cannot force organization parts {}; expected some of {}".format(unknown, list(FORCE_OPTIONS)))
+    self.force = list(force)
+    self.radius = radius
+    self.tolerance = tolerance
+    self.log_path = log_path
+    self.lock = threading.Lock()
+    log_dir = os.path.dirname(self.log_path)
+    if log_dir and not os.path.exists(log_dir):
+      os.makedirs(log_dir, exist_ok=True)
+    self.fp = open(self.log_path, "w")
+    self.counts = {"warm": 0, "fallback": 0}
+    # organization_family -> (cell parameters, parsed result) of every fully searched design with a known organization
+    self.designs = {}
+
+  def add(self, nvsim_output):
+    """ Records a fully searched design so nearby designs can be warm-started from its organization.
+    Warm-started results and results without an organization (e.g., picked from a full exploration
+    csv, or from an NVSim run that found none) are ignored.
+
+    :param nvsim_output: parsed NVSim result
+    :type nvsim_output: :class:`NVSimOutputConfig`
+    """
+    if getattr(nvsim_output, "warm_started", False) or not getattr(nvsim_output, "organization", None):
+      return
+    if min(getattr(nvsim_output, metric) for metric in WARM_START_METRICS) <= 0:
+      return
+    with self.lock:
+      self.designs.setdefault(organization_family(nvsim_output.input_cfg), []).append((cell_parameters(nvsim_output.input_cfg), nvsim_output))
+
+  def neighbor(self, input_cfg):
+    """ Returns the parsed result of the recorded design nearest to input_cfg within the radius, or None
+
+    :param input_cfg: mem cfg of the design to warm-start
+    :type input_cfg: :class:`NVSimInputConfig`
+    :rtype: :class:`NVSimOutputConfig`
+    """
+    params = cell_parameters(input_cfg)
+    with self.lock:
+      designs = list(self.designs.get(organization_family(input_cfg), []))
+    nearest, nearest_distance = None, None
+    for (other_params, nvsim_output) in designs:
+      distance = cell_distance(params, other_params)
+      if distance is not None and distance <= self.radius and (nearest_distance is None or distance < nearest_distance):
+        nearest, nearest_distance = nvsim_output, distance
+    return nearest
+
+  def write_cfg(self, run_cfg_path, neighbor):
+    """ Writes a copy of a mem cfg that forces the neighbor's organization next to it, leaving it alone
+    if it already has this content, and returns its path
+    """
+    with open(run_cfg_path) as f:
+      cfg_text = f.read()
+    cfg_text += force_options(neighbor.organization, self.force)
+    warm_cfg_path = os.path.splitext(run_cfg_path)[0] + "-warm.cfg"
+    if os.path.exists(warm_cfg_path):
+      with open(warm_cfg_path) as f:
+        if f.read() == cfg_text:
+          return warm_cfg_path
+    with open(warm_cfg_path, "w") as f:
+      f.write(cfg_text)
+    return warm_cfg_path
+
+  def check(self, nvsim_output, neighbor):
+    """ Returns why a warm-started result looks off, or None if it does not. A result is off if NVSim
+    found no design under the forced organization, or any metric is more than the tolerance factor
+    away from the neighbor's; a small change to one cell parameter should not move any metric that far.
+    """
+    for metric in WARM_START_METRICS:
+      value, expected = getattr(nvsim_output, metric), getattr(neighbor, metric)
+      if value <= 0:
+        return "no {} under the forced organization".format(metric)
+      if value > expected * self.tolerance or value < expected / self.tolerance:
+        return "{} is {:.3g}, the design it was warm-started from has {:.3g}".format(metric, value, expected)
+    return None
+
+  def log(self, job, neighbor, reason=None):
+    """ Records a warm-started job, and the reason it fell back to a full search if it did """
+    record = {"cfg_path": job.cfg_path, "cell_path": job.input_cfg.cell_type.cell_file_path,
+              "neighbor_cell_path": neighbor.input_cfg.cell_type.cell_file_path,
+              "forced": force_options(neighbor.organization, self.force).split("\n")[:-1],
+              "decision": "warm" if reason is None else "fallback", "reason": reason}
+    with self.lock:
+      self.counts[record["decision"]] += 1
+      self.fp.write(json.dumps(record, sort_keys=True) + "\n")
+      self.fp.flush()
+
+  def print_summary(self):
+    print("Warm start: {} NVSim searches warm-started from a nearby design's organization, {} fell back to a full search; decisions logged to {}".format(
+          self.counts["warm"], self.counts["fallback"], self.log_path))
+
+  def close(self):
+    if self.fp is not None:
+      self.fp.close()
+      self.fp = None
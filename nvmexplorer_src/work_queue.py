@@ -0,0 +1,288 @@
+import os
+import time
+import uuid
+import pickle
+import socket
+import sqlite3
+import threading
+import traceback
+from concurrent.futures import Future
+
+QUEUE_STATES = ["pending", "claimed", "done", "failed"]
+
+
+class QueueTask:
+  def __init__(self,
+                task_id="task", #unique id within the queue, e.g., "smoke/nvsim/output/nvsim_output/SRAM_1MB_ReadLatency_1BPC_64b-best_case_nvsim_output.pkl"
+                kind="nvsim", #selects the worker handler that runs the task
+                payload=None, #picklable task inputs passed to the handler
+                cwd=None, #directory the coordinator ran from; relative paths in the payload are relative to it
+                lease_id=None #identifies one claim of the task; results from an expired claim are ignored
+                ):
+    self.task_id = task_id
+    self.kind = kind
+    self.payload = payload
+    self.cwd = cwd
+    self.lease_id = lease_id
+
+
+class WorkQueue:
+  def __init__(self,
+                db_path="output/queue.db", #sqlite database on a filesystem every node can reach
+                lease_seconds=120., #how long a claim lasts without a heartbeat before the task is handed to another worker
+                max_attempts=3, #claims per task (including ones lost to dead workers) before it is marked failed
+                poll_interval=1. #seconds between checks for new tasks (workers) or finished tasks (coordinator)
+                ):
+    # The queue is a single sqlite file so it needs no broker, only a shared directory with working file locks.
+    # The default rollback journal is used rather than WAL, which needs shared memory and so does not work across nodes.
+    self.db_path = db_path
+    self.lease_seconds = lease_seconds
+    self.max_attempts = max_attempts
+    self.poll_interval = poll_interval
+    self.futures = {} # task_id -> Future for tasks this process submitted and is waiting on
+    self.lock = threading.Lock()
+    self.poller = None
+    self.stopped = threading.Event()
+    db_dir = os.path.dirname(self.db_path)
+    if db_dir and not os.path.exists(db_dir):
+      os.makedirs(db_dir, exist_ok=True)
+    conn = self.connect()
+    try:
+      conn.executescript("""
+CREATE TABLE IF NOT EXISTS tasks (
+  task_id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  payload BLOB,
+  cwd TEXT,
+  state TEXT NOT NULL,
+  worker TEXT,
+  lease_id TEXT,
+  lease_expires REAL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL,
+  submitted REAL,
+  finished REAL,
+  result BLOB,
+  error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, submitted);
+""")
+    finally:
+      conn.close()
+
+  def connect(self):
+    # autocommit mode; writers take the database lock up front with BEGIN IMMEDIATE
+    return sqlite3.connect(self.db_path, timeout=60., isolation_level=None)
+
+  def put(self, task_id, kind, payload, cwd=None):
+    """ Adds a task, or replaces an earlier task with the same id, in the pending state. A worker
+    still holding a claim on the replaced task cannot complete it.
+
+    :param task_id: unique task id
+    :type task_id: String
+    :param kind: worker handler to run it with, e.g., "nvsim" or "evaluate"
+    :type kind: String
+    :param payload: picklable task inputs
+    :param cwd: directory relative paths in the payload are relative to; defaults to the current directory
+    :type cwd: String
+    """
+    if cwd is None:
+      cwd = os.getcwd()
+    conn = self.connect()
+    try:
+      conn.execute("INSERT OR REPLACE INTO tasks (task_id, kind, payload, cwd, state, max_attempts, submitted) VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                   (task_id, kind, pickle.dumps(payload), cwd, self.max_attempts, time.time()))
+    finally:
+      conn.close()
+
+  def claim(self, worker_id, kinds=None):
+    """ Claims the oldest pending task, first returning tasks whose lease has expired (i.e., whose
+    worker died or hung) to the pending state
+
+    :param worker_id: name of the claiming worker, recorded for diagnostics
+    :type worker_id: String
+    :param kinds: only claim tasks of these kinds, or None for any
+    :type kinds: list of Strings
+    :return: the claimed task, or None if nothing is pending
+    :rtype: :class:`QueueTask`
+    """
+    conn = self.connect()
+    try:
+      conn.execute("BEGIN IMMEDIATE")
+      now = time.time()
+      conn.execute("UPDATE tasks SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+                   "error = 'lease of ' || worker || ' expired', worker = NULL, lease_id = NULL "
+                   "WHERE state = 'claimed' AND lease_expires < ?", (now,))
+      sql = "SELECT task_id, kind, payload, cwd FROM tasks WHERE state = 'pending'"
+      params = []
+      if kinds is not None:
+        sql += " AND kind IN ({})".format(", ".join("?" for kind in kinds))
+        params.extend(kinds)
+      row = conn.execute(sql + " ORDER BY submitted, rowid LIMIT 1", params).fetchone()
+      task = None
+      if row is not None:
+        task = QueueTask(task_id=row[0], kind=row[1], payload=pickle.loads(row[2]), cwd=row[3], lease_id=uuid.uuid4().hex)
+        conn.execute("UPDATE tasks SET state = 'claimed', worker = ?, lease_id = ?, lease_expires = ?, attempts = attempts + 1 WHERE task_id = ?",
+                     (worker_id, task.lease_id, now + self.lease_seconds, task.task_id))
+      conn.execute("COMMIT")
+      return task
+    finally:
+      conn.close()
+
+  def renew(self, task):
+    """ Extends the lease on a claimed task
+
+    :return: whether the claim is still held
+    :rtype: bool
+    """
+    conn = self.connect()
+    try:
+      cursor = conn.execute("UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND lease_id = ? AND state = 'claimed'",
+                            (time.time() + self.lease_seconds, task.task_id, task.lease_id))
+      return cursor.rowcount > 0
+    finally:
+      conn.close()
+
+  def complete(self, task, result=None):
+    """ Marks a claimed task done with a picklable result
+
+    :return: whether the result was accepted, i.e., the claim had not been handed to another worker
+    :rtype: bool
+    """
+    conn = self.connect()
+    try:
+      cursor = conn.execute("UPDATE tasks SET state = 'done', result = ?, error = NULL, finished = ?, lease_id = NULL WHERE task_id = ? AND lease_id = ?",
+                            (pickle.dumps(result), time.time(), task.task_id, task.lease_id))
+      return cursor.rowcount > 0
+    finally:
+      conn.close()
+
+  def fail(self, task, error):
+    """ Returns a claimed task to the queue after an error, or marks it failed once it has used up its attempts
+    """
+    conn = self.connect()
+    try:
+      conn.execute("UPDATE tasks SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+                   "error = ?, worker = NULL, lease_id = NULL WHERE task_id = ? AND lease_id = ?",
+                   (error, task.task_id, task.lease_id))
+    finally:
+      conn.close()
+
+  def status(self):
+    """ Returns the number of tasks in each state
+    :rtype: dict
+    """
+    conn = self.connect()
+    try:
+      counts = dict(conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+    finally:
+      conn.close()
+    return {state: counts.get(state, 0) for state in QUEUE_STATES}
+
+  def submit(self, task_id, kind, payload, cwd=None):
+    """ Adds a task (see :meth:`put`) and returns a future that resolves to its result once a worker
+    completes it, or raises if it fails. One background thread polls for every submitted task.
+
+    :rtype: concurrent.futures.Future
+    """
+    future = Future()
+    with self.lock:
+      self.futures[task_id] = future
+      self.put(task_id, kind, payload, cwd=cwd)
+      if self.poller is None:
+        self.poller = threading.Thread(target=self.poll, daemon=True)
+        self.poller.start()
+    return future
+
+  def poll(self):
+    while not self.stopped.wait(self.poll_interval):
+      with self.lock:
+        task_ids = list(self.futures)
+      if not task_ids:
+        continue
+      conn = self.connect()
+      try:
+        rows = []
+        for start in range(0, len(task_ids), 500):
+          chunk = task_ids[start:start+500]
+          rows.extend(conn.execute("SELECT task_id, state, result, error, attempts FROM tasks WHERE state IN ('done', 'failed') AND task_id IN ({})".format(
+                                   ", ".join("?" for task_id in chunk)), chunk).fetchall())
+      finally:
+        conn.close()
+      for task_id, state, result, error, attempts in rows:
+        with self.lock:
+          future = self.futures.pop(task_id, None)
+        if future is None:
+          continue
+        if state == "done":
+          future.set_result(pickle.loads(result))
+        else:
+          future.set_exception(RuntimeError("Queued task {} failed after {} attempts: {}".format(task_id, attempts, error)))
+
+  def shutdown(self):
+    self.stopped.set()
+    if self.poller is not None:
+      self.poller.join()
+
+
+def run_worker(queue, handlers, worker_id=None, kinds=None, idle_timeout=None, max_tasks=None):
+  """ Claims and runs tasks from a :class:`WorkQueue` until it has been idle for idle_timeout seconds
+  or has run max_tasks tasks. The lease on a running task is renewed from a heartbeat thread, so
+  only workers that die or hang lose their tasks to other workers. Each task runs from the
+  directory its coordinator ran from.
+
+  :param queue: queue to take tasks from
+  :type queue: :class:`WorkQueue`
+  :param handlers: task kind -> callable taking the task payload and returning a picklable result
+  :type handlers: dict
+  :param worker_id: name recorded with each claim; defaults to hostname:pid
+  :type worker_id: String
+  :param kinds: task kinds to run, by default every kind in handlers
+  :type kinds: list of Strings
+  :param idle_timeout: seconds without a pending task before returning, or None to run until killed
+  :type idle_timeout: float
+  :param max_tasks: return after this many tasks, or None for no limit
+  :type max_tasks: int
+  :return: number of tasks run
+  :rtype: int
+  """
+  if worker_id is None:
+    worker_id = "{}:{}".format(socket.gethostname(), os.getpid())
+  if kinds is None:
+    kinds = list(handlers)
+  start_dir = os.getcwd()
+  num_tasks = 0
+  idle_since = time.time()
+  while max_tasks is None or num_tasks < max_tasks:
+    task = queue.claim(worker_id, kinds=kinds)
+    if task is None:
+      if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+        break
+      time.sleep(queue.poll_interval)
+      continue
+
+    done = threading.Event()
+    def heartbeat():
+      while not done.wait(queue.lease_seconds / 3.):
+        if not queue.renew(task):
+          break
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    try:
+      os.chdir(task.cwd if task.cwd else start_dir)
+      result = handlers[task.kind](task.payload)
+    except Exception:
+      done.set()
+      print("Task {} failed on {}".format(task.task_id, worker_id))
+      traceback.print_exc()
+      queue.fail(task, traceback.format_exc())
+    else:
+      done.set()
+      if not queue.complete(task, result):
+        print("Task {} was reclaimed before {} finished it; result dropped".format(task.task_id, worker_id))
+    finally:
+      heartbeat_thread.join()
+      os.chdir(start_dir)
+    num_tasks += 1
+    idle_since = time.time()
+  return num_tasks
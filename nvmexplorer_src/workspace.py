@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+
+WORKSPACE_CLEANUP = ["archive", "delete", "keep"]
+
+
+class StudyWorkspace:
+  def __init__(self,
+                exp_name="default", #study name, used to label the workspace directory and archive
+                output_path="output", #study output directory
+                isolated=False, #give the study its own directory for generated files instead of the shared data/ and output/ ones
+                root=None, #parent directory for isolated workspaces (e.g., /dev/shm for tmpfs); defaults to the system temp dir
+                cleanup="archive" #what to do with an isolated workspace when the study ends: "archive", "delete", or "keep"
+                ):
+    if cleanup not in WORKSPACE_CLEANUP:
+      raise ValueError("Unknown workspace cleanup {}; expected one of {}".format(cleanup, WORKSPACE_CLEANUP))
+    self.exp_name = exp_name
+    self.output_path = output_path
+    self.isolated = isolated
+    self.cleanup = cleanup
+    self.finished = False
+    if isolated:
+      if root is not None and not os.path.exists(root):
+        os.makedirs(root, exist_ok=True)
+      # mkdtemp picks a name no other study or job on the machine can be using
+      self.path = tempfile.mkdtemp(prefix="nvmexplorer-{}-".format(exp_name), dir=root)
+      self.cell_dir = os.path.join(self.path, "cell_cfgs")
+      self.mem_cfg_dir = os.path.join(self.path, "mem_cfgs")
+      self.log_dir = os.path.join(self.path, "logs")
+      self.nvsim_output_dir = os.path.join(self.path, "nvsim_output")
+    else:
+      self.path = None
+      self.cell_dir = "data/cell_cfgs"
+      self.mem_cfg_dir = "data/mem_cfgs"
+      self.log_dir = "{}/logs".format(output_path)
+      self.nvsim_output_dir = "{}/nvsim_output".format(output_path)
+    for directory in [self.cell_dir, self.mem_cfg_dir, self.log_dir, self.nvsim_output_dir]:
+      if not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+  def finish(self):
+    """ Archives an isolated workspace to [output_path]/workspaces/ and/or removes it, per cleanup.
+    Shared workspaces are left alone. Safe to call more than once.
+
+    :return: path to the archive, if one was written
+    :rtype: String
+    """
+    if not self.isolated or self.finished or not os.path.exists(self.path):
+      self.finished = True
+      return None
+    self.finished = True
+    archive_path = None
+    if self.cleanup == "archive":
+      archive_dir = "{}/workspaces".format(self.output_path)
+      if not os.path.exists(archive_dir):
+        os.makedirs(archive_dir, exist_ok=True)
+      archive_path = shutil.make_archive(os.path.join(archive_dir, os.path.basename(self.path)), "gztar",
+                                         root_dir=os.path.dirname(self.path), base_dir=os.path.basename(self.path))
+    if self.cleanup in ["archive", "delete"]:
+      shutil.rmtree(self.path, ignore_errors=True)
+    return archive_path
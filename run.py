@@ -7,102 +7,64 @@ import pandas as pd
 import numpy as np
 import math
 import argparse
+import atexit
 import sys
 import subprocess
 from nvmexplorer_src.eval_utils import *
 from nvmexplorer_src.combine_csv import *
+from nvmexplorer_src.results_store import *
 from data.workload_data.spec_inputs import *
 from data.workload_data.graph_inputs import *
 from data.workload_data.dnn_inputs import *
 from nvmexplorer_src.traffic import *
 from nvmexplorer_src.tentpoles import *
+from nvmexplorer_src.survey_store import *
+from nvmexplorer_src.nvsim_pool import *
+from nvmexplorer_src.nvsim_cache import *
+from nvmexplorer_src.study import *
+from nvmexplorer_src.pareto import *
+from nvmexplorer_src.crossover import *
+from nvmexplorer_src.workspace import *
+from nvmexplorer_src.scheduler import *
+from nvmexplorer_src.journal import *
+from nvmexplorer_src.work_queue import *
+from nvmexplorer_src.sweep_plan import *
+from nvmexplorer_src.surrogate import *
+from nvmexplorer_src.warm_start import *
+from nvmexplorer_src.interpolation import *
 
 
-def load_spreadsheet_data(cell_type, output_path):
+def load_spreadsheet_data(cell_type, output_path, columns=None):
   """ Returns a pandas dataframe object containing data for a particular NVM technology
-  specified by cell_type from the NVM spreadsheet
+  specified by cell_type from the NVM survey database, with numeric columns as floats and
+  empty entries as NaN
 
   :param cell_type: String indicating which NVM technology to use
   :type cyll_type: String
+  :param columns: survey columns to load, or None for all of them
+  :type columns: list of Strings
   :return: pandas dataframe object containing the spreadsheet data
   :rtype: pandas dataframe 
   """
-  if (cell_type == 'STT'):
-      temp_df = pd.read_pickle("{}/NVM_data/STTRAM_data.pkl".format(output_path))
-  elif (cell_type == 'RRAM'):
-      temp_df = pd.read_pickle("{}/NVM_data/RRAM_data.pkl".format(output_path))
-  elif (cell_type == 'PCM'):
-      temp_df = pd.read_pickle("{}/NVM_data/PCM_data.pkl".format(output_path))
-  elif (cell_type == 'CTT'): #BIG CAVEAT not including MLC capacity / details at this time
-      temp_df = pd.read_pickle("{}/NVM_data/CTT_data.pkl".format(output_path))
-  elif (cell_type == 'FeFET'): #BIG CAVEAT not including MLC capacity / details at this time
-      temp_df = pd.read_pickle("{}/NVM_data/FeFET_data.pkl".format(output_path))
-  else: # default back to RRAM if somehow tech is not provided
-      temp_df = pd.read_pickle("{}/NVM_data/RRAM_data.pkl".format(output_path))
-  
-
-  if (cell_type != 'SRAM'):
-      temp_df.replace('', np.nan, inplace = True) # fill empty cells with NAN to make processing easier
-
-  return temp_df
-
-def run_nvsim(output_paths, log_dir, stdout_logs, stderr_logs, nvsim_path, cfg_paths, nvsim_input_cfgs, output_dir):
-  """ Returns NVSim output from simulating user-specified cell definitions
-  in parallel and pickles the output. NVSim is only run if pickles do not already
-  exist
-
-  :param output_paths: paths for pickled outputs
-  :type output_paths: Array of Strings
-  :param log_dir: directory containing log files from NVSim runs
-  :type log_dir: String
-  :param stdout_logs: paths to stdout from NVSim runs
-  :type stdout_logs: Array of Strings
-  :param stderr_logs: paths to stderr from NVSim runs
-  :type stderr_logs: Array of Strings
-  :param nvsim_path: path to NVSim version
-  :type nvsim_path: String
-  :param cfg_paths: paths to cfg files for NVSim run
-  :type cfg_paths: Array of Strings
-  :param nvsim_input_cfgs: Array of :class:`NVSimIntputConfig` object that were 
-  used to create the NVSim outputs
-  :type nvsim_input_cfgs: Array of :class:`NVSimIntputConfig`
-  :param output_dir: path to output dir for pickled NVSim output
-  :type output_dir: String
-  :return: Array of Strings pointing to NVSim output files
-  :rtype: Array of Strings
-  """
-  for i in range(len(output_paths)):
-    nvsim_processes = []
-
-    if not os.path.exists(output_paths[i]): 
-      with open(stdout_logs[i], "w") as f_out:
-        with open(stderr_logs[i], "w") as f_error:
-          p1 = subprocess.Popen([nvsim_path, cfg_paths[i]],  stdout=f_out, stderr=f_error)
-          p1.wait()
-
-
-      #nvsim_processes.append(p1)
-
-  #for proc in nvsim_processes:
-  #  proc.wait()
-  
-  nvsim_outputs = []
-  for i in range(len(output_paths)):
-    nvsim_output = nvmexplorer_src.input_defs.nvsim_interface.parse_nvsim_output(stdout_logs[i], input_cfg=nvsim_input_cfgs[i])
-    nvsim_output.print_summary()
-    if not os.path.exists(output_dir): 
-      os.makedirs(output_dir)
-    nvsim_outputs.append(nvsim_output)
-    pickle.dump(nvsim_output,open(output_paths[i], 'wb'))
-    # Output already exists - load the pickle(s)
-    #else:
-    #  nvsim_output = pickle.load(open(output_paths[i], 'rb')) 
-    #  nvsim_outputs.append(nvsim_output)
-
-  return nvsim_outputs
+  if cell_type not in SURVEY_NAMES: # default back to RRAM if somehow tech is not provided
+      cell_type = 'RRAM'
+  return load_survey_data(cell_type, columns=columns, db_path=survey_db_path("{}/NVM_data".format(output_path)))
 
 ## Initialize objects based on config file and run eval
 if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Run an NVMExplorer study")
+  parser.add_argument("config", help="path to JSON study config")
+  parser.add_argument("-j", "--jobs", type=int, default=None,
+                      help="max number of NVSim processes to run at once (default: number of CPUs, or every task with --queue)")
+  parser.add_argument("--no-nvsim-cache", action="store_true",
+                      help="always re-run NVSim instead of reusing results cached by cell and cfg contents")
+  parser.add_argument("--retry-failed", action="store_true",
+                      help="re-run NVSim jobs the cache records as failing instead of skipping them")
+  parser.add_argument("--resume", action="store_true",
+                      help="continue an interrupted study, skipping NVSim jobs and study points its journal lists as finished")
+  parser.add_argument("--queue",
+                      help="sqlite work queue on a shared filesystem; NVSim runs and study point evaluations are left to run_worker.py processes on any node")
+  args = parser.parse_args()
   
   exp_name = "default"
   read_frequency = 100000
@@ -120,9 +82,19 @@ if __name__ == '__main__':
   nvsim_path = "nvmexplorer_src/nvsim/nvsim"
   output_path = "output"
   cell_tentpoles = True #by default, run a "tentpole" style study
+  results_formats = ["csv"]
+  results_db = None
+  pareto = None
+  crossover = False
+  workspace_config = None
+  adaptive_traffic = {}
+  surrogate_config = None
+  warm_start_config = None
+  multi_target = False
+  interpolate = None
 
   # Load config file
-  with open(sys.argv[1]) as f:
+  with open(args.config) as f:
       config = json.load(f)
  
   # Override default values of local variables if needed
@@ -173,168 +145,362 @@ if __name__ == '__main__':
           output_path = config["experiment"]["output_path"]
   if "custom_cells" in config["experiment"]:
       cell_tentpoles = False
+  if "results_formats" in config["experiment"]:
+      if config["experiment"]["results_formats"]:
+          results_formats = config["experiment"]["results_formats"]
+  if "results_db" in config["experiment"]:
+      if config["experiment"]["results_db"]:
+          results_db = config["experiment"]["results_db"]
+  if "pareto" in config["experiment"]:
+      if config["experiment"]["pareto"] or config["experiment"]["pareto"] == {}: # true and {} both use the defaults
+          pareto = config["experiment"]["pareto"]
+  if "crossover" in config["experiment"]:
+      if config["experiment"]["crossover"]:
+          crossover = True
+  if "workspace" in config["experiment"]:
+      if config["experiment"]["workspace"] or config["experiment"]["workspace"] == {}:
+          workspace_config = config["experiment"]["workspace"]
+  if "adaptive_traffic" in config["experiment"]:
+      if config["experiment"]["adaptive_traffic"]:
+          adaptive_traffic = config["experiment"]["adaptive_traffic"]
+  if "multi_target" in config["experiment"]:
+      if config["experiment"]["multi_target"]:
+          multi_target = True
+  if "interpolate" in config["experiment"]:
+      if config["experiment"]["interpolate"] or config["experiment"]["interpolate"] == {}:
+          interpolate = config["experiment"]["interpolate"]
+  if "surrogate" in config["experiment"]:
+      if config["experiment"]["surrogate"] or config["experiment"]["surrogate"] == {}:
+          surrogate_config = config["experiment"]["surrogate"]
+  if "warm_start" in config["experiment"]:
+      if config["experiment"]["warm_start"] or config["experiment"]["warm_start"] == {}:
+          warm_start_config = config["experiment"]["warm_start"]
    
   print("Successfully Loaded Config File")
   
-  # The main loop of NVMExplorer
-  for _cell_type in cell_type:
-      for _opt_target in opt_target:
-          for _capacity in capacity:
-              for _bits_per_cell in bits_per_cell:
-                  access_pattern = nvmexplorer_src.input_defs.access_pattern.PatternConfig(exp_name = exp_name,
-                      read_freq = read_frequency,
-                      read_size = read_size,
-                      write_freq = write_frequency,
-                      write_size = write_size,
-                      workingset = working_set)
-                  
-                  # Loads data from NVM database
-                  data_df = load_spreadsheet_data(_cell_type, output_path)
-                      
-                  ## Define the paths
-                  log_dir = "{}/logs".format(output_path) # This is where we'll store stdout and stderr for each NVSim run for debugging and/or post-processing purposes
-                  output_dir = "{}/nvsim_output".format(output_path) # This is where we'll store the pickled results. In case we are doing a run that doesn't require re-running NVSim
-                  if not os.path.exists(log_dir): 
-                      os.makedirs(log_dir)
-                  if not os.path.exists(output_dir): 
-                      os.makedirs(output_dir)
-                  if not os.path.exists("{}/results".format(output_path)): 
-                      os.makedirs("{}/results".format(output_path))
-                  if not os.path.exists("data/mem_cfgs"): 
-                      os.makedirs("data/mem_cfgs")
+  set_results_formats(results_formats)
+  if "sqlite" in results_formats:
+      if results_db is None:
+          results_db = "{}/results/nvmexplorer_results.db".format(output_path)
+      add_results_sink(SQLiteResultsSink(results_db, exp_name=exp_name))
+  if pareto is not None:
+      if pareto is True:
+          pareto = {}
+      # Keep the non-dominated designs per benchmark/traffic point up to date as study points finish
+      frontier = ParetoFrontier(objectives=pareto.get("objectives", ["Total Power", "Read Latency (ns)", "Area (mm^2)"]),
+                               senses=pareto.get("senses"),
+                               group_by=pareto.get("group_by", ["Benchmark Name", "Read Accesses", "Write Accesses"]),
+                               output_csv="{}/results/{}-pareto.csv".format(output_path, exp_name))
+      add_results_sink(frontier)
 
-                  results_csv = "{}/results/{}_{}MB_{}_{}BPC-{}.csv".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, exp_name)    
-                  if os.path.exists(results_csv):
-                      os.remove(results_csv)
+  ## Define the paths
+  # Generated cell files, mem cfgs, NVSim logs, and pickled NVSim outputs go to the shared data/ and output/ directories,
+  # or to a directory of their own if the study is isolated so concurrent studies cannot overwrite each other's inputs
+  if workspace_config is not None:
+      if workspace_config is True:
+          workspace_config = {}
+      workspace = StudyWorkspace(exp_name=exp_name, output_path=output_path, isolated=True,
+                                 root=workspace_config.get("root"), cleanup=workspace_config.get("cleanup", "archive"))
+      atexit.register(workspace.finish)
+      print("Study workspace: {}".format(workspace.path))
+  else:
+      workspace = StudyWorkspace(exp_name=exp_name, output_path=output_path)
+  if not os.path.exists("{}/results".format(output_path)): 
+      os.makedirs("{}/results".format(output_path))
 
+  # Expand the study into a task graph: survey load -> cell files -> mem cfgs -> NVSim runs -> parses ->
+  # per-point traffic evaluation -> per-technology combine. Ready tasks run as soon as their inputs exist, so
+  # evaluation and combining of finished points overlap with NVSim runs that are still in progress.
+  nvsim_cache = None
+  if not args.no_nvsim_cache:
+      nvsim_cache = NVSimCache("{}/nvsim_cache".format(output_path))
+  # Every finished NVSim job and evaluated study point is journaled so an interrupted study can be resumed
+  journal = StudyJournal("{}/results/{}-journal.jsonl".format(output_path, exp_name), resume=args.resume)
+  if args.resume:
+      print("Resuming study: {} NVSim jobs and {} study points already finished".format(journal.count("nvsim"), journal.count("evaluate")))
+  work_queue = None
+  if args.queue is not None:
+      work_queue = WorkQueue(args.queue)
+      print("Distributing study through work queue {}; start workers with: python run_worker.py {}".format(args.queue, args.queue))
+  surrogate_screen = None
+  if surrogate_config is not None:
+      # Fit a surrogate on every cached NVSim result and only simulate designs it is unsure about or that may
+      # beat what has been simulated; the rest are evaluated with predicted array characteristics
+      if surrogate_config is True:
+          surrogate_config = {}
+      surrogate = ArraySurrogate()
+      print("Surrogate fit on {} cached NVSim results".format(surrogate.fit(load_cached_outputs("{}/nvsim_cache".format(output_path)))))
+      surrogate_screen = SurrogateScreen(surrogate, log_path="{}/results/{}-surrogate.jsonl".format(output_path, exp_name),
+                                         objectives=surrogate_config.get("objectives", ["read_latency", "write_latency", "read_energy", "write_energy", "leakage_power", "area"]),
+                                         uncertainty=surrogate_config.get("uncertainty", 0.25),
+                                         margin=surrogate_config.get("margin", 2.),
+                                         min_samples=surrogate_config.get("min_samples", 20))
+  warm_start = None
+  if warm_start_config is not None:
+      # Search designs close to one already searched (e.g., the next set_pulse of a custom cell sweep) only
+      # around that design's organization, starting from every cached result and growing as the study runs
+      if warm_start_config is True:
+          warm_start_config = {}
+      warm_start = WarmStart(force=warm_start_config.get("force", ["bank", "mat"]),
+                             radius=warm_start_config.get("radius", 1.),
+                             tolerance=warm_start_config.get("tolerance", 10.),
+                             log_path="{}/results/{}-warm-start.jsonl".format(output_path, exp_name))
+      for nvsim_output in load_cached_outputs("{}/nvsim_cache".format(output_path)):
+          warm_start.add(nvsim_output)
+  num_jobs = args.jobs if args.jobs is not None else os.cpu_count()
+  pool = NVSimPool(nvsim_path, cache=nvsim_cache, journal=journal, queue=work_queue, screen=surrogate_screen,
+                   warm_start=warm_start, retry_failed=args.retry_failed)
+  manifest = RunManifest("{}/results/{}-manifest.json".format(output_path, exp_name))
+  graph = TaskGraph()
+  data_dfs = {}
+  study_points = {} # (cell_type, opt_target, capacity, bits_per_cell) -> StudyPoint, filled in by the cfg tasks
+  point_keys = []
+  parse_tasks = {}
 
-                  # TODO: conditional for tentpole study or default values study
-                  if (cell_tentpoles == True): #set up default, tentpole-style study per cell type
-                      # Creates the tentpoles per technology
-                      best_case_cell_path, worst_case_cell_path, best_case_cell_cfg, worst_case_cell_cfg = form_tentpoles(data_df, _cell_type, _bits_per_cell)
+  def load_survey(_cell_type):
+      # Loads data from NVM database
+      data_dfs[_cell_type] = load_spreadsheet_data(_cell_type, output_path, columns=TENTPOLE_COLUMNS.get(_cell_type))
 
-                      best_case_cfg_path = "data/mem_cfgs/{}_{}MB_{}_{}BPC-best_case.cfg".format(_cell_type, _capacity, _opt_target, _bits_per_cell)
-                      worst_case_cfg_path = "data/mem_cfgs/{}_{}MB_{}_{}BPC-worst_case.cfg".format(_cell_type, _capacity, _opt_target, _bits_per_cell)
-                      best_case_stdout_log = "{}/logs/{}_{}MB_{}_{}BPC-best_case_output".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell)
-                      best_case_stderr_log = "{}/logs/{}_{}MB_{}_{}BPC-best_case_error".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell)
-                      worst_case_stdout_log = "{}/logs/{}_{}MB_{}_{}BPC-worst_case_output".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell)
-                      worst_case_stderr_log = "{}/logs/{}_{}MB_{}_{}BPC-worst_case_error".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell)
+  def render_cfgs(key):
+      _cell_type, _opt_target, _capacity, _bits_per_cell = key
+      study_points[key] = setup_study_point(config, data_dfs[_cell_type], _cell_type, _opt_target, _capacity, _bits_per_cell,
+                                            exp_name=exp_name,
+                                            process_node=process_node,
+                                            word_width=word_width,
+                                            output_path=output_path,
+                                            cell_tentpoles=cell_tentpoles,
+                                            workspace=workspace,
+                                            multi_target=multi_target)
+      if anchor_capacities is not None:
+          study_points[key].extra_columns = [(INTERPOLATION_HEADERS, SIMULATED_COLUMNS)] * len(study_points[key].jobs)
 
-                      ## Generate corresponding mem cfgs
-                      nvsim_best_case_input_cfg = nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(mem_cfg_file_path = best_case_cfg_path, process_node = process_node,
-                                                       opt_target = _opt_target,
-                                                       word_width = word_width,
-                                                       capacity = _capacity,
-                                                       cell_type = best_case_cell_cfg)
+  def interpolate_cell(key, i, anchor_keys):
+      # fills in one cell of a study point from the same cell's NVSim results at the anchor capacities
+      point = study_points[key]
+      anchor_outputs = dict((k[2], graph.result(parse_tasks[k][i])) for k in anchor_keys)
+      nvsim_output = interpolate_output(anchor_outputs, point.nvsim_input_cfgs[i])
+      errors = holdout_errors(anchor_outputs)
+      point.jobs[i].cache_key = "interpolated:" + inputs_digest([study_points[k].jobs[i].result_key() for k in anchor_keys] + [key[2]])
+      point.extra_columns[i] = (INTERPOLATION_HEADERS, interpolated_columns(errors))
+      interpolation_records.append({"cell_path": point.cell_paths[i], "cell_type": key[0], "opt_target": key[1], "capacity": key[2],
+                                    "bits_per_cell": key[3], "anchors": sorted(anchor_outputs), "holdout_errors": errors,
+                                    "interpolated": dict((metric, getattr(nvsim_output, metric)) for metric in INTERPOLATED_METRICS)})
+      return nvsim_output
 
-                      nvsim_worst_case_input_cfg = nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(mem_cfg_file_path = worst_case_cfg_path, process_node = process_node,
-                                                       opt_target = _opt_target,
-                                                       word_width = word_width,
-                                                       capacity = _capacity,
-                                                       cell_type = worst_case_cell_cfg)
+  def prepare_evaluation(key, adaptive_task=None):
+      point = study_points[key]
+      point.evaluated = True
+      point.nvsim_outputs = [graph.result(task) for task in parse_tasks[key]]
+      for nvsim_output in point.nvsim_outputs:
+          nvsim_output.print_summary()
+      if surrogate_screen is not None:
+          # flag the rows of cells evaluated with the surrogate's predictions, after any interpolation columns
+          columns = point.extra_columns if point.extra_columns else [([], [])] * len(point.jobs)
+          point.extra_columns = [(headers + PREDICTED_HEADERS, values + predicted_columns(job.predicted))
+                                 for ((headers, values), job) in zip(columns, point.jobs)]
 
-                      nvsim_worst_case_input_cfg.generate_mem_cfg()
-                      nvsim_best_case_input_cfg.generate_mem_cfg()
+      access_pattern = nvmexplorer_src.input_defs.access_pattern.PatternConfig(exp_name = exp_name,
+          read_freq = read_frequency,
+          read_size = read_size,
+          write_freq = write_frequency,
+          write_size = write_size,
+          workingset = working_set)
+      adaptive_points = graph.result(adaptive_task) if adaptive_task is not None else None
+      inputs = inputs_digest({"nvsim": [job.result_key() for job in point.jobs], "cell_paths": point.cell_paths, "traffic": traffic,
+                              "access_pattern": [read_frequency, read_size, write_frequency, write_size, working_set],
+                              "adaptive_points": adaptive_points, "results_formats": results_formats})
+      return point, access_pattern, adaptive_points, inputs
 
-                      worst_output_path = "{}/nvsim_output/{}_{}MB_{}_{}BPC_{}b-worst_case_nvsim_output.pkl".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, word_width)
-                      best_output_path = "{}/nvsim_output/{}_{}MB_{}_{}BPC_{}b-best_case_nvsim_output.pkl".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, word_width)
-                      #group paths to be compatible with run_nvsim parallelism
-                      cell_paths = [worst_case_cell_path, best_case_cell_path]
-                      cell_cfgs = [worst_case_cell_cfg, best_case_cell_cfg]
-                      output_paths = [worst_output_path, best_output_path]
-                      stdout_logs = [worst_case_stdout_log, best_case_stdout_log]
-                      stderr_logs = [worst_case_stderr_log, best_case_stderr_log]
-                      cfg_paths = [worst_case_cfg_path, best_case_cfg_path]
-                      nvsim_input_cfgs = [nvsim_worst_case_input_cfg, nvsim_best_case_input_cfg]
-                  else: #initialize cell configs according to input over-rides or default settings
-                      cell_paths = []
-                      cell_cfgs = []
-                      output_paths = []
-                      stdout_logs = []
-                      stderr_logs = []
-                      cfg_paths = []
-                      nvsim_input_cfgs = []
+  def replay_results(point):
+      # send rows written by an earlier run or another process to results sinks held by this one; sinks replace
+      # what they hold for the file, so every row goes to every sink
+      headers, rows = read_results_csv(point.results_csv)
+      for sink in results_sinks:
+          sink.write_results(point.results_csv, headers, rows, study_point_metadata(point, exp_name))
 
-                      if len(config["custom_cells"]) == 0: #use default values per technology
-                        this_cell_path, this_cell_cfg = gen_custom_cell(_cell_type, {"name":"default", "bits_per_cell":_bits_per_cell})
-                        this_cfg_path = "data/mem_cfgs/{}_{}MB_{}_{}BPC_{}.cfg".format(_cell_type, _capacity, _opt_target, _bits_per_cell, "default")
-                        nvsim_input_cfg = nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(mem_cfg_file_path = this_cfg_path, 
-                                                       process_node = process_node,
-                                                       opt_target = _opt_target,
-                                                       word_width = word_width,
-                                                       capacity = _capacity,
-                                                       cell_type = this_cell_cfg)
+  def record_evaluation(point):
+      if os.path.exists(point.results_csv):
+          manifest.add(point.results_csv, point.cell_type, point.bits_per_cell)
+          manifest.save()
 
-                        nvsim_input_cfg.generate_mem_cfg()
-                        #assign paths for default cell
-                        cell_paths.append(this_cell_path)
-                        cell_cfgs.append(this_cell_cfg)
-                        cfg_paths.append(this_cfg_path)
-                        nvsim_input_cfgs.append(nvsim_input_cfg)
-                        output_paths.append("{}/nvsim_output/{}_{}MB_{}_{}BPC_{}b_{}_nvsim_output.pkl".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, word_width, "default"))
-                        stdout_logs.append("{}/logs/{}_{}MB_{}_{}BPC_{}_output".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, "default"))
-                        stderr_logs.append("{}/logs/{}_{}MB_{}_{}BPC_{}_error".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, "default"))
-                      else:
-                        for i in range(len(config["custom_cells"])):
-                          this_custom_cell_input = config["custom_cells"][i]
-                          #if no name, assign a unique one
-                          if this_custom_cell_input["cell_type"] == _cell_type:
-                            if not "name" in this_custom_cell_input:
-                              this_custom_cell_input["name"] = "custom"+_cell_type+str(i)
-                            this_cell_path, this_cell_cfg = gen_custom_cell(_cell_type, this_custom_cell_input)
-                            this_cfg_path = "data/mem_cfgs/{}_{}MB_{}_{}BPC_{}.cfg".format(_cell_type, _capacity, _opt_target, _bits_per_cell, this_custom_cell_input["name"])
-                            nvsim_input_cfg = nvmexplorer_src.input_defs.nvsim_interface.NVSimInputConfig(mem_cfg_file_path = this_cfg_path, 
-                                                       process_node = process_node,
-                                                       opt_target = _opt_target,
-                                                       word_width = word_width,
-                                                       capacity = _capacity,
-                                                       cell_type = this_cell_cfg)
+  def evaluate(key, adaptive_task=None):
+      point, access_pattern, adaptive_points, inputs = prepare_evaluation(key, adaptive_task)
+      if journal.completed("evaluate", point.results_csv, inputs, output_path=point.results_csv):
+          print("Resumed {} from the study journal".format(point.results_csv))
+          replay_results(point)
+      else:
+          evaluate_study_point(point, point.nvsim_outputs, access_pattern, traffic, exp_name=exp_name, adaptive_points=adaptive_points)
+          journal.record("evaluate", point.results_csv, inputs=inputs, traffic=traffic, output_digest=file_digest(point.results_csv))
+      record_evaluation(point)
 
-                            nvsim_input_cfg.generate_mem_cfg()
-                            #assign paths for custom cell
-                            cell_paths.append(this_cell_path)
-                            cell_cfgs.append(this_cell_cfg)
-                            cfg_paths.append(this_cfg_path)
-                            nvsim_input_cfgs.append(nvsim_input_cfg)
-                            output_paths.append("{}/nvsim_output/{}_{}MB_{}_{}BPC_{}b_{}_nvsim_output.pkl".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, word_width, this_custom_cell_input["name"]))
-                            stdout_logs.append("{}/logs/{}_{}MB_{}_{}BPC_{}_output".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, this_custom_cell_input["name"]))
-                            stderr_logs.append("{}/logs/{}_{}MB_{}_{}BPC_{}_error".format(output_path, _cell_type, _capacity, _opt_target, _bits_per_cell, this_custom_cell_input["name"]))
+  def evaluate_remotely(key, adaptive_task=None):
+      # runs on a scheduler worker thread, which waits while a queue worker evaluates the point
+      point, access_pattern, adaptive_points, inputs = prepare_evaluation(key, adaptive_task)
+      if journal.completed("evaluate", point.results_csv, inputs, output_path=point.results_csv):
+          return inputs, None # resumed from the journal
+      evaluated = work_queue.submit("evaluate:{}".format(os.path.abspath(point.results_csv)), "evaluate",
+                                    {"point": point, "nvsim_outputs": point.nvsim_outputs, "access_pattern": access_pattern, "traffic": traffic,
+                                     "exp_name": exp_name, "adaptive_points": adaptive_points, "results_formats": results_formats}).result()
+      return inputs, evaluated
 
-                  # Run modified nvsim on cell configs
-                  nvsim_outputs = run_nvsim(output_paths, log_dir, stdout_logs, stderr_logs, nvsim_path, cfg_paths, nvsim_input_cfgs, output_dir)
+  def collect_evaluation(key, evaluate_task):
+      inputs, evaluated = graph.result(evaluate_task)
+      point = study_points[key]
+      if evaluated is None:
+          print("Resumed {} from the study journal".format(point.results_csv))
+          replay_results(point)
+      else:
+          # the worker wrote the csv and columnar copies; this process's sinks (sqlite, Pareto frontier) get the rows here
+          replay_results(point)
+          journal.record("evaluate", point.results_csv, inputs=inputs, traffic=traffic, output_digest=file_digest(point.results_csv))
+      record_evaluation(point)
 
-                  # Report results, add cell config params, mem config params, and whatever we are sweeping to the header
-                  for i in range(len(nvsim_outputs)):
-                      result = ExperimentResult(access_pattern, nvsim_input_cfgs[i], nvsim_outputs[i])
-                      result.evaluate()
- 
-                      print("Retrieved Array-Level Results; Running Analytical Model")
-                     
-                      # Run application-level sweeps and save results
-                      #FIXME also add conditional for customized traffic inputs
-                      if len(traffic) > 0:
-                          # First function call prints header to the spreadsheet, second one prints to csv. Only need to report the header once
-                          result.report_header_benchmark(1, results_csv, cell_paths[i], cfg_paths[i]) 
-                          
-                          if "generic" in traffic:
-                              # GENERIC traffic sweep; report all outputs  
-                              generic_traffic(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
-                              
-                          if "graph" in traffic:
-                              # Graph traffic sweep
-                              graph_traffic(graph8MB, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  def group_keys(_opt_target, _capacity, _bits_per_cell):
+      return [key for key in point_keys if key[1:] == (_opt_target, _capacity, _bits_per_cell)]
 
-                          if "dnn" in traffic:
-                              # DNN traffic sweep
-                              dnn_traffic(DNN_weights, DNN_weights_acts, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  def refine_traffic(keys):
+      # Adaptive sampling refines around the boundaries between technologies, so every cell type at this
+      # opt_target/capacity/bits_per_cell shares one set of traffic points
+      access_pattern = nvmexplorer_src.input_defs.access_pattern.PatternConfig(exp_name = exp_name,
+          read_size = read_size,
+          write_size = write_size)
+      adaptive_points = adaptive_traffic_points(access_pattern,
+                                                [cfg for key in keys for cfg in study_points[key].nvsim_input_cfgs],
+                                                [graph.result(task) for key in keys for task in parse_tasks[key]],
+                                                **adaptive_traffic)
+      print("Adaptive traffic sweep: {} points".format(len(adaptive_points)))
+      return adaptive_points
 
-                          if "spec" in traffic:
-                              # SPEC2017 traffic
-                              spec_traffic(spec8MBLLC, spec16MBLLC, spec16MBDRAM, spec16MBL2, spec32MBLLC, spec64MBLLC, access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
+  def solve_crossovers():
+      # Solve where each cell wins on total power, across technologies, for every opt_target/capacity/bits_per_cell
+      access_pattern = nvmexplorer_src.input_defs.access_pattern.PatternConfig(exp_name = exp_name,
+          read_size = read_size,
+          write_size = write_size)
+      crossovers = []
+      for _opt_target in opt_target:
+          for _capacity in capacity:
+              for _bits_per_cell in bits_per_cell:
+                  points = [study_points[key] for key in group_keys(_opt_target, _capacity, _bits_per_cell)]
+                  if not points:
+                      continue # every cell type was dropped from the plan
+                  regions = crossover_regions(access_pattern,
+                                              [cfg for p in points for cfg in p.nvsim_input_cfgs],
+                                              [graph.result(task) for key in group_keys(_opt_target, _capacity, _bits_per_cell) for task in parse_tasks[key]],
+                                              labels=[os.path.splitext(os.path.basename(path))[0] for p in points for path in p.cell_paths])
+                  regions.update({"opt_target": _opt_target, "capacity": _capacity, "bits_per_cell": _bits_per_cell})
+                  crossovers.append(regions)
+      write_crossover_regions("{}/results/{}-crossover.json".format(output_path, exp_name), crossovers)
 
-                          if "generic_write_buff" in traffic:
-                              #next, run generic traffic with write buffer proxy
-                              generic_traffic_with_write_buff(access_pattern, nvsim_input_cfgs, nvsim_outputs, results_csv, cell_paths, cfg_paths)
-      
-      combine_csv(_cell_type, _bits_per_cell)
+  def combine(_cell_type):
+      combine_csv(_cell_type, bits_per_cell[-1], manifest=manifest, output_path=output_path)
+      for results_format in results_formats:
+          if results_format in COLUMNAR_FORMATS:
+              combine_columnar(_cell_type, bits_per_cell[-1], results_format, manifest=manifest, output_path=output_path)
       print("Reported Results; Evaluation Complete")
+
+  # Drop combinations NVSim cannot simulate before anything is generated; identical NVSim jobs, e.g., SRAM at every
+  # bits_per_cell or tentpoles whose best and worst case coincide, are run once by the pool and shared
+  plan = plan_sweep(cell_type, opt_target, capacity, bits_per_cell,
+                    lambda _cell_type: count_study_cells(config, _cell_type, cell_tentpoles), cell_tentpoles=cell_tentpoles, multi_target=multi_target)
+  plan.print_summary()
+
+  # With interpolation, NVSim only runs at a few anchor capacities and every other capacity is filled in from them
+  anchor_capacities = None
+  interpolation_records = []
+  if interpolate is not None:
+      if interpolate is True:
+          interpolate = {}
+      anchor_capacities = choose_anchors(capacity, interpolate.get("anchors"))
+      print("Interpolating capacities {} from NVSim runs at {}".format([c for c in capacity if c not in anchor_capacities], anchor_capacities))
+
+  # Cell files and mem cfgs are generated on the scheduler thread, before any NVSim process that reads them starts
+  for key in plan.points:
+      _cell_type, _opt_target, _capacity, _bits_per_cell = key
+      cell_task = "survey/{}".format(_cell_type)
+      if cell_task not in graph.tasks:
+          graph.add(cell_task, lambda _cell_type=_cell_type: load_survey(_cell_type), on_main=True)
+      if cell_tentpoles:
+          cell_task = "cells/{}/{}BPC".format(_cell_type, _bits_per_cell)
+          if cell_task not in graph.tasks:
+              graph.add(cell_task, lambda _cell_type=_cell_type, _bits_per_cell=_bits_per_cell: form_tentpoles(data_dfs[_cell_type], _cell_type, _bits_per_cell, cell_dir=workspace.cell_dir),
+                        deps=["survey/{}".format(_cell_type)], on_main=True)
+      label = "{}_{}MB_{}_{}BPC".format(*key)
+      point_keys.append(key)
+      graph.add("cfgs/{}".format(label), lambda key=key: render_cfgs(key), deps=[cell_task], on_main=True)
+      parse_tasks[key] = []
+      if anchor_capacities is not None and _capacity not in anchor_capacities:
+          continue # interpolated below, once every anchor has its tasks
+      for i in range(plan.cells_per_point[_cell_type]):
+          graph.add("nvsim/{}/{}".format(label, i), lambda key=key, i=i: pool.run_nvsim(study_points[key].jobs[i]),
+                    deps=["cfgs/{}".format(label)])
+          graph.add("parse/{}/{}".format(label, i), lambda key=key, i=i: pool.parse_job(study_points[key].jobs[i]),
+                    deps=["nvsim/{}/{}".format(label, i)])
+          parse_tasks[key].append("parse/{}/{}".format(label, i))
+
+  if anchor_capacities is not None:
+      for key in point_keys:
+          if key[2] in anchor_capacities:
+              continue
+          label = "{}_{}MB_{}_{}BPC".format(*key)
+          anchor_keys = [(key[0], key[1], _capacity, key[3]) for _capacity in anchor_capacities if (key[0], key[1], _capacity, key[3]) in parse_tasks]
+          if not anchor_keys:
+              raise ValueError("No anchor capacity to interpolate {} from".format(label))
+          for i in range(plan.cells_per_point[key[0]]):
+              graph.add("interpolate/{}/{}".format(label, i), lambda key=key, i=i, anchor_keys=anchor_keys: interpolate_cell(key, i, anchor_keys),
+                        deps=["cfgs/{}".format(label)] + [parse_tasks[k][i] for k in anchor_keys], on_main=True)
+              parse_tasks[key].append("interpolate/{}/{}".format(label, i))
+
+  evaluate_tasks = {}
+  for key in point_keys:
+      label = "{}_{}MB_{}_{}BPC".format(*key)
+      if "adaptive_generic" in traffic:
+          adaptive_task = "adaptive/{}_{}MB_{}BPC".format(*key[1:])
+          if adaptive_task not in graph.tasks:
+              keys = group_keys(*key[1:])
+              graph.add(adaptive_task, lambda keys=keys: refine_traffic(keys), deps=[task for k in keys for task in parse_tasks[k]], on_main=True)
+          deps = [adaptive_task]
+      else:
+          adaptive_task = None
+          deps = parse_tasks[key]
+      if work_queue is None:
+          graph.add("evaluate/{}".format(label), lambda key=key, adaptive_task=adaptive_task: evaluate(key, adaptive_task), deps=deps, on_main=True)
+          evaluate_tasks.setdefault(key[0], []).append("evaluate/{}".format(label))
+      else:
+          graph.add("evaluate/{}".format(label), lambda key=key, adaptive_task=adaptive_task: evaluate_remotely(key, adaptive_task), deps=deps)
+          graph.add("collect/{}".format(label), lambda key=key, label=label: collect_evaluation(key, "evaluate/{}".format(label)),
+                    deps=["evaluate/{}".format(label)], on_main=True)
+          evaluate_tasks.setdefault(key[0], []).append("collect/{}".format(label))
+
+  if crossover:
+      graph.add("crossover", solve_crossovers, deps=[task for key in point_keys for task in parse_tasks[key]], on_main=True)
+
+  for _cell_type in plan.cell_types():
+      graph.add("combine/{}".format(_cell_type), lambda _cell_type=_cell_type: combine(_cell_type), deps=evaluate_tasks[_cell_type], on_main=True)
+
+  # Merge every technology into one dataset with a union schema for cross-technology queries
+  if len(plan.cell_types()) > 1:
+      graph.add("combine_technologies", lambda: combine_technologies(plan.cell_types(), bits_per_cell[-1], results_formats, output_path=output_path),
+                deps=["combine/{}".format(_cell_type) for _cell_type in plan.cell_types()], on_main=True)
+
+  print("Study task graph: {} tasks".format(len(graph)))
+  if work_queue is not None and args.jobs is None:
+      # scheduler threads only wait on queued tasks, so queue everything and let the workers set the pace
+      num_jobs = len(graph)
+  TaskScheduler(num_workers=num_jobs).run(graph)
+  pool.print_stats()
+  if interpolation_records:
+      write_interpolation_report("{}/results/{}-interpolation.json".format(output_path, exp_name), interpolation_records)
+      print("Interpolated {} cells; anchors and held-out errors written to {}/results/{}-interpolation.json".format(len(interpolation_records), output_path, exp_name))
+  if surrogate_screen is not None:
+      surrogate_screen.print_summary()
+      surrogate_screen.close()
+  if warm_start is not None:
+      warm_start.print_summary()
+      warm_start.close()
+  if work_queue is not None:
+      work_queue.shutdown()
+  journal.close()
+
+  archive_path = workspace.finish()
+  if archive_path is not None:
+      print("Archived study workspace to {}".format(archive_path))
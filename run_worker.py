@@ -0,0 +1,42 @@
+import argparse
+import multiprocessing
+from nvmexplorer_src.work_queue import *
+from nvmexplorer_src.nvsim_pool import run_nvsim_task
+from nvmexplorer_src.study import evaluate_study_point_task
+
+# task kind -> handler, for the tasks run.py --queue submits
+TASK_HANDLERS = {"nvsim": run_nvsim_task, "evaluate": evaluate_study_point_task}
+
+
+def work(args):
+  """ Runs one worker process against the queue given on the command line
+  """
+  queue = WorkQueue(args.queue, lease_seconds=args.lease, poll_interval=args.poll_interval)
+  num_tasks = run_worker(queue, TASK_HANDLERS, kinds=args.kinds, idle_timeout=args.idle_timeout)
+  print("Worker finished after {} tasks".format(num_tasks))
+
+
+## Claim and run tasks from a study's work queue; start any number of these on any node that sees the queue
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Run NVMExplorer study tasks from a shared work queue")
+  parser.add_argument("queue", help="path to the sqlite work queue passed to run.py --queue")
+  parser.add_argument("-p", "--processes", type=int, default=1,
+                      help="number of worker processes to start on this node (default: 1)")
+  parser.add_argument("--kinds", nargs="+", choices=list(TASK_HANDLERS), default=None,
+                      help="only run these kinds of tasks (default: all)")
+  parser.add_argument("--lease", type=float, default=120.,
+                      help="seconds a claimed task may go without a heartbeat before another worker takes it over (default: 120)")
+  parser.add_argument("--poll-interval", type=float, default=1.,
+                      help="seconds between checks for new tasks (default: 1)")
+  parser.add_argument("--idle-timeout", type=float, default=None,
+                      help="exit after this many seconds without a task to run (default: run until killed)")
+  args = parser.parse_args()
+
+  if args.processes == 1:
+    work(args)
+  else:
+    processes = [multiprocessing.Process(target=work, args=(args,)) for i in range(args.processes)]
+    for process in processes:
+      process.start()
+    for process in processes:
+      process.join()
@@ -0,0 +1,47 @@
+import os
+import sys
+import pytest
+from nvmexplorer_src.input_defs.cell_cfgs import SRAMCellConfig
+from nvmexplorer_src.input_defs.nvsim_interface import NVSimInputConfig
+from nvmexplorer_src.nvsim_pool import NVSimJob
+
+# results section of an NVSim report, enough for parse_nvsim_output to fill in every array metric
+NVSIM_REPORT = """Bank Organization: 1 x 1
+ - Total Area = 0.750mm^2
+ - Area Efficiency = 61.000%
+ -  Read Latency = 1.300ns
+ - Write Latency = 4.800ns
+ - Read Bandwidth = 41.200GB/s
+ - Write Bandwidth = 18.700GB/s
+ -  Read Dynamic Energy = 12.500pJ
+ - Write Dynamic Energy = 30.100pJ
+ - Leakage Power = 6.200mW
+"""
+
+
+@pytest.fixture
+def fake_nvsim(tmp_path):
+  """ Returns a factory for stand-in NVSim binaries that print the given stdout, then sleep for the given number of seconds """
+  def make(stdout=NVSIM_REPORT, sleep=0, name="nvsim"):
+    nvsim_path = str(tmp_path / name)
+    with open(nvsim_path, "w") as f:
+      f.write("#!{}\nimport sys, time\nsys.stdout.write({!r})\nsys.stdout.flush()\ntime.sleep({})\n".format(sys.executable, stdout, sleep))
+    os.chmod(nvsim_path, 0o755)
+    return nvsim_path
+  return make
+
+
+@pytest.fixture
+def make_job(tmp_path):
+  """ Returns a factory for NVSim jobs on a generated SRAM cell file and mem cfg, with outputs and logs under tmp_path """
+  def make(name="sram", capacity=1):
+    for directory in ["cells", "cfgs", "nvsim_output", "logs"]:
+      os.makedirs(str(tmp_path / directory), exist_ok=True)
+    cell = SRAMCellConfig(cell_file_path=str(tmp_path / "cells" / (name + ".cell")))
+    cell.generate_cell_file()
+    input_cfg = NVSimInputConfig(mem_cfg_file_path=str(tmp_path / "cfgs" / (name + ".cfg")), capacity=capacity, cell_type=cell)
+    input_cfg.generate_mem_cfg()
+    return NVSimJob(input_cfg=input_cfg, cfg_path=input_cfg.mem_cfg_file_path,
+                    output_path=str(tmp_path / "nvsim_output" / (name + ".pkl")),
+                    stdout_log=str(tmp_path / "logs" / (name + "_output")), stderr_log=str(tmp_path / "logs" / (name + "_error")))
+  return make
@@ -0,0 +1,50 @@
+import copy
+import numpy as np
+import pytest
+from nvmexplorer_src.eval_utils import ExperimentResult, BatchExperimentResult
+from nvmexplorer_src.input_defs.access_pattern import PatternConfig
+from nvmexplorer_src.input_defs.nvsim_interface import NVSimInputConfig, NVSimOutputConfig
+
+EVALUATED = ["total_dynamic_read_power", "total_dynamic_write_power", "total_power", "total_read_energy", "total_write_energy",
+             "total_read_latency", "total_write_latency", "read_bw_utilization", "write_bw_utilization"]
+
+# (reads/s, writes/s) per traffic point; -1 makes both evaluators approximate the frequencies from the totals
+TRAFFIC = [(1.e6, 2.e5), (3.3e7, 0.), (-1, -1), (7.5e8, 1.25e8)]
+
+
+def cells():
+  input_cfgs = [NVSimInputConfig(word_width=64, capacity=2), NVSimInputConfig(word_width=128, capacity=8)]
+  outputs = [NVSimOutputConfig(input_cfg=input_cfgs[0], read_latency=1.3, read_bw=41.2, read_energy=12.5, write_latency=4.8,
+                               write_bw=18.7, write_energy=30.1, leakage_power=6.2, area=0.7, area_efficiency=61.),
+             NVSimOutputConfig(input_cfg=input_cfgs[1], read_latency=2.9, read_bw=77.4, read_energy=21.3, write_latency=17.1,
+                               write_bw=9.6, write_energy=88.4, leakage_power=14.9, area=2.4, area_efficiency=72.)]
+  return input_cfgs, outputs
+
+
+# without totals, energies and latencies are per second of traffic; with them, per run of the benchmark
+@pytest.mark.parametrize("total_reads, total_writes", [(-1, -1), (4.e9, 9.e8)])
+@pytest.mark.parametrize("write_latency_scale", [1., [1., 1.6, 1., 2.]])
+def test_batch_matches_experiment_result(total_reads, total_writes, write_latency_scale):
+  template = PatternConfig(benchmark_name="bench", read_size=64, write_size=32, total_reads=total_reads, total_writes=total_writes, total_ins=2.e10)
+  input_cfgs, outputs = cells()
+  batch = BatchExperimentResult(access_pattern=template, nvsim_input_cfgs=input_cfgs, nvsim_outputs=outputs,
+                                read_freq=[read_freq for (read_freq, _) in TRAFFIC], write_freq=[write_freq for (_, write_freq) in TRAFFIC],
+                                write_latency_scale=write_latency_scale)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    batch.evaluate()
+  scales = np.broadcast_to(np.asarray(write_latency_scale, dtype=float), (len(TRAFFIC),))
+
+  for (c, (input_cfg, output)) in enumerate(zip(input_cfgs, outputs)):
+    for (p, (read_freq, write_freq)) in enumerate(TRAFFIC):
+      access_pattern = copy.deepcopy(template)
+      access_pattern.read_freq = read_freq
+      access_pattern.write_freq = write_freq
+      scaled_output = copy.copy(output)
+      scaled_output.write_latency = output.write_latency * scales[p]
+      result = ExperimentResult(access_pattern=access_pattern, nvsim_input_cfg=input_cfg, nvsim_output=scaled_output)
+      with np.errstate(divide="ignore", invalid="ignore"):
+        result.evaluate()
+      for attr in EVALUATED:
+        assert getattr(batch, attr)[c, p] == getattr(result, attr), (attr, c, p)
+      assert batch.approx_read_freq[p] == access_pattern.read_freq
+      assert batch.approx_write_freq[p] == access_pattern.write_freq
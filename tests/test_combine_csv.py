@@ -0,0 +1,65 @@
+import os
+import nvmexplorer_src.combine_csv
+from nvmexplorer_src.combine_csv import RunManifest, combine_csv, combined_file_name
+
+HEADER = "MemCellType,Capacity (MB),Benchmark Name,Total Power\n"
+
+
+def write_run(results_dir, name, rows):
+  path = os.path.normpath(os.path.join(results_dir, name))
+  with open(path, "w") as f:
+    f.write(HEADER + "".join(row + "\n" for row in rows))
+  return path
+
+
+def track_streamed(monkeypatch):
+  """ Records which per-run files each combine_csv call streams, and whether it appends to the combined file """
+  calls = []
+  stream_rows = nvmexplorer_src.combine_csv.stream_rows
+  def tracked(big_fp, source_paths, header_written):
+    calls.append((list(source_paths), header_written))
+    return stream_rows(big_fp, source_paths, header_written)
+  monkeypatch.setattr(nvmexplorer_src.combine_csv, "stream_rows", tracked)
+  return calls
+
+
+def test_combine_appends_new_manifest_runs(tmp_path, monkeypatch):
+  output_path = str(tmp_path)
+  results_dir = os.path.join(output_path, "results")
+  os.makedirs(results_dir)
+  calls = track_streamed(monkeypatch)
+  manifest = RunManifest(os.path.join(results_dir, "study-manifest.json"))
+
+  first = write_run(results_dir, "RRAM_1BPC-1MB-ReadEDP.csv", ["RRAM,1,generic,1.5", "RRAM,1,dnn,2.5"])
+  manifest.add(first, "RRAM", 1)
+  combine_csv("RRAM", 1, manifest=manifest, output_path=output_path)
+  assert calls[-1] == ([first], False)
+
+  # a file the manifest does not list is left out even though its name matches
+  write_run(results_dir, "RRAM_1BPC-4MB-ReadEDP.csv", ["RRAM,4,generic,9.5"])
+  second = write_run(results_dir, "RRAM_1BPC-2MB-ReadEDP.csv", ["RRAM,2,generic,3.5"])
+  manifest.add(second, "RRAM", 1)
+  combine_csv("RRAM", 1, manifest=manifest, output_path=output_path)
+  assert calls[-1] == ([second], True)
+
+  with open(combined_file_name("RRAM", 1, output_path=output_path)) as f:
+    assert f.read() == HEADER + "RRAM,1,generic,1.5\nRRAM,1,dnn,2.5\nRRAM,2,generic,3.5\n"
+
+
+def test_combine_rebuilds_when_a_run_changes(tmp_path, monkeypatch):
+  output_path = str(tmp_path)
+  results_dir = os.path.join(output_path, "results")
+  os.makedirs(results_dir)
+  calls = track_streamed(monkeypatch)
+  manifest = RunManifest(os.path.join(results_dir, "study-manifest.json"))
+  first = write_run(results_dir, "STT_1BPC-1MB-ReadEDP.csv", ["STT,1,generic,1.5"])
+  second = write_run(results_dir, "STT_1BPC-2MB-ReadEDP.csv", ["STT,2,generic,3.5"])
+  manifest.add(first, "STT", 1)
+  manifest.add(second, "STT", 1)
+  combine_csv("STT", 1, manifest=manifest, output_path=output_path)
+
+  write_run(results_dir, "STT_1BPC-1MB-ReadEDP.csv", ["STT,1,generic,1.5", "STT,1,spec,4.5"])
+  combine_csv("STT", 1, manifest=manifest, output_path=output_path)
+  assert calls[-1] == ([first, second], False)
+  with open(combined_file_name("STT", 1, output_path=output_path)) as f:
+    assert f.read() == HEADER + "STT,1,generic,1.5\nSTT,1,spec,4.5\nSTT,2,generic,3.5\n"
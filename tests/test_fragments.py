@@ -0,0 +1,70 @@
+import os
+from nvmexplorer_src.input_defs.access_pattern import PatternConfig
+from nvmexplorer_src.input_defs.nvsim_interface import NVSimOutputConfig
+from nvmexplorer_src.study import StudyPoint, evaluate_study_point
+
+
+def study_point(tmp_path, job, cache_key="key-a"):
+  """ Returns a single-cell study point whose NVSim job finished with the given result key """
+  point = StudyPoint(results_csv=str(tmp_path / "results" / "SRAM_1MB_ReadLatency_1BPC-test.csv"))
+  os.makedirs(str(tmp_path / "results"), exist_ok=True)
+  job.cache_key = cache_key
+  point.cell_paths = [job.input_cfg.cell_type.cell_file_path]
+  point.cell_cfgs = [job.input_cfg.cell_type]
+  point.cfg_paths = [job.cfg_path]
+  point.nvsim_input_cfgs = [job.input_cfg]
+  point.jobs = [job]
+  return point
+
+
+def nvsim_outputs(job):
+  return [NVSimOutputConfig(input_cfg=job.input_cfg, read_latency=1.3, read_bw=41.2, read_energy=12.5, write_latency=4.8,
+                            write_bw=18.7, write_energy=30.1, leakage_power=6.2, area=0.7, area_efficiency=61.)]
+
+
+def evaluate(point, traffic):
+  return evaluate_study_point(point, nvsim_outputs(point.jobs[0]), PatternConfig(), traffic, exp_name="test")
+
+
+def read(path):
+  with open(path) as f:
+    return f.read()
+
+
+def test_unchanged_sweeps_are_reused(tmp_path, make_job):
+  point = study_point(tmp_path, make_job())
+  assert evaluate(point, ["generic"]) == [["generic"]]
+  generic_results = read(point.results_csv)
+
+  # adding a traffic type only evaluates the new sweep, and the reused rows stay as they were
+  assert evaluate(point, ["generic", "generic_write_buff"]) == [["generic_write_buff"]]
+  both_results = read(point.results_csv)
+  assert both_results.startswith(generic_results) and len(both_results) > len(generic_results)
+
+  assert evaluate(point, ["generic", "generic_write_buff"]) == [[]]
+  assert read(point.results_csv) == both_results
+
+
+def test_changed_nvsim_result_is_reevaluated(tmp_path, make_job):
+  assert evaluate(study_point(tmp_path, make_job()), ["generic"]) == [["generic"]]
+  assert evaluate(study_point(tmp_path, make_job(), cache_key="key-b"), ["generic"]) == [["generic"]]
+
+
+def test_edited_fragment_is_reevaluated(tmp_path, make_job):
+  point = study_point(tmp_path, make_job())
+  evaluate(point, ["generic"])
+  fragment_path = str(tmp_path / "results" / "fragments" / "SRAM_1MB_ReadLatency_1BPC-test" / "0-generic.csv")
+  with open(fragment_path, "a") as f:
+    f.write("stray row\n")
+  assert evaluate(point, ["generic"]) == [["generic"]]
+  assert "stray row" not in read(point.results_csv)
+
+
+def test_reused_rows_name_this_runs_cells(tmp_path, make_job):
+  first = study_point(tmp_path, make_job("first"))
+  evaluate(first, ["generic"])
+  # the same NVSim result under another cell path, e.g., from another workspace
+  second = study_point(tmp_path, make_job("second"))
+  assert evaluate(second, ["generic"]) == [[]]
+  results = read(second.results_csv)
+  assert second.cell_paths[0] in results and first.cell_paths[0] not in results
@@ -0,0 +1,65 @@
+from nvmexplorer_src.journal import StudyJournal, file_digest
+from nvmexplorer_src.nvsim_pool import NVSimPool
+
+
+def run_study(nvsim_path, job, journal_path, resume):
+  """ Runs and parses one NVSim job the way a study does, returning the pool's stats and the parsed result """
+  journal = StudyJournal(journal_path, resume=resume)
+  pool = NVSimPool(nvsim_path, journal=journal)
+  try:
+    pool.run_nvsim(job)
+    nvsim_output = pool.parse_job(job)
+  finally:
+    journal.close()
+  return pool.stats, nvsim_output
+
+
+def test_resume_skips_finished_nvsim_jobs(tmp_path, fake_nvsim, make_job):
+  nvsim_path = fake_nvsim()
+  journal_path = str(tmp_path / "study-journal.jsonl")
+  stats, first_output = run_study(nvsim_path, make_job(), journal_path, resume=False)
+  assert stats["run"] == 1
+
+  stats, resumed_output = run_study(nvsim_path, make_job(), journal_path, resume=True)
+  assert (stats["run"], stats["resumed"]) == (0, 1)
+  assert resumed_output.read_latency == first_output.read_latency == 1.3
+
+  # without --resume the journal starts over and every job runs again
+  stats, _ = run_study(nvsim_path, make_job(), journal_path, resume=False)
+  assert (stats["run"], stats["resumed"]) == (1, 0)
+
+
+def test_resume_reruns_jobs_whose_output_or_inputs_changed(tmp_path, fake_nvsim, make_job):
+  nvsim_path = fake_nvsim()
+  journal_path = str(tmp_path / "study-journal.jsonl")
+  job = make_job()
+  run_study(nvsim_path, job, journal_path, resume=False)
+
+  with open(job.output_path, "ab") as f:
+    f.write(b"\0")
+  stats, _ = run_study(nvsim_path, make_job(), journal_path, resume=True)
+  assert (stats["run"], stats["resumed"]) == (1, 0)
+
+  # a different capacity renders a different mem cfg, so the journaled result no longer applies
+  stats, _ = run_study(nvsim_path, make_job(capacity=2), journal_path, resume=True)
+  assert (stats["run"], stats["resumed"]) == (1, 0)
+
+
+def test_resume_drops_a_partial_record(tmp_path):
+  journal_path = str(tmp_path / "study-journal.jsonl")
+  output_path = str(tmp_path / "point.csv")
+  with open(output_path, "w") as f:
+    f.write("Benchmark Name\nbench\n")
+  journal = StudyJournal(journal_path)
+  journal.record("evaluate", output_path, inputs="abc", output_digest=file_digest(output_path))
+  journal.close()
+  with open(journal_path, "a") as f:
+    f.write('{"unit": "evaluate", "key": "cut-sh')
+
+  journal = StudyJournal(journal_path, resume=True)
+  assert journal.completed("evaluate", output_path, "abc", output_path=output_path)
+  assert not journal.completed("evaluate", output_path, "abd", output_path=output_path)
+  journal.record("nvsim", "job.pkl", inputs="def")
+  journal.close()
+  with open(journal_path) as f:
+    assert [line.startswith('{') and line.endswith('}\n') for line in f] == [True, True]
@@ -0,0 +1,49 @@
+import time
+from nvmexplorer_src.nvsim_cache import NVSimCache
+from nvmexplorer_src.nvsim_pool import NVSimPool, run_nvsim_process, nvsim_failure
+
+FAILED_REPORT = "Bank Organization: 1 x 1\nNo valid solution.\n"
+
+
+def test_failure_lines():
+  assert nvsim_failure(["Bank Organization: 1 x 1\n", "No valid solution.\n"]) == "No valid solution."
+  assert nvsim_failure(["[ERROR] cannot open cell file\n"]) == "[ERROR] cannot open cell file"
+  assert nvsim_failure(["Read Error Rate = 0.001\n", " - Leakage Power = 6.2mW\n"]) is None
+
+
+def test_failing_nvsim_is_stopped_early(fake_nvsim, make_job):
+  nvsim_path = fake_nvsim(stdout=FAILED_REPORT, sleep=60)
+  job = make_job()
+  start = time.time()
+  run_nvsim_process(nvsim_path, job.cfg_path, job.stdout_log, job.stderr_log)
+  assert time.time() - start < 30
+  with open(job.stdout_log) as f:
+    assert f.read() == FAILED_REPORT
+
+
+def test_failures_are_cached_by_content(tmp_path, fake_nvsim, make_job):
+  cache = NVSimCache(str(tmp_path / "nvsim_cache"))
+  nvsim_path = fake_nvsim(stdout=FAILED_REPORT)
+  pool = NVSimPool(nvsim_path, cache=cache)
+  job = make_job()
+  assert pool.run_nvsim(job)
+  assert job.failure == "No valid solution."
+  assert cache.load_failure(job.cache_key) == "No valid solution."
+  nvsim_output = pool.parse_job(job)
+  assert nvsim_output.failure == "No valid solution." and nvsim_output.read_latency == -1
+  assert cache.load(job.cache_key) is None
+
+  # a later study skips the job without running NVSim, unless asked to retry known failures
+  pool = NVSimPool(nvsim_path, cache=cache)
+  job = make_job()
+  assert not pool.run_nvsim(job)
+  assert (pool.stats["run"], pool.stats["known_failed"], job.failure) == (0, 1, "No valid solution.")
+  pool = NVSimPool(nvsim_path, cache=cache, retry_failed=True)
+  assert pool.run_nvsim(make_job())
+  assert pool.stats["failed"] == 1
+
+  # a different NVSim binary gets a key of its own, so the recorded failure no longer applies
+  pool = NVSimPool(fake_nvsim(name="nvsim-fixed"), cache=cache)
+  job = make_job()
+  assert pool.run_nvsim(job)
+  assert job.failure is None and pool.parse_job(job).read_latency == 1.3
@@ -0,0 +1,61 @@
+import threading
+import pytest
+from nvmexplorer_src.scheduler import TaskGraph, TaskScheduler
+
+
+def test_tasks_run_after_their_dependencies():
+  order = []
+  lock = threading.Lock()
+  def step(name):
+    def fn():
+      with lock:
+        order.append(name)
+      return name.upper()
+    return fn
+  graph = TaskGraph()
+  graph.add("nvsim/a", step("nvsim/a"))
+  graph.add("nvsim/b", step("nvsim/b"))
+  graph.add("evaluate/a", step("evaluate/a"), deps=["nvsim/a"], on_main=True)
+  graph.add("combine", step("combine"), deps=["evaluate/a", "nvsim/b"], on_main=True)
+  TaskScheduler(num_workers=2).run(graph)
+  assert order.index("evaluate/a") > order.index("nvsim/a")
+  assert order[-1] == "combine"
+  assert graph.result("combine") == "COMBINE"
+
+
+def test_main_tasks_run_while_workers_are_in_flight():
+  slow_started = threading.Event()
+  release_slow = threading.Event()
+  main_thread = threading.get_ident()
+  def slow():
+    slow_started.set()
+    assert release_slow.wait(10)
+  def evaluate():
+    # runs on the scheduler's thread before the slow NVSim run has finished
+    assert slow_started.wait(10)
+    release_slow.set()
+    return threading.get_ident()
+  graph = TaskGraph()
+  graph.add("nvsim/slow", slow)
+  graph.add("nvsim/fast", lambda: None)
+  graph.add("evaluate/fast", evaluate, deps=["nvsim/fast"], on_main=True)
+  TaskScheduler(num_workers=2).run(graph)
+  assert graph.result("evaluate/fast") == main_thread
+
+
+def test_failed_task_stops_its_dependents():
+  ran = []
+  def broken():
+    raise ValueError("NVSim crashed")
+  graph = TaskGraph()
+  graph.add("nvsim/a", broken)
+  graph.add("evaluate/a", lambda: ran.append("evaluate/a"), deps=["nvsim/a"], on_main=True)
+  with pytest.raises(ValueError, match="NVSim crashed"):
+    TaskScheduler().run(graph)
+  assert ran == []
+
+
+def test_unknown_dependency_is_rejected():
+  graph = TaskGraph()
+  with pytest.raises(KeyError):
+    graph.add("evaluate/a", lambda: None, deps=["nvsim/a"])
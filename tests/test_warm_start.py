@@ -0,0 +1,81 @@
+import re
+from nvmexplorer_src.input_defs.nvsim_interface import parse_nvsim_output
+from nvmexplorer_src.warm_start import WarmStart, force_options
+
+# configuration section of an NVSim report
+NEIGHBOR_OUTPUT = """
+=============
+CONFIGURATION
+=============
+Bank Organization: 4 x 2
+ - Row Activation   : 1 / 4
+ - Column Activation: 2 / 2
+Mat Organization: 2 x 2
+ - Row Activation   : 1 / 2
+ - Column Activation: 2 / 2
+ - Subarray Size    : 512 Rows x 256 Columns
+Mux Level:
+ - Senseamp Mux      : 8
+ - Output Level-1 Mux: 1
+ - Output Level-2 Mux: 2
+"""
+
+# formats NVSim's InputParameter reads the force options with (sscanf)
+NVSIM_FORCE_FORMATS = {
+  "bank": r"-ForceBank \(Total AxB, Active CxD\): (\d+)x(\d+), (\d+)x(\d+)",
+  "mat": r"-ForceMat \(Total AxB, Active CxD\): (\d+)x(\d+), (\d+)x(\d+)",
+  "senseamp_mux": r"-ForceMuxSenseAmp: (\d+)",
+  "output_mux1": r"-ForceMuxOutputLev1: (\d+)",
+  "output_mux2": r"-ForceMuxOutputLev2: (\d+)",
+}
+
+
+def nvsim_forced_organization(cfg_text):
+  """ Returns the organization NVSim searches under the force options of a mem cfg, as it reports it """
+  organization = {}
+  for (part, pattern) in NVSIM_FORCE_FORMATS.items():
+    match = re.search(pattern, cfg_text)
+    if match is None:
+      continue
+    values = [int(value) for value in match.groups()]
+    if len(values) == 4:
+      organization[part], organization[part + "_active"] = values[:2], values[2:]
+    else:
+      organization[part] = values[0]
+  return organization
+
+
+def parse_neighbor(tmp_path):
+  output_path = tmp_path / "neighbor.out"
+  output_path.write_text(NEIGHBOR_OUTPUT)
+  return parse_nvsim_output(str(output_path))
+
+
+def test_parse_organization(tmp_path):
+  organization = parse_neighbor(tmp_path).organization
+  assert organization == {"bank": [4, 2], "bank_active": [1, 2], "mat": [2, 2], "mat_active": [1, 2],
+                          "senseamp_mux": 8, "output_mux1": 1, "output_mux2": 2}
+
+
+def test_force_options_syntax(tmp_path):
+  organization = parse_neighbor(tmp_path).organization
+  assert force_options(organization, ["bank", "mat"]) == ("-ForceBank (Total AxB, Active CxD): 4x2, 1x2\n"
+                                                          "-ForceMat (Total AxB, Active CxD): 2x2, 1x2\n")
+  # a 3D bank, or one reported without its active mats, is left to the search
+  assert force_options({"bank": [4, 2, 2], "bank_active": [1, 2]}, ["bank"]) == ""
+  assert force_options({"bank": [4, 2]}, ["bank"]) == ""
+
+
+def test_forced_cfg_reproduces_neighbor_organization(tmp_path):
+  neighbor = parse_neighbor(tmp_path)
+  run_cfg_path = tmp_path / "run.cfg"
+  run_cfg_path.write_text("-DesignTarget: RAM\n-Capacity (MB): 1\n")
+  warm_start = WarmStart(force=["bank", "mat", "senseamp_mux", "output_mux1", "output_mux2"], log_path=str(tmp_path / "warm-start.jsonl"))
+  try:
+    warm_cfg_path = warm_start.write_cfg(str(run_cfg_path), neighbor)
+  finally:
+    warm_start.close()
+  with open(warm_cfg_path) as f:
+    cfg_text = f.read()
+  assert cfg_text.startswith("-DesignTarget: RAM\n-Capacity (MB): 1\n")
+  assert nvsim_forced_organization(cfg_text) == neighbor.organization
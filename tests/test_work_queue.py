@@ -0,0 +1,55 @@
+import time
+import pytest
+from nvmexplorer_src.work_queue import WorkQueue, run_worker
+
+
+def test_claims_are_exclusive_and_oldest_first(tmp_path):
+  queue = WorkQueue(str(tmp_path / "queue.db"))
+  queue.put("a", "nvsim", {"n": 1})
+  queue.put("b", "evaluate", {"n": 2})
+  queue.put("c", "nvsim", {"n": 3})
+  first = queue.claim("w1")
+  second = queue.claim("w2", kinds=["nvsim"])
+  assert (first.task_id, first.payload) == ("a", {"n": 1})
+  assert second.task_id == "c"
+  assert queue.claim("w3", kinds=["nvsim"]) is None
+  assert queue.status() == {"pending": 1, "claimed": 2, "done": 0, "failed": 0}
+
+
+def test_expired_lease_is_reclaimed_and_stale_result_dropped(tmp_path):
+  queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.05)
+  queue.put("a", "nvsim", None)
+  stale = queue.claim("w1")
+  time.sleep(0.1)
+  # w1 stopped heartbeating, so its task goes to the next worker
+  current = queue.claim("w2")
+  assert current.task_id == "a" and current.lease_id != stale.lease_id
+  assert not queue.renew(stale)
+  assert not queue.complete(stale, "stale")
+  assert queue.complete(current, "fresh")
+  assert queue.status()["done"] == 1
+
+
+def test_task_fails_after_max_attempts(tmp_path):
+  queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.05, max_attempts=2)
+  queue.put("a", "nvsim", None)
+  queue.fail(queue.claim("w1"), "NVSim crashed")
+  queue.claim("w2")
+  time.sleep(0.1)
+  assert queue.claim("w3") is None
+  assert queue.status() == {"pending": 0, "claimed": 0, "done": 0, "failed": 1}
+
+
+def test_submitted_tasks_resolve_through_a_worker(tmp_path):
+  queue = WorkQueue(str(tmp_path / "queue.db"), poll_interval=0.01)
+  try:
+    squared = queue.submit("square", "square", 7)
+    broken = queue.submit("broken", "broken", None)
+    handlers = {"square": lambda n: n * n, "broken": lambda payload: 1 / 0}
+    # the broken task is retried until it has used up its attempts
+    assert run_worker(queue, handlers, worker_id="w1", idle_timeout=0.05) == 1 + queue.max_attempts
+    assert squared.result(timeout=5) == 49
+    with pytest.raises(RuntimeError, match="ZeroDivisionError"):
+      broken.result(timeout=5)
+  finally:
+    queue.shutdown()